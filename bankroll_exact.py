@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Distribuições exatas (sem simulação) do bankroll com odd fixa e Kelly fracionado.
+
+Com odd fixa, toda aposta multiplica o bankroll por g_w = 1 + f*b (vitória) ou
+g_l = 1 - f (derrota). Em log: +a ou -c, com a = log(g_w) e c = -log(g_l).
+- Bankroll final: só depende do nº de vitórias W ~ Binomial(n, p):
+  B0 * g_w^W * g_l^(n-W) — quantis, P(final > inicial) e a CDF da taxa de
+  crescimento saem direto de scipy.stats.binom (idem as faixas por aposta).
+- Drawdown máximo: o drawdown corrente (em log) é D = l*c - w*a, com (w, l) =
+  vitórias/derrotas desde o último pico; D <= 0 é pico novo (volta a (0, 0)).
+  Como (w, l) já diz há quantas apostas foi o pico (w + l), a cadeia se
+  separa em excursões independentes: e_k(w, l) = P(sair do pico e chegar a
+  (w, l) com 0 < D < x_k no caminho) sai de uma varredura pelas diagonais
+  w + l = s (sem depender do instante do pico), e os picos seguem a renovação
+  u(t) = soma_s r(s) * u(t - s), r(s) = P(pico novo exatamente s apostas depois).
+  P(DD máximo < x_k) = soma_t u(t) * E_k(n - t), E_k(m) = massa viva na
+  diagonal m. Todos os limiares juntos em arrays (níveis x w): O(K * n^2)
+  no total, memória O(K * n) — sem simulação para qualquer horizonte.
+- Ruína: P(bankroll tocar <= (1 - nível) * B0 em algum momento), por DP no
+  reticulado (apostas, vitórias) com barreira absorvente — O(n^2) por nível.
+- Projeção condicional: o fator de crescimento de r apostas restantes também é
+  binomial — growth_quantiles dá a tabela (r x níveis) de uma vez.
+
+Uso:
+    from bankroll_exact import exact_fixed_odds
+    ex = exact_fixed_odds(p=0.81, odd=1.30, kelly_fraction=0.33, bankroll0=100, n_bets=300)
+    ex["final"], ex["pmf"]      # bankrolls finais possíveis (crescentes) e probabilidades
+    ex["dd_sf"][20]             # P(drawdown máximo >= 20%)
+"""
+
+from typing import Dict, Sequence
+
+import numpy as np
+from scipy.stats import binom
+
+from bankroll_montecarlo import BAND_QUANTILES, kelly_log_returns
+
+LEVELS_PCT = np.arange(0, 101)  # 0%, 1%, ..., 100%
+
+
+def final_distribution(p: float, a: float, c: float, bankroll0: float, n: int):
+    """(bankrolls finais por nº de vitórias 0..n, pmf binomial)."""
+    w = np.arange(n + 1)
+    return bankroll0 * np.exp(w * a - (n - w) * c), binom.pmf(w, n, p)
+
+
+def step_quantiles(p: float, a: float, c: float, bankroll0: float, n: int,
+                   quantiles: Dict[str, float] = BAND_QUANTILES) -> Dict[str, np.ndarray]:
+    """Quantis exatos do bankroll após cada aposta t = 0..n (W_t ~ Binomial(t, p))."""
+    t = np.arange(n + 1)
+    out = {}
+    for name, q in quantiles.items():
+        w = binom.ppf(q / 100.0, t, p)
+        out[name] = bankroll0 * np.exp(w * a - (t - w) * c)
+    return out
+
+
+def growth_quantiles(p: float, odd: float, kelly_fraction: float, n: int,
+                     levels: np.ndarray) -> np.ndarray:
+    """Fator de crescimento (bankroll final / inicial) de r = 0..n apostas nos quantis levels (0-1): (n + 1, len(levels))."""
+    log_win, log_loss = kelly_log_returns(p, np.array([odd]), kelly_fraction)
+    r = np.arange(n + 1)[:, None]
+    w = binom.ppf(np.asarray(levels, dtype=float)[None, :], r, p)
+    return np.exp(w * log_win[0] + (r - w) * log_loss[0])
+
+
+def max_drawdown_sf(p: float, a: float, c: float, n: int,
+                    levels_pct: Sequence[float] = LEVELS_PCT[1:-1]) -> np.ndarray:
+    """P(drawdown máximo em n apostas >= nível %) para cada nível em (0, 100)."""
+    x = -np.log1p(-np.asarray(levels_pct, dtype=float) / 100.0)[:, None]  # limiares em log (K, 1)
+    K, q = len(x), 1.0 - p
+    live = np.zeros((K, n + 1))    # E_k(s): massa viva da excursão na diagonal s (s = 0: no pico)
+    renew = np.zeros((K, n + 1))   # r_k(s): pico novo exatamente s apostas após o anterior
+    live[:, 0] = 1.0
+    diag = np.ones((K, 1))         # e_k(w, s - w), w = 0..s
+    for s in range(n):
+        w = np.arange(s + 2)
+        new = np.zeros((K, s + 2))
+        new[:, :-1] = q * diag     # derrota: (w, l) -> (w, l + 1)
+        new[:, 1:] += p * diag     # vitória: (w, l) -> (w + 1, l)
+        D = (s + 1 - w) * c - w * a
+        renew[:, s + 1] = new[:, D <= 0].sum(axis=1)
+        diag = np.where((D > 0) & (D < x), new, 0.0)  # D >= x: drawdown atingido
+        live[:, s + 1] = diag.sum(axis=1)
+    peak = np.zeros((K, n + 1))    # u_k(t): no pico no instante t sem ter atingido x_k
+    peak[:, 0] = 1.0
+    for t in range(1, n + 1):
+        peak[:, t] = (renew[:, 1:t + 1] * peak[:, t - 1::-1]).sum(axis=1)
+    survive = (peak * live[:, ::-1]).sum(axis=1)
+    return np.clip(1.0 - survive, 0.0, 1.0)
+
+
+def ruin_sf(p: float, a: float, c: float, n: int,
+            levels_pct: Sequence[float] = LEVELS_PCT[1:-1]) -> np.ndarray:
+    """P(bankroll tocar <= (1 - nível%) do inicial em alguma das n apostas), por nível."""
+    barrier = np.log1p(-np.asarray(levels_pct, dtype=float) / 100.0)[:, None]  # (K, 1)
+    mass = np.zeros((len(barrier), n + 1))  # mass[k, w]: vivo após t apostas com w vitórias
+    mass[:, 0] = 1.0
+    w = np.arange(n + 1)
+    for t in range(1, n + 1):
+        new = np.zeros_like(mass)
+        new[:, 1:t + 1] = p * mass[:, :t]
+        new[:, :t] += (1.0 - p) * mass[:, :t]
+        new[w * a - (t - w) * c <= barrier] = 0.0
+        mass = new
+    return np.clip(1.0 - mass.sum(axis=1), 0.0, 1.0)
+
+
+def exact_fixed_odds(p: float, odd: float, kelly_fraction: float, bankroll0: float,
+                     n_bets: int) -> Dict[str, np.ndarray]:
+    """
+    Tudo o que a página usa, exato: "final"/"pmf" (bankroll final crescente e
+    probabilidade), "p25"/"median"/"p75" por aposta, "dd_sf"/"ruin_sf" indexados
+    pelo nível inteiro 0..100 (% — dd_sf[k] = P(drawdown máximo >= k%)).
+    """
+    log_win, log_loss = kelly_log_returns(p, np.array([odd]), kelly_fraction)
+    a, c = float(log_win[0]), -float(log_loss[0])
+    final, pmf = final_distribution(p, a, c, bankroll0, n_bets)
+    out = {"final": final, "pmf": pmf, **step_quantiles(p, a, c, bankroll0, n_bets)}
+    inner = LEVELS_PCT[1:-1]
+    if c > 0:
+        out["dd_sf"] = np.concatenate([[1.0], max_drawdown_sf(p, a, c, n_bets, inner), [0.0]])
+        out["ruin_sf"] = np.concatenate([[1.0], ruin_sf(p, a, c, n_bets, inner), [0.0]])
+    else:  # sem aposta (f = 0): bankroll constante
+        out["dd_sf"] = out["ruin_sf"] = (LEVELS_PCT == 0).astype(float)
+    return out
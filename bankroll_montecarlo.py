@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Núcleo do Monte Carlo de bankroll (Kelly fracionado) do teste.py — memória limitada.
+
+As simulações são processadas em blocos de linhas (max_cells = simulações x
+apostas por bloco) e nada do tamanho (simulações x apostas) sobrevive ao bloco:
+ficam só os agregados que a página usa.
+- final:        bankroll final de cada simulação (n_sims,)
+- max_drawdown: drawdown máximo de cada simulação, em % (n_sims,)
+- p25 / median / p75: faixas por aposta (n_bets + 1,), aposta 0 = bankroll inicial
+- quantiles (opcional, quantile_grid): (n_bets + 1, len(grid)) — com bankroll0 = 1
+  é a tabela de fatores de crescimento por nº de apostas (projeção condicional)
+
+O caminho é acumulado em log (cumsum de log(1 + retorno)) e o drawdown sai do
+máximo acumulado (np.maximum.accumulate) — sem laço Python por simulação.
+As faixas por aposta são exatas quando tudo cabe num bloco; com vários blocos
+vêm de um histograma por aposta em log-bankroll, com a faixa de bins tirada do
+1º bloco (folga de 50% para cada lado) e interpolado dentro do bin; fora da
+faixa, bins de estouro que vão até o mínimo/máximo exatos de cada aposta. Pico de memória ~ max_cells + n_bets * n_bins por processo, sem
+depender de n_sims (além dos dois vetores por simulação acima).
+
+Paralelismo (workers > 1; o padrão da função é sequencial): cada bloco tem seu
+próprio Generator, filho (spawn) de um único SeedSequence(seed), e o tamanho do
+bloco só depende de n_bets e max_cells — então o resultado para uma semente é
+o mesmo com 1 ou N processos. O 1º bloco roda no processo principal (fixa a
+faixa do histograma); os demais vão em fatias contíguas para um
+ProcessPoolExecutor (simulate_blocks é o worker) e os agregados parciais
+(finais, drawdowns, contagens e extremos do histograma) são juntados por
+posição/soma/mín-máx.
+O pool é um só por processo (shared_pool): as reexecuções do Streamlit
+reaproveitam os workers em vez de subir processos a cada simulação.
+
+Uso:
+    from bankroll_montecarlo import odds_table, simulate_bankrolls
+    values, probs = odds_table(odds_possiveis)
+    sim = simulate_bankrolls(0.81, values, probs, kelly_fraction=0.33, bankroll0=100,
+                             n_sims=100_000, n_bets=1000, seed=0)
+"""
+
+import atexit
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+BAND_QUANTILES = {"p25": 25.0, "median": 50.0, "p75": 75.0}
+F_MAX = 0.99999  # fração máxima do bankroll por aposta (1 - f > 0)
+
+
+def odds_table(odds_possiveis: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Odds repetidas conforme o peso -> (valores únicos, probabilidade de cada um)."""
+    values, counts = np.unique(np.asarray(odds_possiveis, dtype=float), return_counts=True)
+    return values, counts / counts.sum()
+
+
+def kelly_log_returns(p: float, odds: np.ndarray, kelly_fraction: float,
+                      f_max: float = F_MAX) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    log(1 + retorno) de vitória e de derrota por odd, com a fração de Kelly
+    aplicada (f = Kelly * fração, cortada em [0, f_max]).
+    """
+    b = np.asarray(odds, dtype=float) - 1.0
+    f = np.clip((b * p - (1.0 - p)) / (b + 1e-9) * kelly_fraction, 0.0, f_max)
+    return np.log1p(f * b), np.log1p(-f)
+
+
+def max_drawdown_pct(log_paths: np.ndarray) -> np.ndarray:
+    """Drawdown máximo (%) de cada linha de log_paths (caminhos em log-bankroll, com o inicial)."""
+    peak = np.maximum.accumulate(log_paths, axis=1)
+    return -np.expm1((log_paths - peak).min(axis=1)) * 100.0
+
+
+class _StepHistogram:
+    """
+    Histograma por aposta em log-bankroll (faixa fixada pelo 1º bloco) -> quantis aproximados.
+    Guarda também o mínimo/máximo exatos por aposta: os bins de estouro vão até
+    eles, então as caudas (0% / 100%) não ficam presas na borda da faixa.
+    """
+    def __init__(self, lo: np.ndarray, width: np.ndarray, n_bins: int):
+        self.lo, self.width = lo, width
+        self.n_bins = n_bins
+        self.counts = np.zeros((len(lo), n_bins + 2), dtype=np.int64)  # + estouro abaixo/acima
+        self.vmin = np.full(len(lo), np.inf)
+        self.vmax = np.full(len(lo), -np.inf)
+
+    @classmethod
+    def from_block(cls, first: np.ndarray, n_bins: int) -> "_StepHistogram":
+        lo, hi = first.min(axis=0), first.max(axis=0)
+        pad = np.maximum((hi - lo) * 0.5, 1e-9)
+        return cls(lo - pad, (hi - lo) + 2 * pad, n_bins)
+
+    def add(self, log_paths: np.ndarray):
+        n_steps, nb = log_paths.shape[1], self.n_bins + 2
+        b = np.floor((log_paths - self.lo) / self.width * self.n_bins).astype(np.int64)
+        b = np.clip(b, -1, self.n_bins) + 1
+        key = (np.arange(n_steps)[None, :] * nb + b).ravel()
+        self.counts += np.bincount(key, minlength=n_steps * nb).reshape(n_steps, nb)
+        np.minimum(self.vmin, log_paths.min(axis=0), out=self.vmin)
+        np.maximum(self.vmax, log_paths.max(axis=0), out=self.vmax)
+
+    def merge(self, counts: np.ndarray, vmin: np.ndarray, vmax: np.ndarray):
+        """Junta as contagens e extremos de outro histograma com a mesma faixa (worker do pool)."""
+        self.counts += counts
+        np.minimum(self.vmin, vmin, out=self.vmin)
+        np.maximum(self.vmax, vmax, out=self.vmax)
+
+    def quantile(self, q) -> np.ndarray:
+        """Quantil(is) q (%) por aposta, interpolado linearmente dentro do bin: (n_steps,) ou (n_steps, len(q))."""
+        qs = np.atleast_1d(np.asarray(q, dtype=float))
+        cum = np.cumsum(self.counts, axis=1)
+        target = qs[None, :] / 100.0 * cum[:, -1:]
+        j = np.minimum(np.stack([np.searchsorted(c, t) for c, t in zip(cum, target)]), self.n_bins + 1)
+        rows = np.arange(len(cum))[:, None]
+        before = np.where(j > 0, cum[rows, np.maximum(j - 1, 0)], 0)
+        inside = self.counts[rows, j]
+        frac = np.where(inside > 0, (target - before) / np.maximum(inside, 1), 0.5)
+        lo, hi = self.lo[:, None], (self.lo + self.width)[:, None]
+        vmin, vmax = self.vmin[:, None], self.vmax[:, None]
+        out = np.where(j == 0, vmin + frac * (lo - vmin),                     # estouro abaixo: [mín, lo]
+                       np.where(j > self.n_bins, hi + frac * (vmax - hi),     # estouro acima: [hi, máx]
+                                lo + (j - 1 + frac) / self.n_bins * self.width[:, None]))
+        out = np.clip(out, vmin, vmax)
+        return out if np.ndim(q) else out[:, 0]
+
+
+def _simulate_block(rng: np.random.Generator, task: Dict, m: int) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """m caminhos -> (log-bankroll final, caminhos em log com o inicial ou None se task["paths"] = False)."""
+    n_bets, log_b0 = task["n_bets"], task["log_b0"]
+    k = rng.choice(len(task["odds_probs"]), size=(m, n_bets), p=task["odds_probs"])
+    won = rng.random((m, n_bets)) < task["p"]
+    steps = np.where(won, task["log_win"][k], task["log_loss"][k])
+    if not task["paths"]:
+        return log_b0 + steps.sum(axis=1), None
+    log_paths = np.empty((m, n_bets + 1))
+    log_paths[:, 0] = log_b0
+    np.cumsum(steps, axis=1, out=log_paths[:, 1:])
+    log_paths[:, 1:] += log_b0
+    return log_paths[:, -1], log_paths
+
+
+def simulate_blocks(task: Dict) -> Dict[str, np.ndarray]:
+    """
+    Worker do pool: os blocos task["blocks"] = (início, fim), cada um com o seu
+    SeedSequence de task["seeds"]. Retorna os finais/drawdowns das linhas desses
+    blocos (a partir de "row") e as contagens/extremos do histograma na faixa task["hist"].
+    """
+    rows, n_sims = task["block_rows"], task["n_sims"]
+    first, last = task["blocks"]
+    hist = _StepHistogram(*task["hist"]) if task["hist"] is not None else None
+    finals: List[np.ndarray] = []
+    dds: List[np.ndarray] = []
+    for b, ss in zip(range(first, last), task["seeds"]):
+        m = min(rows, n_sims - b * rows)
+        final, log_paths = _simulate_block(np.random.default_rng(ss), task, m)
+        finals.append(final)
+        if log_paths is not None:
+            dds.append(max_drawdown_pct(log_paths))
+            hist.add(log_paths)
+    return {"row": first * rows, "final": np.concatenate(finals),
+            "max_drawdown": np.concatenate(dds) if dds else None,
+            "counts": hist.counts if hist is not None else None,
+            "vmin": hist.vmin if hist is not None else None,
+            "vmax": hist.vmax if hist is not None else None}
+
+
+_POOL: Optional[ProcessPoolExecutor] = None
+_POOL_WORKERS = 0
+
+
+def shared_pool(workers: int) -> ProcessPoolExecutor:
+    """Pool do módulo, reaproveitado entre chamadas; recriado só se o nº de processos mudar."""
+    global _POOL, _POOL_WORKERS
+    if _POOL is None or _POOL_WORKERS != workers:
+        if _POOL is not None:
+            _POOL.shutdown()
+        _POOL, _POOL_WORKERS = ProcessPoolExecutor(max_workers=workers), workers
+    return _POOL
+
+
+@atexit.register
+def _shutdown_pool():
+    if _POOL is not None:
+        _POOL.shutdown()
+
+
+def simulate_bankrolls(p: float, odds_values: np.ndarray, odds_probs: np.ndarray,
+                       kelly_fraction: float, bankroll0: float, n_sims: int, n_bets: int,
+                       seed: Optional[int] = None, max_cells: int = 2_000_000,
+                       n_bins: int = 2048, workers: Optional[int] = 1,
+                       paths: bool = True, quantile_grid: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+    """
+    n_sims caminhos de n_bets apostas: odd sorteada de (odds_values, odds_probs),
+    vitória com prob. p, stake = Kelly fracionado do bankroll corrente.
+    Retorna {"final", "max_drawdown", "p25", "median", "p75"} (ver docstring do módulo);
+    com paths=False só {"final"} (sem caminhos: drawdown e faixas não são calculados).
+    quantile_grid: quantis extras (%) por aposta -> "quantiles" (n_bets + 1, len(grid)).
+    workers: processos do pool (1 = sequencial, sem pool; None = os.cpu_count());
+    não muda o resultado. O pool (shared_pool) fica vivo para as próximas chamadas.
+    """
+    log_win, log_loss = kelly_log_returns(p, odds_values, kelly_fraction)
+    rows = max(1, max_cells // max(n_bets, 1))
+    n_blocks = -(-n_sims // rows)
+    seeds = np.random.SeedSequence(seed).spawn(n_blocks)
+    task = {"p": p, "log_win": log_win, "log_loss": log_loss,
+            "odds_probs": np.asarray(odds_probs, dtype=float), "log_b0": np.log(bankroll0),
+            "n_bets": n_bets, "n_sims": n_sims, "block_rows": rows, "paths": paths}
+
+    # 1º bloco aqui: fixa a faixa do histograma (ou é tudo, se houver um bloco só)
+    final = np.empty(n_sims)
+    max_dd = np.empty(n_sims) if paths else None
+    m = min(rows, n_sims)
+    final[:m], first_paths = _simulate_block(np.random.default_rng(seeds[0]), task, m)
+    hist: Optional[_StepHistogram] = None
+    if paths:
+        max_dd[:m] = max_drawdown_pct(first_paths)
+        if n_blocks > 1:
+            hist = _StepHistogram.from_block(first_paths, n_bins)
+            hist.add(first_paths)
+
+    # demais blocos: fatias contíguas, uma por processo
+    pool_size = max(1, workers or os.cpu_count() or 1)
+    parts = [b for b in np.array_split(np.arange(1, n_blocks), min(pool_size, max(n_blocks - 1, 1))) if len(b)]
+    tasks = [{**task, "blocks": (int(b[0]), int(b[-1]) + 1), "seeds": seeds[b[0]:b[-1] + 1],
+              "hist": (hist.lo, hist.width, n_bins) if hist is not None else None} for b in parts]
+    if len(tasks) > 1:
+        results = list(shared_pool(pool_size).map(simulate_blocks, tasks))
+    else:
+        results = [simulate_blocks(t) for t in tasks]
+    for r in results:
+        sl = slice(r["row"], r["row"] + len(r["final"]))
+        final[sl] = r["final"]
+        if paths:
+            max_dd[sl] = r["max_drawdown"]
+            hist.merge(r["counts"], r["vmin"], r["vmax"])
+
+    out = {"final": np.exp(final)}
+    if paths:
+        out["max_drawdown"] = max_dd
+        qs = list(BAND_QUANTILES.values()) + list(quantile_grid if quantile_grid is not None else [])
+        log_q = np.percentile(first_paths, qs, axis=0).T if hist is None else hist.quantile(qs)
+        for i, name in enumerate(BAND_QUANTILES):
+            out[name] = np.exp(log_q[:, i])
+        if quantile_grid is not None:
+            out["quantiles"] = np.exp(log_q[:, len(BAND_QUANTILES):])
+    return out
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark de escala do hybrid_closing_sindicato.py sobre dados sintéticos
+(synthetic_closing.py) — 10k, 100k e 1M linhas por padrão.
+
+Duas partes:
+- etapas: cada função pesada isolada (market_features, fits logit, busca de
+  alpha, knn_residual_adjustment, simulate_bets, calibration_bins), com o
+  mesmo recorte 80/20 que o fold usa; melhor tempo e mediana de --repeat.
+- ponta a ponta: o script inteiro (com e sem --use-knn) via subprocess, com
+  --profile, guardando também os tempos por etapa do summary.json.
+
+A saída é um JSON (--out, padrão bench_baseline.json) com ambiente + resultados;
+--compare baseline_antigo.json imprime a razão novo/antigo por etapa e, com
+--max-slowdown, sai com código 1 se alguma etapa piorou além do limite.
+
+Uso:
+    python bench_hybrid.py                                    # baseline completo
+    python bench_hybrid.py --sizes 10000,100000 --e2e-sizes 10000 --out bench.json
+    python bench_hybrid.py --compare bench_baseline.json --max-slowdown 1.25
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+import sklearn
+
+import hybrid_closing_sindicato as hc
+from synthetic_closing import generate_closing
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "hybrid_closing_sindicato.py")
+
+
+def timeit(fn: Callable, repeat: int) -> Dict[str, float]:
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return {"wall_s_min": min(times), "wall_s_median": statistics.median(times)}
+
+
+def bench_stages(df: pd.DataFrame, repeat: int, knn_k: int, knn_test_rows: int) -> List[Dict]:
+    """Tempos por etapa num "fold" único: treino = 80% iniciais, validação/teste = 20% finais."""
+    n = len(df)
+    mapping = hc.detect_columns(df)
+    mk = hc.prepare_market_arrays(df, mapping, 2.5)
+    p1x2, pover = mk["p1x2_mkt"], mk["pover_mkt"]
+    y1x2, yover = mk["y_1x2"], mk["y_over01"]
+    X = hc.market_features(p1x2, pover).values.astype(float)
+    tr, va = hc.temporal_split(np.arange(n))
+
+    m1 = hc.fit_multinomial_logit(X[tr], y1x2[tr])
+    m2 = hc.fit_bin_logit(X[tr], yover[tr])
+    p_cal_1x2 = m1.predict_proba(X[va])
+    p_cal_ou = m2.predict_proba(X[va])[:, 1]
+    p_mod_1x2 = hc.shrink_mix(p1x2[va], p_cal_1x2, 0.8)
+    p_mod_ou = hc.shrink_mix(pover[va], p_cal_ou, 0.8)
+    resid = np.column_stack([np.eye(3)[y1x2[tr]] - m1.predict_proba(X[tr]), yover[tr] - m2.predict_proba(X[tr])[:, 1]])
+    te_knn = va[:knn_test_rows]
+    df_va = df.iloc[va]
+
+    stages = {
+        "prepare_market_arrays": (n, lambda: hc.prepare_market_arrays(df, mapping, 2.5)),
+        "market_features": (n, lambda: hc.market_features(p1x2, pover)),
+        "fit_multinomial_logit": (len(tr), lambda: hc.fit_multinomial_logit(X[tr], y1x2[tr])),
+        "fit_bin_logit": (len(tr), lambda: hc.fit_bin_logit(X[tr], yover[tr])),
+        "optimize_alpha_multiclass": (len(va), lambda: hc.optimize_alpha_multiclass(p1x2[va], p_cal_1x2, y1x2[va])),
+        "optimize_alpha_binary": (len(va), lambda: hc.optimize_alpha_binary(pover[va], p_cal_ou, yover[va])),
+        "knn_residual_adjustment": (len(te_knn), lambda: hc.knn_residual_adjustment(X[tr], resid, X[te_knn], k=knn_k)),
+        "simulate_bets": (len(va), lambda: hc.simulate_bets(
+            df_va, p1x2[va], p_mod_1x2, mk["odds_1x2"][va], y1x2[va], pover[va], p_mod_ou,
+            mk["odds_over"][va], mk["odds_under"][va], yover[va], stake_mode="fkelly",
+            ou_returns=mk["ou_returns"][va])),
+        "calibration_bins": (len(va), lambda: hc.calibration_bins(yover[va], p_mod_ou, n_bins=10)),
+    }
+    out = []
+    for name, (rows, fn) in stages.items():
+        m0 = hc.rss_mb()
+        r = timeit(fn, repeat)
+        out.append({"kind": "stage", "stage": name, "rows": int(n), "stage_rows": int(rows), **r,
+                    "rows_per_s": rows / max(r["wall_s_min"], 1e-12), "rss_delta_mb": hc.rss_mb() - m0})
+        print(f"  {name:28s} {rows:>9d} linhas  {r['wall_s_min']*1000:10.1f} ms")
+    return out
+
+
+def bench_e2e(csv_path: str, n: int, use_knn: bool, knn_k: int) -> Dict:
+    """Uma execução do script (6 folds: min_train = 40%, step = 10%) com --profile."""
+    with tempfile.TemporaryDirectory() as outdir:
+        cmd = [sys.executable, SCRIPT, "--data-url", csv_path, "--outdir", outdir, "--profile",
+               "--min-train", str(int(n * 0.4)), "--step", str(int(n * 0.1)), "--knn-k", str(knn_k)]
+        if use_knn:
+            cmd.append("--use-knn")
+        t0 = time.perf_counter()
+        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL)
+        wall = time.perf_counter() - t0
+        with open(os.path.join(outdir, "summary.json"), encoding="utf-8") as f:
+            timings = json.load(f)["timings"]
+    stage = "e2e_knn" if use_knn else "e2e"
+    print(f"  {stage:28s} {n:>9d} linhas  {wall:10.1f} s")
+    return {"kind": "e2e", "stage": stage, "rows": int(n), "wall_s_min": wall, "wall_s_median": wall,
+            "rows_per_s": n / wall, "process_peak_rss_mb": timings["process_peak_rss_mb"],
+            "stages": {k: v["wall_s"] for k, v in timings["stages"].items()}}
+
+
+def environment() -> Dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(SCRIPT)).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {"date": datetime.now(timezone.utc).isoformat(timespec="seconds"), "git_commit": commit,
+            "python": platform.python_version(), "platform": platform.platform(),
+            "cpu_count": os.cpu_count(), "numpy": np.__version__, "pandas": pd.__version__,
+            "sklearn": sklearn.__version__}
+
+
+def compare(new: Dict, old: Dict, max_slowdown: float = 0.0) -> int:
+    """Razão novo/antigo (melhor tempo) por (etapa, linhas); 1 se alguma passar de max_slowdown."""
+    key = lambda r: (r["stage"], r["rows"])
+    old_by = {key(r): r for r in old["results"]}
+    worst = 0.0
+    print(f"\nComparação com {old['env'].get('git_commit')} ({old['env'].get('date')}):")
+    for r in new["results"]:
+        o = old_by.get(key(r))
+        if o is None:
+            continue
+        ratio = r["wall_s_min"] / max(o["wall_s_min"], 1e-12)
+        worst = max(worst, ratio)
+        flag = "  <-- mais lento" if max_slowdown and ratio > max_slowdown else ""
+        print(f"  {r['stage']:28s} {r['rows']:>9d}  {o['wall_s_min']:9.4f}s -> {r['wall_s_min']:9.4f}s  x{ratio:5.2f}{flag}")
+    return int(bool(max_slowdown) and worst > max_slowdown)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark de escala do hybrid_closing_sindicato.py.")
+    ap.add_argument("--sizes", default="10000,100000,1000000", help="Tamanhos para as etapas isoladas.")
+    ap.add_argument("--e2e-sizes", default="10000,100000",
+                    help="Tamanhos para as execuções ponta a ponta (com e sem --use-knn); vazio desliga.")
+    ap.add_argument("--repeat", type=int, default=3, help="Repetições por etapa (reporta melhor e mediana).")
+    ap.add_argument("--knn-k", type=int, default=200)
+    ap.add_argument("--knn-test-rows", type=int, default=10000,
+                    help="Linhas consultadas no knn_residual_adjustment isolado (o índice usa o treino inteiro).")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", default="bench_baseline.json")
+    ap.add_argument("--compare", default=None, help="JSON de um baseline anterior para comparar.")
+    ap.add_argument("--max-slowdown", type=float, default=0.0,
+                    help="Com --compare: código de saída 1 se alguma etapa ficar mais lenta que este fator.")
+    args = ap.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    e2e_sizes = [int(s) for s in args.e2e_sizes.split(",") if s.strip()]
+    results: List[Dict] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sorted(set(sizes) | set(e2e_sizes)):
+            df = generate_closing(n, seed=args.seed)
+            print(f"{n} linhas:")
+            if n in sizes:
+                results += bench_stages(df, args.repeat, args.knn_k, args.knn_test_rows)
+            if n in e2e_sizes:
+                csv_path = os.path.join(tmp, f"synth_{n}.csv")
+                df.to_csv(csv_path, index=False)
+                results += [bench_e2e(csv_path, n, use_knn, args.knn_k) for use_knn in (False, True)]
+
+    # pico acumulado deste processo (todas as etapas isoladas): uma vez só, não por etapa
+    report = {"env": environment(), "config": vars(args), "results": results,
+              "process_peak_rss_mb": hc.process_peak_rss_mb()}
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print("OK. Baseline em:", args.out)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            sys.exit(compare(report, json.load(f), args.max_slowdown))
+
+
+if __name__ == "__main__":
+    main()
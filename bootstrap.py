@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Intervalos de confiança por block bootstrap (blocos de datas) — vetorizado.
+
+Jogos do mesmo período não são independentes (rodadas, notícias, movimento do
+mercado), então a reamostragem é por blocos de datas: cada réplica sorteia B
+blocos com reposição, e apostas e linhas de teste de um bloco entram juntas.
+
+Nada é reamostrado linha a linha: cada bloco vira um resumo (somas, e para o
+drawdown o mínimo/máximo do caminho dentro do bloco), e as R réplicas são uma
+matriz de índices (R, B) aplicada a esses resumos — 10k réplicas custam o mesmo
+que algumas operações em arrays (R, B).
+
+Métricas:
+- yield:        sum(pnl) / sum(stake)                (= bets_roi do summary)
+- roi:          bankroll final / bankroll inicial - 1
+- max_drawdown: drawdown relativo máximo do bankroll (caminho na ordem sorteada)
+- *_improvement: métrica do mercado - métrica do modelo, por linha de teste
+  (positivo = modelo melhor), para LogLoss/Brier 1x2 e O/U
+
+roi e drawdown reamostram o fator de crescimento de cada aposta
+(bankroll depois / antes), então reproduzem exatamente a simulação na ordem
+original; com stake flat, as réplicas tratam cada aposta pelo seu impacto relativo.
+
+Uso:
+    from bootstrap import date_blocks, block_bootstrap
+    blocks = date_blocks(dates, days=7)
+    ci = block_bootstrap(row_blocks, row_metrics, bet_blocks, stake, pnl, bankroll0=100)
+"""
+
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+_EPS = 1e-15
+
+
+def date_blocks(dates: Optional[np.ndarray], n: Optional[int] = None,
+                days: int = 7, rows_per_block: int = 200) -> np.ndarray:
+    """
+    Código de bloco (0..B-1, crescente no tempo) por linha. Com datas: janelas
+    de `days` dias a partir da primeira data (NaT herda o bloco da linha
+    anterior). Sem datas: blocos de `rows_per_block` linhas consecutivas.
+    """
+    if dates is None:
+        return np.arange(n) // rows_per_block
+    t = pd.Series(pd.to_datetime(dates)).ffill().bfill()
+    if t.isna().all():
+        return np.arange(len(t)) // rows_per_block
+    k = ((t - t.min()).dt.days // days).to_numpy()
+    return np.unique(k, return_inverse=True)[1]
+
+
+def row_score_diffs(y_1x2: np.ndarray, p_mkt_1x2: np.ndarray, p_mod_1x2: np.ndarray,
+                    y_over01: np.ndarray, p_mkt_over: np.ndarray, p_mod_over: np.ndarray) -> Dict[str, np.ndarray]:
+    """Melhora por linha (mercado - modelo) de LogLoss/Brier, 1x2 e O/U."""
+    n = len(y_1x2)
+    y = np.asarray(y_1x2, dtype=int)
+    yo = np.asarray(y_over01, dtype=float)
+    onehot = np.zeros((n, 3))
+    onehot[np.arange(n), y] = 1.0
+
+    def ll_1x2(p):
+        return -np.log(np.clip(p[np.arange(n), y], _EPS, 1.0))
+
+    def ll_ou(p):
+        return -np.log(np.clip(np.where(yo == 1, p, 1.0 - p), _EPS, 1.0))
+
+    return {
+        "logloss_1x2_improvement": ll_1x2(p_mkt_1x2) - ll_1x2(p_mod_1x2),
+        "brier_1x2_improvement": ((p_mkt_1x2 - onehot) ** 2).sum(axis=1) - ((p_mod_1x2 - onehot) ** 2).sum(axis=1),
+        "logloss_ou_improvement": ll_ou(p_mkt_over) - ll_ou(p_mod_over),
+        "brier_ou_improvement": (p_mkt_over - yo) ** 2 - (p_mod_over - yo) ** 2,
+    }
+
+
+def _path_blocks(blocks: np.ndarray, step: np.ndarray, n_blocks: int) -> Dict[str, np.ndarray]:
+    """
+    Resumo por bloco de um caminho aditivo (passos `step` em ordem): soma S,
+    mínimo m e máximo M das somas parciais (incluindo 0 no início do bloco) e
+    maior queda interna d. Concatenar blocos com esses resumos dá o drawdown
+    exato do caminho concatenado (ver _max_drawdown).
+    """
+    S = np.bincount(blocks, weights=step, minlength=n_blocks)
+    m = np.zeros(n_blocks)
+    M = np.zeros(n_blocks)
+    d = np.zeros(n_blocks)
+    if len(step):
+        c = pd.Series(step).groupby(blocks).cumsum()
+        run_max = np.maximum(c.groupby(blocks).cummax().to_numpy(), 0.0)
+        c = c.to_numpy()
+        np.minimum.at(m, blocks, c)
+        np.maximum.at(M, blocks, c)
+        np.maximum.at(d, blocks, run_max - c)
+    return {"S": S, "m": m, "M": M, "d": d}
+
+
+def _max_drawdown(path: Dict[str, np.ndarray], idx: np.ndarray) -> np.ndarray:
+    """Drawdown (no espaço do caminho aditivo) de cada réplica idx (R, B)."""
+    S, m, M, d = (path[k][idx] for k in ("S", "m", "M", "d"))
+    start = np.cumsum(S, axis=1) - S
+    top = np.maximum.accumulate(start + M, axis=1)
+    peak_before = np.maximum(np.hstack([np.zeros((len(idx), 1)), top[:, :-1]]), 0.0)
+    return np.maximum(d, peak_before - (start + m)).max(axis=1)
+
+
+def block_bootstrap(row_blocks: np.ndarray, row_metrics: Dict[str, np.ndarray],
+                    bet_blocks: np.ndarray, stake: np.ndarray, pnl: np.ndarray,
+                    bankroll0: float = 100.0, n_resamples: int = 10_000,
+                    ci: float = 0.95, seed: int = 0,
+                    max_cells: int = 2_000_000) -> Dict[str, Dict[str, float]]:
+    """
+    IC percentil por block bootstrap. row_blocks/bet_blocks: bloco (mesma
+    codificação) de cada linha de teste / aposta, apostas em ordem cronológica.
+    row_metrics: {nome: valor por linha} — a estatística é a média. Retorna
+    {métrica: {"point", "lo", "hi"}}; a estimativa pontual é a da amostra original
+    (None onde a métrica não existe, ex: yield sem apostas).
+    """
+    row_blocks = np.asarray(row_blocks, dtype=np.int64)
+    bet_blocks = np.asarray(bet_blocks, dtype=np.int64)
+    n_blocks = int(max(row_blocks.max(initial=-1), bet_blocks.max(initial=-1)) + 1)
+    stake = np.asarray(stake, dtype=float)
+    pnl = np.asarray(pnl, dtype=float)
+
+    # somas por bloco: toda métrica de razão é (soma numerador) / (soma denominador)
+    n_rows = np.bincount(row_blocks, minlength=n_blocks).astype(float)
+    sums = {k: np.bincount(row_blocks, weights=v, minlength=n_blocks) for k, v in row_metrics.items()}
+    s_stake = np.bincount(bet_blocks, weights=stake, minlength=n_blocks)
+    s_pnl = np.bincount(bet_blocks, weights=pnl, minlength=n_blocks)
+    after = bankroll0 + np.cumsum(pnl)
+    before = np.concatenate([[bankroll0], after[:-1]])
+    log_g = np.log(np.clip(after, _EPS, None) / np.clip(before, _EPS, None))
+    path = _path_blocks(bet_blocks, log_g, n_blocks)
+
+    def stats(idx: np.ndarray) -> Dict[str, np.ndarray]:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            out = {k: v[idx].sum(axis=1) / n_rows[idx].sum(axis=1) for k, v in sums.items()}
+            out["yield"] = s_pnl[idx].sum(axis=1) / s_stake[idx].sum(axis=1)
+        out["roi"] = np.expm1(path["S"][idx].sum(axis=1))
+        out["max_drawdown"] = -np.expm1(-_max_drawdown(path, idx))
+        return out
+
+    point = {k: float(v[0]) for k, v in stats(np.arange(n_blocks)[None, :]).items()}
+    rng = np.random.default_rng(seed)
+    chunk = max(1, max_cells // max(n_blocks, 1))
+    draws: Dict[str, list] = {k: [] for k in point}
+    for start in range(0, n_resamples, chunk):
+        idx = rng.integers(0, n_blocks, size=(min(chunk, n_resamples - start), n_blocks))
+        for k, v in stats(idx).items():
+            draws[k].append(v)
+    q = [50 * (1 - ci), 50 * (1 + ci)]
+    out = {}
+    for k, v in draws.items():
+        v = np.concatenate(v)
+        v = v[np.isfinite(v)]
+        lo, hi = np.percentile(v, q) if len(v) else (np.nan, np.nan)
+        # sem apostas/linhas (ex: yield sem stake) -> None no JSON
+        out[k] = {name: (float(x) if np.isfinite(x) else None)
+                  for name, x in (("point", point[k]), ("lo", lo), ("hi", hi))}
+    return out
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Calibração por classe, fold e segmento — tudo com np.bincount.
+
+Para cada fonte (ex: mercado / modelo), cada alvo (H, D, A, Over) e cada recorte
+(geral, fold, liga, faixa de odd, ...), acumula por bin de probabilidade:
+contagem, soma de p, soma de p^2 e soma de y. Daí saem a tabela de
+confiabilidade (p médio x frequência observada), ECE, MCE e sharpness (variância
+das previsões) — sem laço por bin nem por grupo: cada chunk de linhas vira uma
+única chave inteira (fonte, recorte, alvo, grupo, bin) e um bincount por soma.
+
+Acumulador incremental: o backtest em memória chama add() uma vez (internamente
+em blocos de linhas), o --stream chama por chunk. Grupos chegam como rótulos
+(fold, liga...) e ganham códigos estáveis entre chunks.
+
+Uso:
+    from calibration import CalibrationAccumulator
+    acc = CalibrationAccumulator(["H", "D", "A", "Over"], odds_bands=[1.5, 2, 3, 5])
+    acc.add(y, {"market": p_mkt, "model": p_mod}, odds=odds, groups={"fold": folds})
+    reliability_df, summary_df = acc.tables()
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+_N_SUMS = 4  # count, sum p, sum p^2, sum y
+NO_ODDS = "sem odd"  # grupo do recorte odds_band para odd ausente (NaN/inf)
+
+
+def bin_index(p: np.ndarray, n_bins: int = 10) -> np.ndarray:
+    """Bin de cada probabilidade (bins iguais em [0, 1]; 1.0 cai no último)."""
+    return np.clip(np.digitize(p, np.linspace(0, 1, n_bins + 1)) - 1, 0, n_bins - 1)
+
+
+def odds_band_names(edges: Sequence[float]) -> List[str]:
+    """[1.5, 2, 3] -> ["<1.50", "1.50-2.00", "2.00-3.00", ">=3.00"]."""
+    e = [f"{x:.2f}" for x in edges]
+    return [f"<{e[0]}"] + [f"{a}-{b}" for a, b in zip(e[:-1], e[1:])] + [f">={e[-1]}"]
+
+
+class CalibrationAccumulator:
+    """
+    Somas por (fonte, recorte, alvo, grupo, bin). targets: nomes das colunas de
+    y/p (ex: H, D, A, Over). odds_bands: cortes das faixas de odd (recorte
+    "odds_band", por alvo, a partir da odd daquele alvo; odd ausente/inválida
+    vai para o grupo "sem odd"); None desliga.
+    """
+    def __init__(self, targets: Sequence[str], n_bins: int = 10,
+                 odds_bands: Optional[Sequence[float]] = None, chunk_rows: int = 250_000):
+        self.targets = list(targets)
+        self.n_bins = n_bins
+        self.odds_bands = list(odds_bands) if odds_bands else None
+        self.chunk_rows = chunk_rows
+        self.sources: List[str] = []
+        self.group_names: Dict[str, List[str]] = {"all": ["all"]}
+        if self.odds_bands:
+            self.group_names["odds_band"] = odds_band_names(self.odds_bands) + [NO_ODDS]
+        self._code_of: Dict[str, Dict] = {}
+        self.sums: Dict[Tuple[str, str], np.ndarray] = {}  # (fonte, recorte) -> (_N_SUMS, T, G, bins)
+
+    def _codes(self, breakdown: str, labels: np.ndarray) -> np.ndarray:
+        """Rótulos -> códigos estáveis entre chamadas (novos grupos vão para o fim)."""
+        inv, uniq = pd.factorize(np.asarray(labels), use_na_sentinel=False)  # hash, sem ordenar strings
+        names = self.group_names.setdefault(breakdown, [])
+        code_of = self._code_of.setdefault(breakdown, {})
+        for u in map(str, uniq):
+            if u not in code_of:
+                code_of[u] = len(names)
+                names.append(u)
+        return np.array([code_of[u] for u in map(str, uniq)], dtype=np.int64)[inv]
+
+    def add(self, y: np.ndarray, probs: Dict[str, np.ndarray], odds: Optional[np.ndarray] = None,
+            groups: Optional[Dict[str, np.ndarray]] = None):
+        """
+        y: (n, T) 0/1; probs: {fonte: (n, T)}; odds: (n, T) para as faixas de odd;
+        groups: {recorte: rótulos (n,)} (ex: fold, liga).
+        """
+        n = len(y)
+        for start in range(0, n, self.chunk_rows):
+            sl = slice(start, min(n, start + self.chunk_rows))
+            self._add_chunk(y[sl], {s: p[sl] for s, p in probs.items()},
+                            None if odds is None else odds[sl],
+                            {k: v[sl] for k, v in (groups or {}).items()})
+
+    def _add_chunk(self, y, probs, odds, groups):
+        n, T, nb = len(y), len(self.targets), self.n_bins
+        # códigos de grupo (n, T) por recorte
+        codes = {"all": np.zeros((n, T), dtype=np.int64)}
+        if self.odds_bands and odds is not None:
+            # digitize manda NaN para a última faixa: odd não finita tem grupo próprio
+            codes["odds_band"] = np.where(np.isfinite(odds), np.digitize(odds, self.odds_bands),
+                                          len(self.odds_bands) + 1).astype(np.int64)
+        for name, labels in groups.items():
+            codes[name] = np.broadcast_to(self._codes(name, labels)[:, None], (n, T))
+        for s in probs:
+            if s not in self.sources:
+                self.sources.append(s)
+
+        # layout plano: bloco por (fonte, recorte) de tamanho T*G*bins, na ordem de `blocks`
+        blocks, keys, offset = [], [], 0
+        t_idx = np.arange(T)[None, :]
+        for s, p in probs.items():
+            b = bin_index(p, nb)
+            for name, c in codes.items():
+                G = len(self.group_names[name])
+                keys.append(offset + (t_idx * G + c) * nb + b)
+                blocks.append((s, name, G, offset))
+                offset += T * G * nb
+        key = np.concatenate([k.ravel() for k in keys])
+        pv = np.concatenate([np.broadcast_to(probs[s], (n, T)).ravel() for s, name, _, _ in blocks])
+        yv = np.tile(np.asarray(y, dtype=float).ravel(), len(blocks))
+        flat = np.vstack([np.bincount(key, minlength=offset),
+                          np.bincount(key, weights=pv, minlength=offset),
+                          np.bincount(key, weights=pv * pv, minlength=offset),
+                          np.bincount(key, weights=yv, minlength=offset)])
+
+        for s, name, G, off in blocks:
+            part = flat[:, off:off + T * G * nb].reshape(_N_SUMS, T, G, nb)
+            acc = self.sums.get((s, name))
+            if acc is None:
+                acc = np.zeros((_N_SUMS, T, G, nb))
+            elif acc.shape[2] < G:  # grupos novos desde o último chunk
+                acc = np.concatenate([acc, np.zeros((_N_SUMS, T, G - acc.shape[2], nb))], axis=2)
+            acc += part
+            self.sums[(s, name)] = acc
+
+    def tables(self) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        (confiabilidade, resumo). Confiabilidade: uma linha por bin não vazio.
+        Resumo por (fonte, alvo, recorte, grupo): count, p_mean, y_rate, ECE, MCE, sharpness.
+        """
+        rel, summ = [], []
+        for (s, name), acc in self.sums.items():
+            cnt, ps, p2, ys = acc
+            T, G, nb = cnt.shape
+            with np.errstate(invalid="ignore", divide="ignore"):
+                p_mean, y_rate = ps / cnt, ys / cnt
+                gap = np.abs(p_mean - y_rate)
+                n_g = cnt.sum(axis=2)
+                ece = np.nansum(cnt * gap, axis=2) / n_g
+                mce = np.where(n_g > 0, np.nanmax(np.where(cnt > 0, gap, -np.inf), axis=2), np.nan)
+                pm_g = ps.sum(axis=2) / n_g
+                sharp = p2.sum(axis=2) / n_g - pm_g ** 2
+                yr_g = ys.sum(axis=2) / n_g
+            t, g, b = np.nonzero(cnt)
+            rel.append(pd.DataFrame({
+                "source": s, "target": np.asarray(self.targets)[t], "breakdown": name,
+                "group": np.asarray(self.group_names[name], dtype=object)[g], "bin": b,
+                "count": cnt[t, g, b].astype(int), "p_mean": p_mean[t, g, b], "y_rate": y_rate[t, g, b]}))
+            t, g = np.nonzero(n_g)
+            summ.append(pd.DataFrame({
+                "source": s, "target": np.asarray(self.targets)[t], "breakdown": name,
+                "group": np.asarray(self.group_names[name], dtype=object)[g],
+                "count": n_g[t, g].astype(int), "p_mean": pm_g[t, g], "y_rate": yr_g[t, g],
+                "ece": ece[t, g], "mce": mce[t, g], "sharpness": np.maximum(sharp[t, g], 0.0)}))
+        return pd.concat(rel, ignore_index=True), pd.concat(summ, ignore_index=True)
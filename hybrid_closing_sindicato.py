@@ -6,11 +6,11 @@ Autor: ChatGPT (customizado para Fulltrader)
 
 Objetivo:
 - Usar APENAS Closing Line (odds 1x2 + odds O/U) para:
-  1) Remover margem do book (probabilidades "fair")
+  1) Remover margem do book (probabilidades "fair") — proporcional, power, odds-ratio ou Shin (--devig)
   2) Calibrar o mercado (logistic / multinomial logistic)
   3) Aplicar shrinkage para o mercado (alpha otimizado)
   4) Ajuste residual com KNN kernel (opcional)
-  5) Walk-forward backtest (expanding window)
+  5) Walk-forward backtest (expanding window, ou janela deslizante com --window/--window-days)
   6) Relatórios: LogLoss/Brier, calibração por bins, e simulação de apostas (ROI, DD)
   7) Exportar previsões + apostas sugeridas
 
@@ -21,20 +21,44 @@ python hybrid_closing_sindicato.py \
   --outdir "out" \
   --min-edge 0.02 \
   --stake-mode "fkelly" \
-  --fkelly 0.25
+  --fkelly 0.25 \
+  --jobs 4
 
 Observações:
 - Para CLV de verdade você precisaria também da odd "que você pegou" no momento da aposta.
   Com apenas Closing Line, CLV não se aplica; aqui reportamos "edge vs closing" e performance simulada apostando no closing.
+- --jobs N roda os folds em N processos (BLAS limitado por worker); a saída é idêntica à serial.
+- --ou-lines 1.5,3.5,2.25 avalia outras linhas O/U na mesma passada (features e 1x2 uma vez só);
+  --ou-line-col usa a linha de cada jogo. Linhas inteiras/.25/.75 liquidam com push / meio ganho.
+- --partition-by League treina um stack por liga dentro de cada fold (ligas pequenas usam o global).
+- --window N / --window-days D: treino só nas últimas N linhas / D dias antes de cada fold (custo por
+  fold constante); --decay-half-life H pondera o treino dos calibradores por 0.5^(idade/H) (dias; linhas sem data).
+- Previsões walk-forward em predictions_walkforward.parquet (--pred-format npz; --pred-csv também grava o CSV).
+- calibration_summary.csv: ECE/MCE/sharpness de H, D, A e Over por fold, liga (--calib-by) e faixa de odd.
+- summary.json/REPORT.md trazem ICs por block bootstrap (blocos de 7 dias, 10k réplicas; --bootstrap 0 desliga).
+- --profile grava timings.csv (wall/CPU/RSS atual e variação de RSS por etapa e fold) e o resumo em
+  summary.json (com o pico de RSS acumulado do processo principal e dos workers, uma vez só);
+  --profile-dump re-executa o fold mais lento sob cProfile (profile_fold<k>.prof).
+- Jogos de hoje sem re-rodar o backtest:
+    --mode fit --data-url historico.csv --outdir out            (grava out/model.joblib)
+    --mode predict --data-url jogos_hoje.csv --outdir out       (predictions_live.csv + bets_live.csv)
+    --mode serve --model out/model.joblib --port 8765           (POST /score com {"rows": [...]})
+  ou em Python: HybridScorer.load("out/model.joblib").score(df_jogos).
+- --mode tune escolhe --knn-k/--knn-sigma/--logit-C: uma consulta KNN (k máximo) por fold serve toda a
+  grade, com successive halving na validação de cada fold (tune_results.csv, tune_best.csv).
 """
 
 import argparse
+import copy
 import io
 import os
 import sys
 import math
+import re
 import json
+import time
 import warnings
+from contextlib import contextmanager
 from dataclasses import dataclass
 from typing import Dict, List, Tuple, Optional
 
@@ -47,6 +71,10 @@ from sklearn.neighbors import NearestNeighbors
 
 import matplotlib.pyplot as plt
 
+from devig import METHODS as DEVIG_METHODS, remove_margin
+from bootstrap import block_bootstrap, date_blocks, row_score_diffs
+from calibration import CalibrationAccumulator, bin_index
+
 warnings.filterwarnings("ignore")
 
 
@@ -66,18 +94,20 @@ def remove_margin_proportional(inv_probs):
     s = inv_probs.sum(axis=1, keepdims=True)
     return _safe_div(inv_probs, s)
 
-def odds_to_fair_probs_1x2(odds_h, odds_d, odds_a):
+def odds_to_fair_probs_1x2(odds_h, odds_d, odds_a, method: str = "proportional"):
     inv = odds_to_implied_probs_1x2(odds_h, odds_d, odds_a)
-    return remove_margin_proportional(inv)
+    if method == "proportional":
+        return remove_margin_proportional(inv)
+    return remove_margin(inv, method=method)
 
 def odds_to_implied_prob_ou(odds_over, odds_under):
     inv_o = _safe_div(1.0, odds_over)
     inv_u = _safe_div(1.0, odds_under)
     return np.vstack([inv_o, inv_u]).T
 
-def odds_to_fair_prob_over(odds_over, odds_under):
+def odds_to_fair_prob_over(odds_over, odds_under, method: str = "proportional"):
     inv = odds_to_implied_prob_ou(odds_over, odds_under)
-    fair = remove_margin_proportional(inv)
+    fair = remove_margin_proportional(inv) if method == "proportional" else remove_margin(inv, method=method)
     return fair[:, 0]  # prob Over fair
 
 def softmax(x):
@@ -120,6 +150,18 @@ def market_features(p1x2_fair: np.ndarray, pover_fair: np.ndarray) -> pd.DataFra
     })
     return df
 
+ODDS_BANDS = np.array([0.40, 0.50, 0.60, 0.70])  # prob. do favorito
+
+def alpha_segments(df: pd.DataFrame, X_df: pd.DataFrame, spec: str) -> Tuple[np.ndarray, int]:
+    """Códigos inteiros de segmento (0..S-1) para alpha por segmento."""
+    if spec == "odds_band":
+        codes = np.digitize(X_df["fav"].values, ODDS_BANDS)
+        return codes.astype(np.int64), len(ODDS_BANDS) + 1
+    if spec not in df.columns:
+        raise ValueError(f"Coluna de segmento '{spec}' não encontrada.")
+    codes, uniques = pd.factorize(df[spec].astype(str), sort=True)
+    return codes.astype(np.int64), len(uniques)
+
 # ----------------------------
 # Métricas e calibração
 # ----------------------------
@@ -132,18 +174,40 @@ def brier_binary(y_true01: np.ndarray, p_pred: np.ndarray) -> float:
     y_true01 = y_true01.astype(float)
     return float(np.mean((p_pred - y_true01) ** 2))
 
+def calibration_sums(y_true01: np.ndarray, p_pred: np.ndarray, n_bins: int = 10) -> np.ndarray:
+    """(3, n_bins): contagem, soma de p e soma de y por bin — somáveis entre blocos (--stream)."""
+    idx = bin_index(p_pred, n_bins)
+    return np.vstack([np.bincount(idx, minlength=n_bins),
+                      np.bincount(idx, weights=p_pred, minlength=n_bins),
+                      np.bincount(idx, weights=np.asarray(y_true01, dtype=float), minlength=n_bins)])
+
+def calibration_table(sums: np.ndarray) -> pd.DataFrame:
+    """Tabela bin/count/p_mean/y_rate a partir de calibration_sums."""
+    cnt, psum, ysum = sums
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return pd.DataFrame({"bin": np.arange(len(cnt)), "count": cnt.astype(int),
+                             "p_mean": np.where(cnt > 0, psum / cnt, np.nan),
+                             "y_rate": np.where(cnt > 0, ysum / cnt, np.nan)})
+
 def calibration_bins(y_true01: np.ndarray, p_pred: np.ndarray, n_bins: int = 10) -> pd.DataFrame:
-    bins = np.linspace(0, 1, n_bins + 1)
-    idx = np.digitize(p_pred, bins) - 1
-    idx = np.clip(idx, 0, n_bins - 1)
-    rows = []
-    for b in range(n_bins):
-        m = idx == b
-        if m.sum() == 0:
-            rows.append({"bin": b, "count": 0, "p_mean": np.nan, "y_rate": np.nan})
-        else:
-            rows.append({"bin": b, "count": int(m.sum()), "p_mean": float(p_pred[m].mean()), "y_rate": float(y_true01[m].mean())})
-    return pd.DataFrame(rows)
+    """Confiabilidade de um alvo binário (ver calibration.py para o recorte completo)."""
+    return calibration_table(calibration_sums(y_true01, p_pred, n_bins))
+
+def metrics_1x2(y_true: np.ndarray, p_mkt: np.ndarray, p_mod: np.ndarray) -> Dict[str, float]:
+    return {
+        "logloss_mkt_1x2": log_loss(y_true, p_mkt, labels=[0,1,2]),
+        "logloss_mod_1x2": log_loss(y_true, p_mod, labels=[0,1,2]),
+        "brier_mkt_1x2": brier_multiclass(y_true, p_mkt),
+        "brier_mod_1x2": brier_multiclass(y_true, p_mod),
+    }
+
+def metrics_ou(y_true01: np.ndarray, p_mkt: np.ndarray, p_mod: np.ndarray, suffix: str = "") -> Dict[str, float]:
+    return {
+        f"logloss_mkt_ou{suffix}": log_loss(y_true01, np.vstack([1-p_mkt, p_mkt]).T, labels=[0,1]),
+        f"logloss_mod_ou{suffix}": log_loss(y_true01, np.vstack([1-p_mod, p_mod]).T, labels=[0,1]),
+        f"brier_mkt_ou{suffix}": brier_binary(y_true01, p_mkt),
+        f"brier_mod_ou{suffix}": brier_binary(y_true01, p_mod),
+    }
 
 # ----------------------------
 # Simulação de apostas
@@ -168,6 +232,58 @@ def kelly_fraction(p: float, o: float) -> float:
     f = (p*b - q) / (b + 1e-12)
     return max(0.0, f)
 
+def kelly_fraction_array(p: np.ndarray, o: np.ndarray) -> np.ndarray:
+    """kelly_fraction vetorizado (NaN/negativo -> 0, como max(0.0, f))."""
+    b = o - 1.0
+    q = 1.0 - p
+    f = (p*b - q) / (b + 1e-12)
+    return np.where(f > 0, f, 0.0)
+
+SELECTIONS = np.array(["H", "D", "A", "Over", "Under"])
+MARKETS = np.array(["1x2", "1x2", "1x2", "OU", "OU"])
+
+def bet_candidates(p_market_1x2, p_model_1x2, odds_1x2, y_1x2,
+                   p_market_over, p_model_over, odds_over, odds_under, y_over01,
+                   ou_returns=None, markets=("1x2", "OU")):
+    """
+    Matrizes (n,5) [H,D,A,Over,Under]: prob. modelo, prob. mercado, odds, edge,
+    ganhou e retorno por unidade apostada. ou_returns (n,2) substitui o payoff
+    O/U (linhas asiáticas: push / meio ganho); markets restringe os candidatos
+    (edge NaN nos mercados fora da lista).
+    """
+    p_over_mod = np.asarray(p_model_over, dtype=float)
+    p_over_mkt = np.asarray(p_market_over, dtype=float)
+    pmod = np.column_stack([p_model_1x2, p_over_mod, 1.0 - p_over_mod]).astype(float)
+    pmkt = np.column_stack([p_market_1x2, p_over_mkt, 1.0 - p_over_mkt]).astype(float)
+    odds = np.column_stack([odds_1x2, odds_over, odds_under]).astype(float)
+    y_over01 = np.asarray(y_over01)
+    won_all = np.column_stack([
+        np.asarray(y_1x2)[:, None] == np.arange(3)[None, :],
+        y_over01 == 1,
+        y_over01 == 0,
+    ])
+    ret = np.where(won_all, odds - 1.0, -1.0)
+    if ou_returns is not None:
+        ret[:, 3:] = ou_returns
+        won_all[:, 3:] = np.where(np.isnan(ou_returns), won_all[:, 3:], ou_returns > 0)
+    edge = pmod - pmkt
+    for m in ("1x2", "OU"):
+        if m not in markets:
+            edge[:, MARKETS == m] = np.nan
+    return pmod, pmkt, odds, edge, won_all, ret
+
+def select_bets(edge: np.ndarray, min_edge: float, max_bets_per_game: int) -> Tuple[np.ndarray, np.ndarray]:
+    """(linhas, colunas) das apostas: até max_bets_per_game maiores edges >= min_edge por jogo."""
+    ok = edge >= min_edge                                    # NaN -> False
+    ranked = np.argsort(np.where(ok, -edge, np.inf), axis=1, kind="stable")[:, :max(0, max_bets_per_game)]
+    take = np.take_along_axis(ok, ranked, axis=1)
+    rows, rank = np.nonzero(take)                            # ordem: jogo, depois edge desc
+    return rows, ranked[rows, rank]
+
+def kelly_stake_fraction(p: np.ndarray, o: np.ndarray, fkelly: float, max_kelly: float) -> np.ndarray:
+    """Fração do bankroll apostada no modo fkelly: min(Kelly, max_kelly) * fkelly."""
+    return np.minimum(kelly_fraction_array(p, o), max_kelly) * fkelly
+
 def simulate_bets(df_test: pd.DataFrame,
                   p_market_1x2: np.ndarray,
                   p_model_1x2: np.ndarray,
@@ -184,100 +300,293 @@ def simulate_bets(df_test: pd.DataFrame,
                   fkelly: float = 0.25,
                   max_kelly: float = 0.03,
                   max_bets_per_game: int = 1,
-                  bankroll0: float = 100.0) -> Tuple[pd.DataFrame, pd.DataFrame]:
+                  bankroll0: float = 100.0,
+                  ou_returns: Optional[np.ndarray] = None,
+                  markets: Tuple[str, ...] = ("1x2", "OU")) -> Tuple[pd.DataFrame, pd.DataFrame]:
     """
     Simula apostas no closing (teórico).
     - Escolhe a maior edge por jogo, respeitando max_bets_per_game.
     - stake_mode: flat | fkelly
+    - ou_returns: payoff O/U por unidade (ver ou_unit_returns), para linhas asiáticas.
+    - markets: mercados apostáveis (ex: ("OU",) na simulação por linha).
+    Vetorizado: matriz (n,5) de edges [H,D,A,Over,Under], seleção por argsort
+    estável (empate mantém a ordem H,D,A,Over,Under) e liquidação em bloco;
+    no fkelly o bankroll é um cumprod dos fatores (1 + f*r) de cada aposta.
     """
-    bankroll = bankroll0
-    bankroll_path = []
-    bets: List[Bet] = []
-
     n = len(df_test)
-    for i in range(n):
-        candidates = []
-
-        # 1x2: avaliar H,D,A
-        for k, sel in enumerate(["H", "D", "A"]):
-            edge = float(p_model_1x2[i, k] - p_market_1x2[i, k])
-            if edge >= min_edge:
-                candidates.append(("1x2", sel, p_model_1x2[i, k], p_market_1x2[i, k], odds_1x2[i, k], edge))
-
-        # OU: Over/Under
-        edge_over = float(p_model_over[i] - p_market_over[i])
-        if edge_over >= min_edge:
-            candidates.append(("OU", "Over", float(p_model_over[i]), float(p_market_over[i]), float(odds_over[i]), edge_over))
-        edge_under = float((1.0 - p_model_over[i]) - (1.0 - p_market_over[i]))
-        if edge_under >= min_edge:
-            candidates.append(("OU", "Under", float(1.0 - p_model_over[i]), float(1.0 - p_market_over[i]), float(odds_under[i]), edge_under))
-
-        # ordenar por edge desc
-        candidates.sort(key=lambda x: x[-1], reverse=True)
-        candidates = candidates[:max_bets_per_game]
-
-        # executar
-        for (market, sel, pmod, pmkt, odds, edge) in candidates:
-            if stake_mode == "flat":
-                stake = flat_stake
-            else:
-                fk = kelly_fraction(pmod, odds)
-                fk = min(fk, max_kelly)
-                stake = bankroll * fk * fkelly
-
-            # resultado
-            if market == "1x2":
-                won = 1 if (y_1x2[i] == {"H":0,"D":1,"A":2}[sel]) else 0
-            else:
-                won = 1 if ((y_over01[i] == 1 and sel == "Over") or (y_over01[i] == 0 and sel == "Under")) else 0
-
-            pnl = stake * (odds - 1.0) if won else -stake
-            bankroll += pnl
-
-            bets.append(Bet(
-                idx=int(df_test.index[i]),
-                market=market,
-                selection=sel,
-                prob_model=float(pmod),
-                prob_market=float(pmkt),
-                odds=float(odds),
-                edge=float(edge),
-                stake=float(stake),
-                won=int(won),
-                pnl=float(pnl)
-            ))
-
-        bankroll_path.append({"row": int(df_test.index[i]), "bankroll": float(bankroll)})
-
-    bets_df = pd.DataFrame([b.__dict__ for b in bets]) if bets else pd.DataFrame(columns=[f.name for f in Bet.__dataclass_fields__.values()])
-    bankroll_df = pd.DataFrame(bankroll_path)
+    pmod, pmkt, odds, edge, won_all, ret_all = bet_candidates(
+        p_market_1x2, p_model_1x2, odds_1x2, y_1x2,
+        p_market_over, p_model_over, odds_over, odds_under, y_over01,
+        ou_returns=ou_returns, markets=markets)
+    rows, cols = select_bets(edge, min_edge, max_bets_per_game)
+
+    b_pmod, b_pmkt, b_odds = pmod[rows, cols], pmkt[rows, cols], odds[rows, cols]
+    b_edge = edge[rows, cols]
+    won = won_all[rows, cols].astype(int)
+    b_ret = ret_all[rows, cols]       # odds-1 / -1 (ou push / meio ganho nas linhas asiáticas)
+
+    if stake_mode == "flat":
+        stake = np.full(len(rows), float(flat_stake))
+        pnl = stake * b_ret
+        # cumsum a partir de bankroll0: mesma ordem de soma do loop (bankroll += pnl)
+        bankroll_after = np.cumsum(np.concatenate([[float(bankroll0)], pnl]))[1:]
+    else:
+        f = kelly_stake_fraction(b_pmod, b_odds, fkelly, max_kelly)
+        growth = 1.0 + f * b_ret
+        bankroll_after = bankroll0 * np.cumprod(growth)
+        bankroll_before = np.concatenate([[bankroll0], bankroll_after[:-1]])
+        stake = bankroll_before * f
+        pnl = stake * b_ret
+
+    bets_df = pd.DataFrame({
+        "idx": np.asarray(df_test.index)[rows].astype(int),
+        "market": MARKETS[cols],
+        "selection": SELECTIONS[cols],
+        "prob_model": b_pmod,
+        "prob_market": b_pmkt,
+        "odds": b_odds,
+        "edge": b_edge,
+        "stake": stake,
+        "won": won,
+        "pnl": pnl,
+    }) if len(rows) else pd.DataFrame(columns=[f.name for f in Bet.__dataclass_fields__.values()])
+
+    # bankroll ao fim de cada jogo = bankroll após a última aposta até aquele jogo
+    last_bet = np.cumsum(np.bincount(rows, minlength=n)) - 1
+    path = np.where(last_bet >= 0, bankroll_after[np.maximum(last_bet, 0)] if len(rows) else bankroll0, bankroll0)
+    bankroll_df = pd.DataFrame({"row": np.asarray(df_test.index).astype(int), "bankroll": path.astype(float)})
     return bets_df, bankroll_df
 
+# ----------------------------
+# Sweep de parâmetros de aposta
+# ----------------------------
+SWEEP_PARAMS = {
+    "min_edge": float, "fkelly": float, "max_kelly": float, "flat_stake": float,
+    "stake_mode": str, "max_bets_per_game": int,
+}
+STAKE_MODES = ("flat", "fkelly")
+
+def check_stake_modes(modes) -> None:
+    """ValueError se algum stake_mode não for flat/fkelly (no sweep viraria fkelly em silêncio)."""
+    bad = sorted(set(map(str, modes)) - set(STAKE_MODES))
+    if bad:
+        raise ValueError(f"stake_mode desconhecido: {', '.join(repr(b) for b in bad)} (use {', '.join(STAKE_MODES)})")
+
+def parse_sweep(spec: str, defaults: Dict, types: Dict = SWEEP_PARAMS) -> List[Dict]:
+    """
+    "min_edge=0.01:0.06:0.005,fkelly=0.1,0.25,0.5" -> lista de configs (produto cartesiano).
+    a:b:passo é inclusivo; parâmetros não citados usam os valores de defaults.
+    types: parâmetros aceitos -> tipo (SWEEP_PARAMS; TUNE_PARAMS no --mode tune).
+    """
+    import itertools
+    values: Dict[str, List] = {}
+    key = None
+    for tok in [t.strip() for t in spec.split(",") if t.strip()]:
+        if "=" in tok:
+            key, tok = [x.strip() for x in tok.split("=", 1)]
+            if key not in types:
+                raise ValueError(f"Parâmetro de sweep desconhecido: '{key}' (use {', '.join(types)})")
+            values[key] = []
+        if key is None:
+            raise ValueError(f"Sweep inválido: '{spec}'")
+        cast = types[key]
+        if ":" in tok and cast is not str:
+            a, b, step = [float(x) for x in tok.split(":")]
+            grid = a + step * np.arange(int(math.floor((b - a) / step + 1e-9)) + 1)
+            values[key].extend(cast(round(float(v), 10)) for v in grid)
+        else:
+            values[key].append(cast(tok))
+    if "stake_mode" in values:
+        check_stake_modes(values["stake_mode"])
+    keys = list(types)
+    axes = [values.get(k_, [defaults[k_]]) for k_ in keys]
+    return [dict(zip(keys, combo)) for combo in itertools.product(*axes)]
+
+def sweep_bets(p_market_1x2, p_model_1x2, odds_1x2, y_1x2,
+               p_market_over, p_model_over, odds_over, odds_under, y_over01,
+               configs: List[Dict], bankroll0: float = 100.0,
+               max_cells: int = 5_000_000, ou_returns: Optional[np.ndarray] = None) -> pd.DataFrame:
+    """
+    Avalia todas as configs de aposta sobre as mesmas previsões, sem re-treinar.
+    O ranking por edge é único para todas as configs: min_edge só corta um
+    prefixo e max_bets_per_game limita o rank. Cada bloco de configs vira uma
+    máscara (C, L) sobre os L slots candidatos, liquidada com cumsum/cumprod —
+    mesmos números que simulate_bets.
+    """
+    cfg = pd.DataFrame(configs)
+    check_stake_modes(cfg["stake_mode"])
+    pmod, _, odds, edge, _, ret_all = bet_candidates(
+        p_market_1x2, p_model_1x2, odds_1x2, y_1x2,
+        p_market_over, p_model_over, odds_over, odds_under, y_over01, ou_returns=ou_returns)
+    ranked = np.argsort(np.where(np.isnan(edge), np.inf, -edge), axis=1, kind="stable")
+    edge_r = np.take_along_axis(edge, ranked, axis=1)
+    rank_r = np.broadcast_to(np.arange(edge.shape[1]), edge.shape)
+
+    # só slots que viram aposta em alguma config (ordem jogo -> edge desc preservada)
+    keep = (rank_r < cfg["max_bets_per_game"].max()) & (edge_r >= cfg["min_edge"].min())
+    rows, rnk = np.nonzero(keep)
+    cols = ranked[rows, rnk]
+    s_edge, s_rank = edge_r[rows, rnk], rnk
+    s_odds, s_pmod = odds[rows, cols], pmod[rows, cols]
+    s_ret = ret_all[rows, cols]      # retorno por unidade apostada
+    s_kelly = kelly_fraction_array(s_pmod, s_odds)
+    L = len(rows)
+
+    out = np.zeros((len(cfg), 4))  # bets, roi, final_bankroll, max_drawdown
+    chunk = max(1, max_cells // max(L, 1))
+    for start in range(0, len(cfg), chunk):
+        c = cfg.iloc[start:start + chunk]
+        mask = (s_rank[None, :] < c["max_bets_per_game"].values[:, None]) & \
+               (s_edge[None, :] >= c["min_edge"].values[:, None])
+        flat = (c["stake_mode"].values == "flat")[:, None]
+        # flat: stake fixo; fkelly: fração do bankroll corrente
+        f = np.minimum(s_kelly[None, :], c["max_kelly"].values[:, None]) * c["fkelly"].values[:, None]
+        growth = np.where(mask & ~flat, 1.0 + f * s_ret[None, :], 1.0)
+        bk_kelly = bankroll0 * np.cumprod(growth, axis=1)
+        bk_before = np.hstack([np.full((len(c), 1), float(bankroll0)), bk_kelly[:, :-1]])
+        stake = np.where(mask, np.where(flat, c["flat_stake"].values[:, None], bk_before * f), 0.0)
+        pnl = np.where(mask, stake * s_ret[None, :], 0.0)
+        bk_flat = np.cumsum(np.hstack([np.full((len(c), 1), float(bankroll0)), pnl]), axis=1)[:, 1:]
+        path = np.where(flat, bk_flat, bk_kelly)
+        path = np.hstack([np.full((len(c), 1), float(bankroll0)), path])
+        peak = np.maximum.accumulate(path, axis=1)
+        out[start:start + len(c), 0] = mask.sum(axis=1)
+        out[start:start + len(c), 1] = pnl.sum(axis=1) / (stake.sum(axis=1) + 1e-12)
+        out[start:start + len(c), 2] = path[:, -1]
+        out[start:start + len(c), 3] = np.max(1.0 - path / peak, axis=1)
+
+    res = cfg.copy()
+    res["bets_count"] = out[:, 0].astype(int)
+    res["roi"] = np.where(out[:, 0] > 0, out[:, 1], 0.0)
+    res["final_bankroll"] = out[:, 2]
+    res["max_drawdown"] = out[:, 3]
+    return res
+
+def simulate_ou_lines(pred_df: pd.DataFrame, df_test: pd.DataFrame, metrics_df: pd.DataFrame,
+                      lines: Dict[str, Tuple[str, Dict[str, np.ndarray]]], test_rows: np.ndarray,
+                      args) -> pd.DataFrame:
+    """
+    Apostas só em O/U, uma simulação por linha (bets_simulated_ou_<linha>.csv),
+    e tabela-resumo por linha. lines: rótulo -> (sufixo das colunas em pred_df
+    e fold_metrics, arrays de prepare_market_arrays / prepare_ou_line_arrays).
+    """
+    p_1x2 = pred_df[["pH_mkt","pD_mkt","pA_mkt"]].values
+    y1x2 = pred_df["y1x2"].values.astype(int)
+    no_odds = np.full((len(pred_df), 3), np.nan)
+    out = []
+    for label, (suf, lm) in lines.items():
+        bets_df, bankroll_df = simulate_bets(
+            df_test, p_1x2, p_1x2, no_odds, y1x2,
+            pred_df[f"pOver_mkt{suf}"].values, pred_df[f"pOver_mod{suf}"].values,
+            lm["odds_over"][test_rows], lm["odds_under"][test_rows], pred_df[f"yOver{suf}"].values.astype(int),
+            min_edge=args.min_edge, stake_mode=args.stake_mode, flat_stake=args.flat_stake,
+            fkelly=args.fkelly, max_kelly=args.max_kelly, max_bets_per_game=args.max_bets_per_game,
+            bankroll0=args.bankroll0, ou_returns=lm["ou_returns"][test_rows], markets=("OU",))
+        bets_df.to_csv(os.path.join(args.outdir, f"bets_simulated_ou_{label}.csv"), index=False)
+        out.append({
+            "line": label,
+            **{k: float(metrics_df[f"{k}{suf}"].mean())
+               for k in ("alpha_ou", "logloss_mkt_ou", "logloss_mod_ou", "brier_mkt_ou", "brier_mod_ou")},
+            "bets_count": int(len(bets_df)),
+            "bets_roi": float(bets_df["pnl"].sum() / (bets_df["stake"].sum() + 1e-12)) if len(bets_df) else 0.0,
+            "final_bankroll": float(bankroll_df["bankroll"].iloc[-1]) if len(bankroll_df) else float(args.bankroll0),
+        })
+    return pd.DataFrame(out)
+
 # ----------------------------
 # Leitura de dataset (URL / local)
 # ----------------------------
-def read_dataset(path_or_url: str) -> pd.DataFrame:
+def read_dataset(path_or_url: str, sheet: Optional[str] = None, content: Optional[bytes] = None) -> pd.DataFrame:
+    """Lê csv/xlsx (URL ou local) num único parse; sheet = aba do xlsx (opcional)."""
+    excel_kw = {"sheet_name": sheet} if sheet else {}
     if path_or_url.lower().startswith("http"):
-        # leitura via requests (sem depender de gdown)
-        import requests
-        r = requests.get(path_or_url)
-        r.raise_for_status()
-        content = r.content
+        if content is None:
+            content = _download(path_or_url)
         # inferir extensão
         if path_or_url.lower().endswith(".csv"):
             return pd.read_csv(io.BytesIO(content))
         elif path_or_url.lower().endswith(".xlsx") or path_or_url.lower().endswith(".xls"):
-            return pd.read_excel(io.BytesIO(content))
+            return pd.read_excel(io.BytesIO(content), **excel_kw)
         else:
             # tentar csv por padrão
             try:
                 return pd.read_csv(io.BytesIO(content))
             except Exception:
-                return pd.read_excel(io.BytesIO(content))
+                return pd.read_excel(io.BytesIO(content), **excel_kw)
     else:
         if path_or_url.lower().endswith(".csv"):
             return pd.read_csv(path_or_url)
-        return pd.read_excel(path_or_url)
+        return pd.read_excel(path_or_url, **excel_kw)
+
+def _download(url: str) -> bytes:
+    # leitura via requests (sem depender de gdown)
+    import requests
+    r = requests.get(url)
+    r.raise_for_status()
+    return r.content
+
+# Cache colunar local (--data-cache): o dataset normalizado vira um .parquet
+# chaveado por URL + ETag/Last-Modified (ou caminho + mtime/tamanho). Nas
+# execuções seguintes só as colunas usadas são lidas do parquet.
+DATA_CACHE_VERSION = 1
+
+def _dataset_cache_key(path_or_url: str, sheet: Optional[str]) -> Tuple[str, Optional[bytes]]:
+    """Retorna (chave, conteúdo baixado se foi preciso baixar para chavear)."""
+    import hashlib
+    content = None
+    if path_or_url.lower().startswith("http"):
+        import requests
+        try:
+            h = requests.head(path_or_url, allow_redirects=True, timeout=10)
+            h.raise_for_status()
+            version = h.headers.get("ETag") or h.headers.get("Last-Modified")
+        except Exception:
+            version = None
+        if not version:
+            # sem ETag/Last-Modified: chavear pelo próprio conteúdo
+            content = _download(path_or_url)
+            version = hashlib.sha256(content).hexdigest()
+        ident = f"{path_or_url}|{version}"
+    else:
+        st = os.stat(path_or_url)
+        ident = f"{os.path.abspath(path_or_url)}|{st.st_mtime_ns}|{st.st_size}"
+    ident = f"v{DATA_CACHE_VERSION}|{ident}|sheet={sheet}"
+    return hashlib.sha256(ident.encode("utf-8")).hexdigest()[:32], content
+
+def _compact_dtypes(df: pd.DataFrame, keep_text: List[str]) -> pd.DataFrame:
+    # texto repetitivo -> category; inteiros -> menor tipo. Odds seguem float64
+    # (float32 mudaria as probabilidades fair e, portanto, todas as previsões).
+    df = df.copy()
+    for c in df.columns:
+        if df[c].dtype == object and c not in keep_text and df[c].nunique(dropna=True) <= len(df) // 2:
+            df[c] = df[c].astype("category")
+        elif pd.api.types.is_integer_dtype(df[c].dtype):
+            df[c] = pd.to_numeric(df[c], downcast="integer")
+    return df
+
+def cached_dataset(path_or_url: str, sheet: Optional[str], cache_dir: str) -> str:
+    """Garante o parquet do dataset (normalizado) em cache_dir e retorna o caminho."""
+    os.makedirs(cache_dir, exist_ok=True)
+    key, content = _dataset_cache_key(path_or_url, sheet)
+    path = os.path.join(cache_dir, f"dataset_{key}.parquet")
+    if not os.path.exists(path):
+        df = normalize_columns(read_dataset(path_or_url, sheet=sheet, content=content))
+        date_col = detect_columns(df).get("date")
+        # colunas com nomes não-string quebram o parquet
+        df.columns = [str(c) for c in df.columns]
+        tmp = path + ".tmp"
+        _compact_dtypes(df, keep_text=[date_col] if date_col else []).to_parquet(tmp, index=False)
+        os.replace(tmp, path)
+    return path
+
+def read_cached_columns(path: str, wanted: List[str]) -> pd.DataFrame:
+    """Lê do parquet só as colunas pedidas que existem (na ordem do arquivo)."""
+    wanted = set(wanted)
+    return pd.read_parquet(path, columns=[c for c in parquet_columns(path) if c in wanted])
+
+def parquet_columns(path: str) -> List[str]:
+    import pyarrow.parquet as pq
+    return list(pq.read_schema(path).names)
 
 def normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
     # reduzir espaços, padronizar
@@ -285,6 +594,10 @@ def normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
     df.columns = [re.sub(r"\s+", "_", str(c).strip()) for c in df.columns]
     return df
 
+OU_OVER_NAMES = ["Odd_O","Odds_O","Over_Odds","O_Odds","oddO","Over","ODDO","OverOdd"]
+OU_UNDER_NAMES = ["Odd_U","Odds_U","Under_Odds","U_Odds","oddU","Under","ODDU","UnderOdd"]
+POVER_NAMES = ["pOver","pO","Prob_Over","P_Over"]
+
 def detect_columns(df: pd.DataFrame) -> Dict[str, str]:
     """
     Detecta colunas comuns. Você pode sobrescrever via args.
@@ -304,8 +617,8 @@ def detect_columns(df: pd.DataFrame) -> Dict[str, str]:
         "odds_h": pick(["Odd_H","Odds_H","Home_Odds","H_Odds","oddH","H","ODDH","HomeOdd"]),
         "odds_d": pick(["Odd_D","Odds_D","Draw_Odds","D_Odds","oddD","D","ODDD","DrawOdd"]),
         "odds_a": pick(["Odd_A","Odds_A","Away_Odds","A_Odds","oddA","A","ODDA","AwayOdd"]),
-        "odds_over": pick(["Odd_O","Odds_O","Over_Odds","O_Odds","oddO","Over","ODDO","OverOdd"]),
-        "odds_under": pick(["Odd_U","Odds_U","Under_Odds","U_Odds","oddU","Under","ODDU","UnderOdd"]),
+        "odds_over": pick(OU_OVER_NAMES),
+        "odds_under": pick(OU_UNDER_NAMES),
         "fthg": pick(["FTHG","HomeGoals","HG","FT_HG","Gols_Casa"]),
         "ftag": pick(["FTAG","AwayGoals","AG","FT_AG","Gols_Fora"]),
         "date": pick(["Date","DATA","MatchDate","Dia","data","date"]),
@@ -313,89 +626,1157 @@ def detect_columns(df: pd.DataFrame) -> Dict[str, str]:
         "pH": pick(["pHome","pH","Prob_H","P_H"]),
         "pD": pick(["pDraw","pD","Prob_D","P_D"]),
         "pA": pick(["pAway","pA","Prob_A","P_A"]),
-        "pOver": pick(["pOver","pO","Prob_Over","P_Over"]),
+        "pOver": pick(POVER_NAMES),
     }
     return mapping
 
+def prepare_market_arrays(df: pd.DataFrame, mapping: Dict[str, str], ou_line,
+                          devig: str = "proportional") -> Dict[str, np.ndarray]:
+    """
+    Probabilidades de mercado (fair), resultados e odds (para simulação) a partir
+    das colunas detectadas. Odds ausentes viram NaN (sem payoff simulado).
+    ou_line: linha única (float) ou uma linha por jogo (array, ex: linhas asiáticas).
+    devig: método de remoção de margem das odds (ver devig.py).
+    """
+    # colunas essenciais
+    fthg = mapping.get("fthg")
+    ftag = mapping.get("ftag")
+    if not fthg or not ftag or fthg not in df.columns or ftag not in df.columns:
+        raise ValueError("Não encontrei colunas de gols (FTHG/FTAG). Ajuste o dataset para conter gols finais.")
+
+    p1x2_mkt, pover_mkt = market_probs(df, mapping, devig=devig)
+
+    # outcomes
+    goals_home = df[fthg].astype(float).values
+    goals_away = df[ftag].astype(float).values
+    y_1x2 = np.where(goals_home > goals_away, 0, np.where(goals_home == goals_away, 1, 2)).astype(int)
+    total = goals_home + goals_away
+    y_over01 = (total > ou_line).astype(int)
+
+    odds = market_odds(df, mapping)
+    return {"p1x2_mkt": p1x2_mkt, "pover_mkt": pover_mkt, "y_1x2": y_1x2, "y_over01": y_over01, **odds,
+            "ou_returns": ou_unit_returns(total, ou_line, odds["odds_over"], odds["odds_under"])}
+
+def market_probs(df: pd.DataFrame, mapping: Dict[str, str],
+                 devig: str = "proportional") -> Tuple[np.ndarray, np.ndarray]:
+    """Probabilidades fair de mercado: (n,3) 1x2 e (n,) Over (não precisa de gols)."""
+    # odds / probs
+    # 1x2
+    has_probs_1x2 = all([mapping.get("pH") in df.columns if mapping.get("pH") else False,
+                         mapping.get("pD") in df.columns if mapping.get("pD") else False,
+                         mapping.get("pA") in df.columns if mapping.get("pA") else False])
+    if has_probs_1x2:
+        p1x2_mkt = df[[mapping["pH"], mapping["pD"], mapping["pA"]]].astype(float).values
+        # garantir normalização
+        p1x2_mkt = remove_margin_proportional(p1x2_mkt)
+    else:
+        odds_h, odds_d, odds_a = mapping.get("odds_h"), mapping.get("odds_d"), mapping.get("odds_a")
+        if not odds_h or not odds_d or not odds_a:
+            raise ValueError("Não encontrei odds 1x2 (H/D/A) nem probabilidades pHome/pDraw/pAway.")
+        odds_1x2 = df[[odds_h, odds_d, odds_a]].astype(float).values
+        p1x2_mkt = odds_to_fair_probs_1x2(odds_1x2[:,0], odds_1x2[:,1], odds_1x2[:,2], method=devig)
+
+    # OU
+    has_prob_over = mapping.get("pOver") and mapping["pOver"] in df.columns
+    if has_prob_over:
+        pover_mkt = df[mapping["pOver"]].astype(float).values
+        pover_mkt = np.clip(pover_mkt, 1e-6, 1-1e-6)
+    else:
+        odds_over_col, odds_under_col = mapping.get("odds_over"), mapping.get("odds_under")
+        if not odds_over_col or not odds_under_col:
+            raise ValueError("Não encontrei odds O/U (Over/Under) nem prob pOver.")
+        odds_over = df[odds_over_col].astype(float).values
+        odds_under = df[odds_under_col].astype(float).values
+        pover_mkt = odds_to_fair_prob_over(odds_over, odds_under, method=devig)
+    return p1x2_mkt, pover_mkt
+
+def market_odds(df: pd.DataFrame, mapping: Dict[str, str]) -> Dict[str, np.ndarray]:
+    """Odds para simulação (das colunas detectadas, mesmo se vieram probabilidades prontas); NaN se ausentes."""
+    n = len(df)
+    odds_1x2_sim = np.full((n, 3), np.nan)
+    if mapping.get("odds_h") in df.columns and mapping.get("odds_d") in df.columns and mapping.get("odds_a") in df.columns:
+        odds_1x2_sim = df[[mapping["odds_h"], mapping["odds_d"], mapping["odds_a"]]].astype(float).values
+    odds_over_sim = np.full(n, np.nan)
+    odds_under_sim = np.full(n, np.nan)
+    if mapping.get("odds_over") in df.columns and mapping.get("odds_under") in df.columns:
+        odds_over_sim = df[mapping["odds_over"]].astype(float).values
+        odds_under_sim = df[mapping["odds_under"]].astype(float).values
+    return {"odds_1x2": odds_1x2_sim, "odds_over": odds_over_sim, "odds_under": odds_under_sim}
+
+# ----------------------------
+# O/U em várias linhas (--ou-lines / --ou-line-col)
+# ----------------------------
+def ou_unit_returns(total: np.ndarray, line, odds_over: np.ndarray, odds_under: np.ndarray) -> np.ndarray:
+    """
+    Retorno por unidade apostada (n, 2) [Over, Under], com regras asiáticas:
+    linha inteira devolve a stake no empate (push); linha .25/.75 divide a stake
+    entre as duas linhas vizinhas (meio ganho / meia perda). Em linhas .5 é o
+    mesmo payoff do 1x2: odds-1 ou -1.
+    """
+    line = np.broadcast_to(np.asarray(line, dtype=float), total.shape)
+    quarter = np.isin(np.round((line % 1.0) * 4) % 2, 1)   # .25 / .75
+    lo = np.where(quarter, line - 0.25, line)
+    hi = np.where(quarter, line + 0.25, line)
+
+    def leg(l, odds, sign):
+        diff = sign * (total - l)
+        return np.where(diff > 0, odds - 1.0, np.where(diff == 0, 0.0, -1.0))
+
+    r_over = 0.5 * (leg(lo, odds_over, 1.0) + leg(hi, odds_over, 1.0))
+    r_under = 0.5 * (leg(lo, odds_under, -1.0) + leg(hi, odds_under, -1.0))
+    return np.column_stack([r_over, r_under])
+
+def ou_line_tag(line: float) -> str:
+    return f"{line:g}"
+
+def detect_ou_line_columns(columns, line: float) -> Dict[str, str]:
+    """Colunas de uma linha extra, ex: Odd_O_3.5 / Odd_O3.5 / Odd_O_35 (e pOver_3.5)."""
+    cols = set(columns)
+    tag = ou_line_tag(line)
+    suffixes = [f"_{tag}", tag, f"_{tag.replace('.', '')}", tag.replace(".", "")]
+    def pick(bases):
+        for b in bases:
+            for suf in suffixes:
+                if b + suf in cols:
+                    return b + suf
+        return ""
+    return {"odds_over": pick(OU_OVER_NAMES), "odds_under": pick(OU_UNDER_NAMES), "pOver": pick(POVER_NAMES)}
+
+def prepare_ou_line_arrays(df: pd.DataFrame, mapping: Dict[str, str], line: float,
+                           devig: str = "proportional", plain: bool = False) -> Dict[str, np.ndarray]:
+    """
+    Mercado, resultado e payoff de uma linha O/U extra (mesmo formato de prepare_market_arrays).
+    plain: sem colunas com sufixo, usa as colunas O/U sem sufixo do mapping (linha == --ou-line).
+    """
+    cols = detect_ou_line_columns(df.columns, line)
+    if plain and not any(cols.values()):
+        cols = {k: mapping.get(k) if mapping.get(k) in df.columns else "" for k in cols}
+    n = len(df)
+    odds_over = df[cols["odds_over"]].astype(float).values if cols["odds_over"] else np.full(n, np.nan)
+    odds_under = df[cols["odds_under"]].astype(float).values if cols["odds_under"] else np.full(n, np.nan)
+    if cols["pOver"]:
+        pover = np.clip(df[cols["pOver"]].astype(float).values, 1e-6, 1-1e-6)
+    elif cols["odds_over"] and cols["odds_under"]:
+        pover = odds_to_fair_prob_over(odds_over, odds_under, method=devig)
+    else:
+        raise ValueError(f"Linha O/U {ou_line_tag(line)}: não encontrei odds (ex: Odd_O_{ou_line_tag(line)}) nem pOver_{ou_line_tag(line)}.")
+    total = df[mapping["fthg"]].astype(float).values + df[mapping["ftag"]].astype(float).values
+    return {"pover_mkt": pover, "y_over01": (total > line).astype(int),
+            "odds_over": odds_over, "odds_under": odds_under,
+            "ou_returns": ou_unit_returns(total, line, odds_over, odds_under)}
+
+def with_ou_features(X: np.ndarray, pover: np.ndarray, features: List[str]) -> np.ndarray:
+    """Cópia de X com as colunas que dependem de pOver recalculadas para outra linha."""
+    col = {name: j for j, name in enumerate(features)}
+    X = X.copy()
+    X[:, col["pOver"]] = pover
+    X[:, col["pOver_x_fav"]] = pover * X[:, col["fav"]]
+    X[:, col["pOver_x_entropy"]] = pover * X[:, col["entropy_1x2"]]
+    return X
+
 # ----------------------------
 # Modelagem
 # ----------------------------
-def fit_multinomial_logit(X: np.ndarray, y: np.ndarray) -> LogisticRegression:
+def _warm_init(clf: LogisticRegression, init: Optional[LogisticRegression]) -> LogisticRegression:
+    """Inicia o lbfgs a partir dos coeficientes de um modelo já treinado (warm start)."""
+    if init is not None and hasattr(init, "coef_"):
+        clf.set_params(warm_start=True)
+        clf.coef_ = init.coef_.copy()
+        clf.intercept_ = init.intercept_.copy()
+    return clf
+
+def fit_multinomial_logit(X: np.ndarray, y: np.ndarray,
+                          init: Optional[LogisticRegression] = None,
+                          sample_weight: Optional[np.ndarray] = None, C: float = 1.0) -> LogisticRegression:
     clf = LogisticRegression(
         multi_class="multinomial",
         solver="lbfgs",
         max_iter=2000,
-        C=1.0,
+        C=C,
         n_jobs=None
     )
-    clf.fit(X, y)
+    _warm_init(clf, init)
+    clf.fit(X, y, sample_weight=sample_weight)
     return clf
 
-def fit_bin_logit(X: np.ndarray, y01: np.ndarray) -> LogisticRegression:
+def fit_bin_logit(X: np.ndarray, y01: np.ndarray,
+                  init: Optional[LogisticRegression] = None,
+                  sample_weight: Optional[np.ndarray] = None, C: float = 1.0) -> LogisticRegression:
     clf = LogisticRegression(
         solver="lbfgs",
         max_iter=2000,
-        C=1.0
+        C=C
     )
-    clf.fit(X, y01)
+    _warm_init(clf, init)
+    clf.fit(X, y01, sample_weight=sample_weight)
     return clf
 
-def optimize_alpha_multiclass(p_mkt: np.ndarray, p_cal: np.ndarray, y: np.ndarray) -> float:
-    alphas = np.linspace(0.0, 1.0, 51)
-    best_a, best = 1.0, 1e18
-    for a in alphas:
-        p = a*p_mkt + (1-a)*p_cal
-        ll = log_loss(y, p, labels=[0,1,2])
-        if ll < best:
-            best = ll
-            best_a = float(a)
-    return best_a
-
-def optimize_alpha_binary(p_mkt: np.ndarray, p_cal: np.ndarray, y01: np.ndarray) -> float:
-    alphas = np.linspace(0.0, 1.0, 51)
-    best_a, best = 1.0, 1e18
-    for a in alphas:
-        p = a*p_mkt + (1-a)*p_cal
-        ll = log_loss(y01, np.vstack([1-p, p]).T, labels=[0,1])
-        if ll < best:
-            best = ll
-            best_a = float(a)
-    return best_a
-
-def knn_residual_adjustment(X_train: np.ndarray, resid_train: np.ndarray,
-                            X_test: np.ndarray, k: int = 200, sigma: float = 0.08) -> np.ndarray:
+# Shrinkage: p = a*p_mkt + (1-a)*p_cal. A log-loss só depende da prob. da classe
+# observada, que é linear em a -> toda a busca vira operações em arrays (n,).
+ALPHA_GRID = np.linspace(0.0, 1.0, 51)
+_LL_EPS = np.finfo(float).eps  # mesmo clip do sklearn.metrics.log_loss
+
+def _segment_sums(values: np.ndarray, codes: np.ndarray, n_segments: int) -> np.ndarray:
+    """Soma as linhas de values (m, n) por segmento -> (m, n_segments) num único bincount."""
+    m = values.shape[0]
+    offs = (np.arange(m) * n_segments)[:, None] + codes[None, :]
+    return np.bincount(offs.ravel(), weights=values.ravel(), minlength=m * n_segments).reshape(m, n_segments)
+
+def _alpha_grid(pm_true: np.ndarray, pc_true: np.ndarray, codes: np.ndarray, n_segments: int) -> np.ndarray:
+    # (G, n) perdas para todos os alphas de uma vez
+    p = ALPHA_GRID[:, None] * pm_true[None, :] + (1 - ALPHA_GRID[:, None]) * pc_true[None, :]
+    nll = -np.log(np.clip(p, _LL_EPS, 1 - _LL_EPS))
+    sums = _segment_sums(nll, codes, n_segments)     # (G, S)
+    return ALPHA_GRID[np.argmin(sums, axis=0)]       # argmin = 1º mínimo (como o loop original)
+
+def _alpha_newton(pm_true: np.ndarray, pc_true: np.ndarray, codes: np.ndarray, n_segments: int,
+                  max_iter: int = 50, tol: float = 1e-10) -> np.ndarray:
     """
-    Ajuste residual via KNN com kernel gaussiano no espaço de features (probabilidades derivadas).
-    resid_train: y - p_base (para 1 classe / binário)
-    Retorna delta para adicionar em p_base_test
+    Minimiza L(a) = -sum log(pc + a*(pm-pc)) em [0,1] (convexa) por Newton com
+    salvaguarda de bissecção, vetorizado em todos os segmentos.
+    """
+    d = pm_true - pc_true
+
+    def grad_hess(a):
+        p = np.clip(pc_true + a[codes] * d, _LL_EPS, 1.0)
+        r = d / p
+        g, h = _segment_sums(np.vstack([-r, r * r]), codes, n_segments)
+        return g, h
+
+    g0, _ = grad_hess(np.zeros(n_segments))
+    g1, _ = grad_hess(np.ones(n_segments))
+    lo, hi = np.zeros(n_segments), np.ones(n_segments)
+    a = np.full(n_segments, 0.5)
+    active = (g0 < 0) & (g1 > 0)   # senão o mínimo está numa das bordas
+    for _ in range(max_iter):
+        if not active.any():
+            break
+        g, h = grad_hess(a)
+        lo = np.where(active & (g < 0), a, lo)
+        hi = np.where(active & (g > 0), a, hi)
+        a_new = a - g / np.where(h > 0, h, np.inf)
+        a_new = np.where((a_new <= lo) | (a_new >= hi), 0.5 * (lo + hi), a_new)
+        converged = np.abs(a_new - a) < tol
+        a = np.where(active, a_new, a)
+        active &= ~converged
+    return np.where(g0 >= 0, 0.0, np.where(g1 <= 0, 1.0, a))
+
+def optimize_alpha(pm_true: np.ndarray, pc_true: np.ndarray,
+                   segments: Optional[np.ndarray] = None, n_segments: int = 0,
+                   method: str = "grid", min_seg: int = 200):
+    """
+    pm_true / pc_true: prob. (mercado / calibrada) atribuída ao resultado observado.
+    method: "grid" (51 pontos, avaliados num único array) | "newton" (contínuo).
+    Sem segments retorna float; com segments retorna array (n_segments,), e
+    segmentos com menos de min_seg linhas herdam o alpha global.
     """
+    solve = _alpha_newton if method == "newton" else _alpha_grid
+    a_glob = float(solve(pm_true, pc_true, np.zeros(len(pm_true), dtype=np.int64), 1)[0])
+    if segments is None or n_segments <= 0:
+        return a_glob
+    a_seg = solve(pm_true, pc_true, segments, n_segments)
+    counts = np.bincount(segments, minlength=n_segments)
+    return np.where(counts >= min_seg, a_seg, a_glob)
+
+def optimize_alpha_multiclass(p_mkt: np.ndarray, p_cal: np.ndarray, y: np.ndarray, **kw):
+    rows = np.arange(len(y))
+    return optimize_alpha(p_mkt[rows, y], p_cal[rows, y], **kw)
+
+def optimize_alpha_binary(p_mkt: np.ndarray, p_cal: np.ndarray, y01: np.ndarray, **kw):
+    pos = y01 == 1
+    return optimize_alpha(np.where(pos, p_mkt, 1 - p_mkt), np.where(pos, p_cal, 1 - p_cal), **kw)
+
+def alpha_rows(alpha, segments: Optional[np.ndarray], idx: np.ndarray):
+    """Alpha escalar ou alpha por linha (alpha[segments[idx]]) se segmentado."""
+    if np.ndim(alpha) == 0:
+        return alpha
+    return alpha[segments[idx]]
+
+def shrink_mix(p_mkt: np.ndarray, p_cal: np.ndarray, alpha) -> np.ndarray:
+    if np.ndim(alpha) > 0 and p_mkt.ndim == 2:
+        alpha = alpha[:, None]
+    return alpha*p_mkt + (1-alpha)*p_cal
+
+def knn_query(X_train: np.ndarray, X_test: np.ndarray, k: int = 200) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """Constrói o índice e consulta os k vizinhos uma única vez (None se k <= 5)."""
     k = min(k, len(X_train))
     if k <= 5:
-        return np.zeros(len(X_test))
+        return None
     nn = NearestNeighbors(n_neighbors=k, metric="euclidean")
     nn.fit(X_train)
-    dist, idx = nn.kneighbors(X_test, return_distance=True)
+    return nn.kneighbors(X_test, return_distance=True)
+
+def knn_kernel_average(neighbors: Optional[Tuple[np.ndarray, np.ndarray]], resid_train: np.ndarray,
+                       n_test: int, sigma: float = 0.08) -> np.ndarray:
+    """
+    Média ponderada (kernel gaussiano) dos resíduos dos vizinhos.
+    resid_train: (n,) ou (n, m) — várias saídas compartilham os mesmos pesos.
+    """
+    if neighbors is None:
+        return np.zeros((n_test,) + resid_train.shape[1:])
+    dist, idx = neighbors
     w = np.exp(-(dist**2) / (2*(sigma**2)))
     wsum = w.sum(axis=1, keepdims=True) + 1e-12
     w = w / wsum
-    delta = (w * resid_train[idx]).sum(axis=1)
-    return delta
+    if resid_train.ndim == 2:
+        # por coluna (mesma ordem de soma da versão 1-D -> resultado bit a bit igual)
+        return np.column_stack([(w * r[idx]).sum(axis=1) for r in np.ascontiguousarray(resid_train.T)])
+    return (w * resid_train[idx]).sum(axis=1)
+
+def knn_residual_adjustment(X_train: np.ndarray, resid_train: np.ndarray,
+                            X_test: np.ndarray, k: int = 200, sigma: float = 0.08) -> np.ndarray:
+    """
+    Ajuste residual via KNN com kernel gaussiano no espaço de features (probabilidades derivadas).
+    resid_train: y - p_base, (n,) ou (n, m) para várias classes/mercados de uma vez
+    Retorna delta para adicionar em p_base_test
+    """
+    return knn_kernel_average(knn_query(X_train, X_test, k), resid_train, len(X_test), sigma)
+
+class GrowingKNNIndex:
+    """
+    Índice KNN que cresce com a janela expanding (linhas 0..n-1 de X) sem refazer
+    tudo a cada fold: blocos contíguos em esquema "contador binário" — um bloco
+    novo funde-se com o anterior quando este não é maior, então há O(log n)
+    índices e cada linha é reindexada O(log n) vezes no total.
+    A consulta junta os k melhores de cada bloco (índices globais de linha).
+    """
+    def __init__(self, X: np.ndarray):
+        self.X = X
+        self.n = 0
+        self.blocks: List[Tuple[int, int, NearestNeighbors]] = []
+
+    def _fit(self, start: int, end: int) -> Tuple[int, int, NearestNeighbors]:
+        nn = NearestNeighbors(metric="euclidean")
+        nn.fit(self.X[start:end])
+        return (start, end, nn)
+
+    def extend(self, n_rows: int):
+        if n_rows <= self.n:
+            return
+        self.blocks.append(self._fit(self.n, n_rows))
+        self.n = n_rows
+        while len(self.blocks) >= 2:
+            (s0, e0, _), (s1, e1, _) = self.blocks[-2], self.blocks[-1]
+            if e0 - s0 > e1 - s1:
+                break
+            self.blocks[-2:] = [self._fit(s0, e1)]
+
+    def kneighbors(self, X_test: np.ndarray, k: int) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        k = min(k, self.n)
+        if k <= 5:
+            return None
+        dists, idxs = [], []
+        for start, end, nn in self.blocks:
+            d, i = nn.kneighbors(X_test, n_neighbors=min(k, end - start), return_distance=True)
+            dists.append(d)
+            idxs.append(i + start)
+        dist, idx = np.hstack(dists), np.hstack(idxs)
+        if len(self.blocks) > 1:
+            # k menores por linha, em ordem crescente de distância (como kneighbors)
+            part = np.argpartition(dist, k - 1, axis=1)[:, :k]
+            d = np.take_along_axis(dist, part, axis=1)
+            order = np.argsort(d, axis=1, kind="stable")
+            dist = np.take_along_axis(d, order, axis=1)
+            idx = np.take_along_axis(np.take_along_axis(idx, part, axis=1), order, axis=1)
+        return dist, idx
 
 # ----------------------------
 # Walk-forward
 # ----------------------------
-def walk_forward_splits(df: pd.DataFrame, min_train: int, step: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+def date_days(df: pd.DataFrame, date_col: str) -> Optional[np.ndarray]:
+    """Dias (float) desde a 1ª data, na ordem das linhas; NaT herda a data anterior. None sem datas."""
+    if not date_col or date_col not in df.columns:
+        return None
+    t = pd.Series(pd.to_datetime(df[date_col], errors="coerce")).ffill().bfill()
+    if t.isna().all():
+        return None
+    return ((t - t.min()).dt.total_seconds() / 86400.0).to_numpy()
+
+def window_start(end: int, window: int = 0, window_days: float = 0.0,
+                 days: Optional[np.ndarray] = None) -> int:
+    """
+    1ª linha do treino que termina em `end` (exclusivo): 0 = expanding window;
+    window > 0 limita às últimas `window` linhas; window_days > 0 aos jogos dos
+    últimos `window_days` dias antes da data da linha `end` (ou da última linha,
+    se end == n) — searchsorted nas datas ordenadas. Com os dois, vale o mais curto.
+    """
+    lo = max(0, end - window) if window else 0
+    if window_days:
+        if days is None:
+            raise ValueError("--window-days precisa de uma coluna de data (--date-col).")
+        ref = days[min(end, len(days) - 1)]
+        lo = max(lo, int(np.searchsorted(days, ref - window_days, side="left")))
+    return lo
+
+def walk_forward_splits(df: pd.DataFrame, min_train: int, step: int,
+                        window: int = 0, window_days: float = 0.0,
+                        days: Optional[np.ndarray] = None) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Folds (treino, teste) em ordem temporal. Por padrão expanding window; com
+    window/window_days, janela deslizante (ver window_start) — o custo por fold
+    fica constante. Treino e teste são sempre intervalos contíguos de linhas.
+    """
     n = len(df)
     splits = []
     start = min_train
     while start < n:
-        train_idx = np.arange(0, start)
+        train_idx = np.arange(window_start(start, window, window_days, days), start)
         test_end = min(n, start + step)
         test_idx = np.arange(start, test_end)
         splits.append((train_idx, test_idx))
         start = test_end
     return splits
 
+# ----------------------------
+# Instrumentação (--profile)
+# ----------------------------
+def rss_mb() -> float:
+    """Memória residente atual do processo (MB); NaN sem /proc (fora do Linux)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024.0**2
+    except (OSError, ValueError, AttributeError):
+        return float("nan")
+
+def process_peak_rss_mb(children: bool = False) -> float:
+    """
+    Pico de RSS (MB) desde o início do processo — acumulado, não serve por etapa.
+    children=True: o maior entre os filhos já encerrados (workers do pool).
+    NaN sem o módulo resource (Windows).
+    """
+    try:
+        import resource
+    except ImportError:
+        return float("nan")
+    r = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    return r / 1024.0**2 if sys.platform == "darwin" else r / 1024.0  # macOS: bytes; Linux: KB
+
+class StageTimer:
+    """
+    Wall time, CPU time e RSS por etapa: rss_mb ao fim e rss_delta_mb (fim -
+    início, memória que a etapa deixou alocada). Desligado (enabled=False) não
+    mede nada, então o código instrumentado não paga custo sem --profile.
+    """
+    def __init__(self, enabled: bool = True, fold: Optional[int] = None):
+        self.enabled = enabled
+        self.fold = fold
+        self.rows: List[Dict] = []
+
+    @contextmanager
+    def stage(self, name: str):
+        if not self.enabled:
+            yield
+            return
+        w0, c0, m0 = time.perf_counter(), time.process_time(), rss_mb()
+        try:
+            yield
+        finally:
+            m1 = rss_mb()
+            self.rows.append({"stage": name, "fold": self.fold,
+                              "wall_s": time.perf_counter() - w0, "cpu_s": time.process_time() - c0,
+                              "rss_mb": m1, "rss_delta_mb": m1 - m0, "pid": os.getpid()})
+
+_NO_TIMER = StageTimer(enabled=False)
+
+def timings_summary(rows: List[Dict]) -> Dict:
+    """
+    Agrega timings.csv para o summary.json: por etapa (somando folds; rss_delta_mb
+    é o maior entre os folds) e por fold. O pico de RSS do processo é acumulado,
+    então vai uma vez só: principal e o maior dos workers (chamar após fechar o pool).
+    """
+    t = pd.DataFrame(rows)
+    stages = (t.groupby("stage", sort=False)
+              .agg(wall_s=("wall_s", "sum"), cpu_s=("cpu_s", "sum"), rss_delta_mb=("rss_delta_mb", "max")))
+    out = {
+        "stages": {k: {"wall_s": float(v.wall_s), "cpu_s": float(v.cpu_s), "rss_delta_mb": float(v.rss_delta_mb)}
+                   for k, v in stages.iterrows()},
+        # workers: maior processo filho já encerrado (pool de folds etc.); None se não houve filho
+        "process_peak_rss_mb": {"main": process_peak_rss_mb(), "workers": process_peak_rss_mb(children=True) or None},
+    }
+    # com --partition-by há uma linha "fold" por (fold, partição): soma por fold
+    folds = (t[t["stage"] == "fold"].groupby("fold")
+             .agg(wall_s=("wall_s", "sum"), cpu_s=("cpu_s", "sum"), rss_delta_mb=("rss_delta_mb", "sum")))
+    if len(folds):
+        out["folds"] = [{"fold": int(k), "wall_s": float(r.wall_s), "cpu_s": float(r.cpu_s),
+                         "rss_delta_mb": float(r.rss_delta_mb)} for k, r in folds.iterrows()]
+        out["slowest_fold"] = int(folds["wall_s"].idxmax())
+    return out
+
+def profile_fold_dump(tasks: List[Tuple[int, np.ndarray, np.ndarray, Optional[str]]],
+                      data: Dict[str, np.ndarray], params: Dict, path: str):
+    """
+    Re-executa as tasks de um fold sob cProfile (serial, sem cache) e grava o
+    .prof (ver com `python -m pstats` ou snakeviz). Com --warm-start/--knn-incremental
+    a re-execução parte do zero (sem o estado dos folds anteriores).
+    """
+    import cProfile
+    params = {**params, "cache_dir": None, "profile": False}
+    prof = cProfile.Profile()
+    prof.enable()
+    try:
+        run_fold_tasks(tasks, data, params, jobs=1)
+    finally:
+        prof.disable()
+    prof.dump_stats(path)
+
+# ----------------------------
+# Previsões (store colunar)
+# ----------------------------
+def pred_columns(ou_lines: List[str]) -> Dict[str, type]:
+    """Colunas das previsões walk-forward, na ordem de saída, e seus dtypes."""
+    cols = {"row": np.int64, "fold": np.int64}
+    cols.update({k: np.float64 for k in ("pH_mkt", "pD_mkt", "pA_mkt", "pH_mod", "pD_mod", "pA_mod",
+                                         "pOver_mkt", "pOver_mod")})
+    cols.update({"y1x2": np.int64, "yOver": np.int64})
+    for tag in ou_lines:
+        cols.update({f"pOver_mkt_{tag}": np.float64, f"pOver_mod_{tag}": np.float64, f"yOver_{tag}": np.int64})
+    return cols
+
+class PredictionStore:
+    """
+    Previsões de todos os folds em arrays pré-alocados (n,) por coluna, indexados
+    pela linha do dataset: cada fold grava o seu bloco com um fancy-assign, sem
+    objeto por linha nem sort no final (a ordem já é a das linhas).
+    """
+    def __init__(self, n: int, ou_lines: List[str]):
+        self.dtypes = pred_columns(ou_lines)
+        self.arrays = {k: np.zeros(n, dtype=dt) for k, dt in self.dtypes.items() if k != "row"}
+        self.filled = np.zeros(n, dtype=bool)
+
+    def write(self, preds: Dict[str, np.ndarray]):
+        rows = preds["row"]
+        for k, arr in self.arrays.items():
+            arr[rows] = preds[k]
+        self.filled[rows] = True
+
+    def rows(self) -> np.ndarray:
+        return np.flatnonzero(self.filled)
+
+    def columns_at(self, rows: np.ndarray) -> Dict[str, np.ndarray]:
+        return {"row": np.asarray(rows, dtype=np.int64), **{k: arr[rows] for k, arr in self.arrays.items()}}
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(self.columns_at(self.rows()), columns=list(self.dtypes))
+
+def write_predictions(pred_df: pd.DataFrame, outdir: str, fmt: str = "parquet", csv: bool = False) -> List[str]:
+    """
+    Grava predictions_walkforward.{parquet|npz} (comprimido) e, se csv, também o
+    .csv. Sem pyarrow, parquet cai para npz. Retorna os nomes gravados.
+    """
+    base = os.path.join(outdir, "predictions_walkforward")
+    if fmt == "parquet":
+        try:
+            pred_df.to_parquet(base + ".parquet", index=False, compression="zstd")
+        except ImportError:
+            print("Aviso: pyarrow indisponível; previsões gravadas em .npz.")
+            fmt = "npz"
+    if fmt == "npz":
+        np.savez_compressed(base + ".npz", **{k: pred_df[k].values for k in pred_df.columns})
+    files = [f"predictions_walkforward.{fmt}"]
+    if csv:
+        pred_df.to_csv(base + ".csv", index=False)
+        files.append("predictions_walkforward.csv")
+    return files
+
+def read_predictions(path: str) -> pd.DataFrame:
+    """Lê o artefato de previsões (.parquet, .npz ou .csv)."""
+    if path.endswith(".npz"):
+        with np.load(path, allow_pickle=False) as z:
+            return pd.DataFrame({k: z[k] for k in z.files})
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
+# ----------------------------
+# Fold (walk-forward)
+# ----------------------------
+def temporal_split(tr_idx: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Dentro do treino, separar validação temporal (últimos 20%)."""
+    val_cut = int(len(tr_idx) * 0.8)
+    return tr_idx[:val_cut], tr_idx[val_cut:]
+
+def decay_weights(idx: np.ndarray, data: Dict[str, np.ndarray], params: Dict) -> Optional[np.ndarray]:
+    """
+    Peso de decaimento exponencial (--decay-half-life) das linhas idx: metade a
+    cada meia-vida de idade (em data["time"]: dias, ou linhas sem data), relativo
+    à linha mais recente e normalizado para média 1 (o C efetivo do logit não
+    muda). None sem decaimento.
+    """
+    half_life = params.get("decay_half_life")
+    if not half_life:
+        return None
+    t = data["time"][idx]
+    w = np.exp2((t - t.max()) / half_life)
+    return w / w.mean()
+
+def _alpha_kwargs(params: Dict, seg: Optional[np.ndarray], val_idx: np.ndarray) -> Dict:
+    kw = {"method": params.get("alpha_method", "grid"), "min_seg": params.get("alpha_min_seg", 200)}
+    if seg is not None:
+        kw.update(segments=seg[val_idx], n_segments=params["n_segments"])
+    return kw
+
+def _alpha_at(alpha, codes: Optional[np.ndarray]):
+    """Alpha escalar ou alpha por linha (alpha[codes]) se segmentado."""
+    return alpha if np.ndim(alpha) == 0 else alpha[codes]
+
+def fit_calibrators(tr_idx: np.ndarray, data: Dict[str, np.ndarray], params: Dict,
+                    state: Optional[Dict] = None, timer: StageTimer = _NO_TIMER) -> Dict:
+    """
+    Calibradores 1x2 / O/U nos 80% mais antigos de tr_idx (com peso de
+    decaimento, se houver) e alphas de shrinkage nos 20% finais.
+    Retorna {"m1", "m2", "a1", "a2"}.
+    """
+    X, seg = data["X"], data.get("segment")
+    y_1x2, y_over01 = data["y_1x2"], data["y_over01"]
+    tr2_idx, val_idx = temporal_split(tr_idx)
+    alpha_kw = _alpha_kwargs(params, seg, val_idx)
+    X_tr, X_val = X[tr2_idx], X[val_idx]
+    w_tr = decay_weights(tr2_idx, data, params)
+    C = params.get("logit_C", 1.0)
+
+    with timer.stage("fit_logit_1x2"):
+        m1 = fit_multinomial_logit(X_tr, y_1x2[tr2_idx], init=state.get("m1") if state is not None else None,
+                                   sample_weight=w_tr, C=C)
+    with timer.stage("alpha_1x2"):
+        a1 = optimize_alpha_multiclass(data["p1x2_mkt"][val_idx], m1.predict_proba(X_val), y_1x2[val_idx], **alpha_kw)
+    # OU
+    with timer.stage("fit_logit_ou"):
+        m2 = fit_bin_logit(X_tr, y_over01[tr2_idx], init=state.get("m2") if state is not None else None,
+                           sample_weight=w_tr, C=C)
+    with timer.stage("alpha_ou"):
+        a2 = optimize_alpha_binary(data["pover_mkt"][val_idx], m2.predict_proba(X_val)[:,1], y_over01[val_idx], **alpha_kw)
+    return {"m1": m1, "m2": m2, "a1": a1, "a2": a2}
+
+def predict_mix(model: Dict, X: np.ndarray, p1x2_mkt: np.ndarray, pover_mkt: np.ndarray,
+                seg_codes: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Probabilidades do modelo (antes do KNN): shrink do calibrador para o mercado."""
+    p_1x2 = shrink_mix(p1x2_mkt, model["m1"].predict_proba(X), _alpha_at(model["a1"], seg_codes))
+    p_over = shrink_mix(pover_mkt, model["m2"].predict_proba(X)[:,1], _alpha_at(model["a2"], seg_codes))
+    return p_1x2, p_over
+
+def knn_residuals(model: Dict, idx: np.ndarray, data: Dict[str, np.ndarray]) -> np.ndarray:
+    """Resíduos H, D, A e Over (n, 4) das linhas idx: um índice, uma consulta para tudo."""
+    seg = data.get("segment")
+    p_1x2, p_over = predict_mix(model, data["X"][idx], data["p1x2_mkt"][idx], data["pover_mkt"][idx],
+                                seg[idx] if seg is not None else None)
+    return np.column_stack([
+        (data["y_1x2"][idx][:, None] == np.arange(3)[None, :]).astype(float) - p_1x2,
+        data["y_over01"][idx].astype(float) - p_over,
+    ])
+
+def apply_knn_delta(p_1x2: np.ndarray, p_over: np.ndarray, delta: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    p_1x2 = np.clip(p_1x2 + delta[:, :3], 1e-6, 1.0)
+    p_1x2 = _safe_div(p_1x2, p_1x2.sum(axis=1, keepdims=True))
+    return p_1x2, np.clip(p_over + delta[:, 3], 1e-6, 1-1e-6)
+
+def run_fold(fold: int, tr_idx: np.ndarray, te_idx: np.ndarray,
+             data: Dict[str, np.ndarray], params: Dict,
+             state: Optional[Dict] = None,
+             artefacts: Optional[Dict] = None,
+             timer: StageTimer = _NO_TIMER) -> Tuple[Dict, Dict[str, np.ndarray]]:
+    """
+    Treina calibradores + alpha (+ KNN opcional) num fold e prevê o bloco de teste.
+    data: X, y_1x2, y_over01, p1x2_mkt, pover_mkt (somente leitura);
+          opcional pover_lines / y_over_lines (n, L) para as linhas O/U extras
+          e time (dias ou linha) para o decaimento
+    params: use_knn, knn_k, knn_sigma, alpha_method, alpha_min_seg, n_segments, ou_lines,
+            decay_half_life, logit_C
+    state: estado encadeado entre folds (--warm-start / --knn-incremental); atualizado in-place.
+    artefacts: se dado, recebe os calibradores (m1, m2) e alphas (a1, a2) do fold.
+    timer: tempos por etapa (--profile).
+    Retorna (métricas do fold, previsões {coluna: array} — ver pred_columns).
+    """
+    X = data["X"]
+    y_1x2, y_over01 = data["y_1x2"], data["y_over01"]
+    p1x2_mkt, pover_mkt = data["p1x2_mkt"], data["pover_mkt"]
+    seg = data.get("segment")
+    tr2_idx, val_idx = temporal_split(tr_idx)
+    alpha_kw = _alpha_kwargs(params, seg, val_idx)
+    y_te_1x2, y_te_over = y_1x2[te_idx], y_over01[te_idx]
+    p_mkt_te, po_mkt_te = p1x2_mkt[te_idx], pover_mkt[te_idx]
+    X_te = X[te_idx]
+
+    # calibradores + alphas
+    model = fit_calibrators(tr_idx, data, params, state=state, timer=timer)
+    m1, m2, a1, a2 = model["m1"], model["m2"], model["a1"], model["a2"]
+    with timer.stage("predict"):
+        p_mix_te_1x2, p_mix_te_over = predict_mix(model, X_te, p_mkt_te, po_mkt_te,
+                                                  seg[te_idx] if seg is not None else None)
+
+    # KNN residual adjustment (opcional)
+    neighbors = None
+    if params["use_knn"]:
+        with timer.stage("knn"):
+            # resíduos no treino inteiro (tr_idx) para estabilidade
+            resid = knn_residuals(model, tr_idx, data)
+            index = state.get("knn_index") if state is not None else None
+            if index is not None and tr_idx[0] == 0 and tr_idx[-1] == len(tr_idx) - 1:
+                # índice incremental: vizinhos já são linhas globais = posições em tr_idx
+                index.extend(len(tr_idx))
+                neighbors = index.kneighbors(X_te, params["knn_k"])
+            else:
+                neighbors = knn_query(X[tr_idx], X_te, k=params["knn_k"])
+            delta = knn_kernel_average(neighbors, resid, len(te_idx), sigma=params["knn_sigma"])
+            p_mix_te_1x2, p_mix_te_over = apply_knn_delta(p_mix_te_1x2, p_mix_te_over, delta)
+
+    # linhas O/U extras (--ou-lines): features 1x2, calibrador 1x2 e vizinhos KNN
+    # são os do fold; por linha só trocam as colunas de pOver e o calibrador O/U
+    def line_X(idx, po):
+        return with_ou_features(X[idx], po[idx], params["features"])
+
+    line_preds, line_metrics, m2_lines = {}, {}, {}
+    for j, tag in enumerate(params.get("ou_lines") or []):
+        with timer.stage(f"ou_line_{tag}"):
+            po, yo = data["pover_lines"][:, j], data["y_over_lines"][:, j]
+            init = state.get("m2_lines", {}).get(tag) if state is not None else None
+            ml = fit_bin_logit(line_X(tr2_idx, po), yo[tr2_idx], init=init,
+                               sample_weight=decay_weights(tr2_idx, data, params), C=params.get("logit_C", 1.0))
+            al = optimize_alpha_binary(po[val_idx], ml.predict_proba(line_X(val_idx, po))[:,1], yo[val_idx], **alpha_kw)
+            p_te = shrink_mix(po[te_idx], ml.predict_proba(line_X(te_idx, po))[:,1], alpha_rows(al, seg, te_idx))
+            if params["use_knn"]:
+                p_knn = shrink_mix(po[tr_idx], ml.predict_proba(line_X(tr_idx, po))[:,1], alpha_rows(al, seg, tr_idx))
+                d = knn_kernel_average(neighbors, yo[tr_idx].astype(float) - p_knn, len(te_idx), sigma=params["knn_sigma"])
+                p_te = np.clip(p_te + d, 1e-6, 1-1e-6)
+            line_preds[tag], m2_lines[tag] = p_te, ml
+            line_metrics[f"alpha_ou_{tag}"] = al if seg is None else float(np.mean(alpha_rows(al, seg, te_idx)))
+            line_metrics.update(metrics_ou(yo[te_idx], po[te_idx], p_te, suffix=f"_{tag}"))
+
+    metrics = {
+        "fold": fold,
+        "train_end_row": int(tr_idx[-1]),
+        "test_start_row": int(te_idx[0]),
+        "test_end_row": int(te_idx[-1]),
+        # segmentado: alpha médio efetivo no bloco de teste
+        "alpha_1x2": a1 if seg is None else float(np.mean(alpha_rows(a1, seg, te_idx))),
+        "alpha_ou": a2 if seg is None else float(np.mean(alpha_rows(a2, seg, te_idx))),
+        # métricas (teste)
+        **metrics_1x2(y_te_1x2, p_mkt_te, p_mix_te_1x2),
+        **metrics_ou(y_te_over, po_mkt_te, p_mix_te_over),
+        **line_metrics,
+    }
+
+    if state is not None and params.get("warm_start"):
+        # iterações do lbfgs deste fold (cada fold ainda reajusta a janela de treino inteira)
+        metrics.update({
+            "n_iter_1x2": int(np.max(m1.n_iter_)),
+            "n_iter_ou": int(np.max(m2.n_iter_)),
+        })
+        state["m1"], state["m2"] = m1, m2
+        state["m2_lines"] = m2_lines
+
+    if artefacts is not None:
+        artefacts.update({"m1": m1, "m2": m2, "a1": a1, "a2": a2, "m2_lines": m2_lines})
+
+    # previsões do bloco de teste: uma coluna (array) por campo, na ordem de te_idx
+    with timer.stage("rows"):
+        preds = {
+            "row": np.asarray(te_idx, dtype=np.int64),
+            "fold": np.full(len(te_idx), fold, dtype=np.int64),
+            "pH_mkt": p_mkt_te[:, 0], "pD_mkt": p_mkt_te[:, 1], "pA_mkt": p_mkt_te[:, 2],
+            "pH_mod": p_mix_te_1x2[:, 0], "pD_mod": p_mix_te_1x2[:, 1], "pA_mod": p_mix_te_1x2[:, 2],
+            "pOver_mkt": po_mkt_te, "pOver_mod": p_mix_te_over,
+            "y1x2": y_te_1x2, "yOver": y_te_over,
+        }
+        for k, tag in enumerate(line_preds):
+            preds[f"pOver_mkt_{tag}"] = data["pover_lines"][te_idx, k]
+            preds[f"pOver_mod_{tag}"] = line_preds[tag]
+            preds[f"yOver_{tag}"] = data["y_over_lines"][te_idx, k]
+
+    return metrics, preds
+
+# Cache de folds (--cache-dir): um .npz por fold, endereçado pelo hash do
+# recorte do dataset (treino + teste), das features e dos parâmetros do modelo.
+# Gravação atômica -> uma execução interrompida retoma do último fold completo.
+FOLD_CACHE_VERSION = 1
+_CACHE_IGNORED_PARAMS = ("cache_dir", "profile")
+
+def fold_cache_key(tr_idx: np.ndarray, te_idx: np.ndarray,
+                   data: Dict[str, np.ndarray], params: Dict) -> str:
+    import hashlib
+    h = hashlib.sha256()
+    meta = {k: v for k, v in params.items() if k not in _CACHE_IGNORED_PARAMS}
+    h.update(json.dumps({"version": FOLD_CACHE_VERSION, "params": meta},
+                        sort_keys=True, default=str).encode("utf-8"))
+    for idx in (tr_idx, te_idx):
+        h.update(np.ascontiguousarray(idx, dtype=np.int64).tobytes())
+        for name in sorted(data):
+            arr = np.ascontiguousarray(data[name][idx])
+            h.update(f"{name}:{arr.dtype.str}:{arr.shape}".encode("utf-8"))
+            h.update(arr.tobytes())
+    return h.hexdigest()
+
+def _save_fold_cache(path: str, metrics: Dict, preds: Dict[str, np.ndarray], artefacts: Dict):
+    m1, m2 = artefacts["m1"], artefacts["m2"]
+    cols = {f"row_{k}": np.asarray(v) for k, v in preds.items()}
+    tmp = path + ".tmp.npz"
+    np.savez_compressed(
+        tmp,
+        metrics=np.array(json.dumps(metrics)),
+        coef_1x2=m1.coef_, intercept_1x2=m1.intercept_,
+        coef_ou=m2.coef_, intercept_ou=m2.intercept_,
+        alpha_1x2=np.asarray(artefacts["a1"], dtype=float),
+        alpha_ou=np.asarray(artefacts["a2"], dtype=float),
+        **{f"coef_ou_{tag}": m.coef_ for tag, m in artefacts.get("m2_lines", {}).items()},
+        **{f"intercept_ou_{tag}": m.intercept_ for tag, m in artefacts.get("m2_lines", {}).items()},
+        **cols,
+    )
+    os.replace(tmp, path)
+
+def _load_fold_cache(path: str) -> Tuple[Dict, Dict[str, np.ndarray], Dict]:
+    from types import SimpleNamespace
+    with np.load(path, allow_pickle=False) as z:
+        metrics = json.loads(str(z["metrics"]))
+        preds = {k[len("row_"):]: z[k] for k in z.files if k.startswith("row_")}
+        # só coef_/intercept_: suficiente para warm start do fold seguinte
+        artefacts = {
+            "m1": SimpleNamespace(coef_=z["coef_1x2"], intercept_=z["intercept_1x2"]),
+            "m2": SimpleNamespace(coef_=z["coef_ou"], intercept_=z["intercept_ou"]),
+            "a1": z["alpha_1x2"], "a2": z["alpha_ou"],
+            "m2_lines": {k[len("coef_ou_"):]: SimpleNamespace(coef_=z[k], intercept_=z["intercept_ou_" + k[len("coef_ou_"):]])
+                         for k in z.files if k.startswith("coef_ou_")},
+        }
+    return metrics, preds, artefacts
+
+def run_fold_cached(fold: int, tr_idx: np.ndarray, te_idx: np.ndarray,
+                    data: Dict[str, np.ndarray], params: Dict,
+                    state: Optional[Dict] = None) -> Tuple[Dict, Dict[str, np.ndarray]]:
+    """
+    run_fold com cache em disco (se params["cache_dir"]). Com params["profile"],
+    os tempos por etapa vão em metrics["_timings"] (medidos no processo do fold).
+    """
+    timer = StageTimer(params.get("profile", False), fold=fold)
+    with timer.stage("fold"):
+        metrics, preds = _run_fold_cached(fold, tr_idx, te_idx, data, params, state, timer)
+    if timer.enabled:
+        metrics["_timings"] = timer.rows
+    return metrics, preds
+
+def _run_fold_cached(fold: int, tr_idx: np.ndarray, te_idx: np.ndarray,
+                     data: Dict[str, np.ndarray], params: Dict,
+                     state: Optional[Dict], timer: StageTimer) -> Tuple[Dict, Dict[str, np.ndarray]]:
+    cache_dir = params.get("cache_dir")
+    if not cache_dir:
+        return run_fold(fold, tr_idx, te_idx, data, params, state=state, timer=timer)
+    path = os.path.join(cache_dir, f"fold_{fold_cache_key(tr_idx, te_idx, data, params)}.npz")
+    cached = None
+    if os.path.exists(path):
+        try:
+            cached = _load_fold_cache(path)
+        except Exception as e:
+            # arquivo truncado/corrompido (ex: execução interrompida fora do os.replace): recalcula e regrava
+            print(f"Aviso: cache do fold {fold} ilegível ({type(e).__name__}); recalculando.")
+    if cached is not None:
+        metrics, preds, artefacts = cached
+        metrics["fold"] = fold
+        preds["fold"] = np.full(len(preds["row"]), fold, dtype=np.int64)
+        if state is not None and params.get("warm_start"):
+            state["m1"], state["m2"] = artefacts["m1"], artefacts["m2"]
+            state["m2_lines"] = artefacts["m2_lines"]
+        metrics["_cached"] = True
+        return metrics, preds
+    artefacts: Dict = {}
+    metrics, preds = run_fold(fold, tr_idx, te_idx, data, params, state=state, artefacts=artefacts, timer=timer)
+    _save_fold_cache(path, metrics, preds, artefacts)
+    return metrics, preds
+
+# Execução paralela de folds (--jobs N): os arrays do fold são gravados uma vez
+# em .npy e abertos por cada worker via np.load(mmap_mode="r") — memória
+# compartilhada somente leitura, sem copiar X para cada processo.
+_FOLD_DATA: Dict[str, np.ndarray] = {}
+_FOLD_PARAMS: Dict = {}
+_BLAS_LIMITER = None
+
+def _share_fold_data(data: Dict[str, np.ndarray], tmpdir: str) -> Dict[str, str]:
+    paths = {}
+    for name, arr in data.items():
+        path = os.path.join(tmpdir, f"{name}.npy")
+        np.save(path, np.ascontiguousarray(arr))
+        paths[name] = path
+    return paths
+
+def _init_fold_worker(paths: Dict[str, str], params: Dict, blas_threads: int):
+    global _BLAS_LIMITER
+    # limitar threads BLAS/OpenMP por worker (evita oversubscription N_jobs x N_cores)
+    from threadpoolctl import threadpool_limits
+    _BLAS_LIMITER = threadpool_limits(limits=blas_threads)
+    warnings.filterwarnings("ignore")
+    _FOLD_DATA.clear()
+    for name, path in paths.items():
+        _FOLD_DATA[name] = np.load(path, mmap_mode="r")
+    _FOLD_PARAMS.clear()
+    _FOLD_PARAMS.update(params)
+
+def _run_fold_worker(task):
+    fold, tr_idx, te_idx, _ = task
+    return run_fold_cached(fold, tr_idx, te_idx, _FOLD_DATA, _FOLD_PARAMS)
+
+def run_fold_tasks(tasks: List[Tuple[int, np.ndarray, np.ndarray, Optional[str]]],
+                   data: Dict[str, np.ndarray], params: Dict,
+                   jobs: int = 1) -> List[Tuple[Dict, Dict[str, np.ndarray]]]:
+    """
+    Executa tasks (fold, tr_idx, te_idx, grupo) — serial ou em process pool —
+    e devolve (métricas, previsões) na ordem das tasks. grupo: partição (--partition-by)
+    ou None para o modelo global; o estado encadeado é separado por grupo.
+    """
+    if params.get("warm_start") or params.get("knn_incremental"):
+        # estado encadeado fold k -> k+1: execução necessariamente serial
+        if jobs > 1:
+            raise ValueError("--warm-start/--knn-incremental encadeiam os folds; use --jobs 1.")
+        states: Dict[Optional[str], Dict] = {}
+        results = []
+        for fold, tr_idx, te_idx, group in tasks:
+            if group not in states:
+                states[group] = {}
+                if group is None and params.get("knn_incremental") and params["use_knn"]:
+                    states[group]["knn_index"] = GrowingKNNIndex(data["X"])
+            metrics, preds = run_fold_cached(fold, tr_idx, te_idx, data, params, state=states[group])
+            if params.get("warm_start"):
+                label = f"fold {fold}" + (f" [{group}]" if group is not None else "")
+                print(f"{label}: lbfgs iters 1x2={metrics['n_iter_1x2']}, O/U={metrics['n_iter_ou']}")
+            results.append((metrics, preds))
+        return results
+    if jobs <= 1 or len(tasks) <= 1:
+        return [run_fold_cached(fold, tr_idx, te_idx, data, params) for fold, tr_idx, te_idx, _ in tasks]
+    import tempfile
+    from concurrent.futures import ProcessPoolExecutor
+    jobs = min(jobs, len(tasks))
+    blas_threads = max(1, (os.cpu_count() or 1) // jobs)
+    with tempfile.TemporaryDirectory(prefix="hybrid_folds_") as tmpdir:
+        paths = _share_fold_data(data, tmpdir)
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_fold_worker,
+                                 initargs=(paths, params, blas_threads)) as ex:
+            # map preserva a ordem das tasks
+            return list(ex.map(_run_fold_worker, tasks))
+
+def _collect_fold_info(results: List[Tuple[Dict, Dict[str, np.ndarray]]], params: Dict,
+                       timer: Optional[StageTimer] = None):
+    """Retira das métricas os campos internos (_cached, _timings) e reporta."""
+    n_cached = sum(int(metrics.pop("_cached", False)) for metrics, _ in results)
+    for metrics, _ in results:
+        fold_rows = metrics.pop("_timings", [])
+        if timer is not None and timer.enabled:
+            timer.rows.extend(fold_rows)
+    if params.get("cache_dir"):
+        print(f"Cache de folds: {n_cached}/{len(results)} reaproveitados ({params['cache_dir']})")
+
+def run_walk_forward(splits: List[Tuple[np.ndarray, np.ndarray]],
+                     data: Dict[str, np.ndarray], params: Dict,
+                     jobs: int = 1, timer: Optional[StageTimer] = None) -> Tuple[List[Dict], "PredictionStore"]:
+    """
+    Executa todos os folds (serial ou em process pool) e junta os resultados
+    na ordem dos folds — a saída é idêntica à execução serial.
+    timer: recebe os tempos por fold/etapa (--profile).
+    """
+    tasks = [(fold, tr_idx, te_idx, None) for fold, (tr_idx, te_idx) in enumerate(splits, start=1)]
+    results = run_fold_tasks(tasks, data, params, jobs=jobs)
+    _collect_fold_info(results, params, timer)
+    store = PredictionStore(len(data["X"]), params.get("ou_lines") or [])
+    for _, preds in results:
+        store.write(preds)
+    return [metrics for metrics, _ in results], store
+
+# Calibradores por partição (--partition-by League): em cada fold, cada partição
+# com treino suficiente ganha o próprio stack (calibradores + alpha + KNN),
+# treinado só nas suas linhas; as linhas de teste das partições pequenas ficam
+# com o modelo global do fold. Partições e folds são tasks independentes do
+# mesmo pool (--jobs), então o custo total ~ o da execução global.
+def partition_tasks(splits: List[Tuple[np.ndarray, np.ndarray]], part: np.ndarray,
+                    names: List[str], min_rows: int) -> List[Tuple[int, np.ndarray, np.ndarray, Optional[str]]]:
+    tasks = []
+    for fold, (tr_idx, te_idx) in enumerate(splits, start=1):
+        tr_counts = np.bincount(part[tr_idx], minlength=len(names))
+        own = tr_counts[part[te_idx]] >= min_rows
+        for p in np.unique(part[te_idx][own]):
+            tasks.append((fold, tr_idx[part[tr_idx] == p], te_idx[part[te_idx] == p], names[p]))
+        if not own.all():
+            # modelo global (treino completo) só para as linhas de teste sem partição própria
+            tasks.append((fold, tr_idx, te_idx[~own], None))
+    return tasks
+
+def run_walk_forward_partitioned(splits: List[Tuple[np.ndarray, np.ndarray]],
+                                 data: Dict[str, np.ndarray], params: Dict,
+                                 part: np.ndarray, names: List[str], min_rows: int,
+                                 jobs: int = 1, timer: Optional[StageTimer] = None
+                                 ) -> Tuple[List[Dict], "PredictionStore", List[Dict]]:
+    """
+    Como run_walk_forward, com um modelo por partição. Retorna (métricas por fold
+    sobre o teste completo, previsões, métricas por fold x partição).
+    """
+    tasks = partition_tasks(splits, part, names, min_rows)
+    results = run_fold_tasks(tasks, data, params, jobs=jobs)
+    _collect_fold_info(results, params, timer)
+
+    store = PredictionStore(len(data["X"]), params.get("ou_lines") or [])
+    by_fold: Dict[int, List] = {}
+    part_metrics = []
+    for (fold, _, te_idx, group), (metrics, preds) in zip(tasks, results):
+        store.write(preds)
+        by_fold.setdefault(fold, []).append((len(te_idx), metrics, group))
+        part_metrics.append({"fold": fold, "partition": group if group is not None else "(global)",
+                             "test_rows": len(te_idx), **{k: v for k, v in metrics.items() if k != "fold"}})
+
+    fold_metrics = []
+    for fold, (tr_idx, te_idx) in enumerate(splits, start=1):
+        parts = by_fold[fold]
+        # as partições cobrem o teste do fold: lê direto do store, já na ordem das linhas
+        pred = store.columns_at(te_idx)
+
+        def alpha_mean(key):
+            # alpha efetivo = média dos alphas das tasks ponderada pelas linhas de teste
+            return float(sum(n * m[key] for n, m, _ in parts) / len(te_idx))
+
+        metrics = {
+            "fold": fold,
+            "train_end_row": int(tr_idx[-1]),
+            "test_start_row": int(te_idx[0]),
+            "test_end_row": int(te_idx[-1]),
+            "alpha_1x2": alpha_mean("alpha_1x2"),
+            "alpha_ou": alpha_mean("alpha_ou"),
+            **metrics_1x2(pred["y1x2"], np.column_stack([pred["pH_mkt"], pred["pD_mkt"], pred["pA_mkt"]]),
+                          np.column_stack([pred["pH_mod"], pred["pD_mod"], pred["pA_mod"]])),
+            **metrics_ou(pred["yOver"], pred["pOver_mkt"], pred["pOver_mod"]),
+        }
+        for tag in params.get("ou_lines") or []:
+            metrics[f"alpha_ou_{tag}"] = alpha_mean(f"alpha_ou_{tag}")
+            metrics.update(metrics_ou(pred[f"yOver_{tag}"], pred[f"pOver_mkt_{tag}"],
+                                      pred[f"pOver_mod_{tag}"], suffix=f"_{tag}"))
+        metrics["partitions_fitted"] = sum(1 for *_, group in parts if group is not None)
+        fold_metrics.append(metrics)
+    return fold_metrics, store, part_metrics
+
+# ----------------------------
+# Tuning de KNN k / sigma e C do logit (--mode tune)
+# ----------------------------
+# Por fold: o treino é dividido como num fold (temporal_split) — calibradores e
+# alpha nos 80% iniciais, validação nos 20% finais. Os vizinhos da validação
+# são consultados UMA vez com o maior k da grade; como vêm ordenados por
+# distância, a média com os k primeiros é cumsum(w*r)[k-1] / cumsum(w)[k-1],
+# então um cumsum por (C, sigma) avalia todos os k. C só muda os calibradores
+# (um par de fits por valor). Successive halving sobre as linhas de validação:
+# todas as configs num subconjunto pequeno, as 1/eta melhores em eta x mais
+# linhas, até a validação inteira.
+TUNE_PARAMS = {"knn_k": int, "knn_sigma": float, "C": float}
+
+def _row_logloss(p_1x2: np.ndarray, p_over: np.ndarray, y_1x2: np.ndarray, y_over01: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Soma da log-loss 1x2 e O/U sobre as linhas (eixo 0); aceita eixos extras de config."""
+    pt = np.take_along_axis(p_1x2, y_1x2.reshape((-1,) + (1,) * (p_1x2.ndim - 1)), axis=-1)[..., 0]
+    yo = y_over01.reshape((-1,) + (1,) * (p_over.ndim - 1)) == 1
+    po = np.where(yo, p_over, 1.0 - p_over)
+    return (-np.log(np.clip(pt, _LL_EPS, 1 - _LL_EPS)).sum(axis=0),
+            -np.log(np.clip(po, _LL_EPS, 1 - _LL_EPS)).sum(axis=0))
+
+def knn_grid_logloss(dist: np.ndarray, nbr: np.ndarray, resid: np.ndarray,
+                     p_1x2: np.ndarray, p_over: np.ndarray, y_1x2: np.ndarray, y_over01: np.ndarray,
+                     ks: np.ndarray, sigma: float, max_cells: int = 1_000_000) -> np.ndarray:
+    """
+    LogLoss média (1x2, O/U) da validação para cada k de ks (len(ks), 2), com um
+    sigma e vizinhos (dist, nbr) do maior k em ordem de distância. k <= 5
+    = sem ajuste KNN (como knn_query). Em blocos de linhas: memória ~ max_cells * 4.
+    """
+    ks = np.minimum(np.asarray(ks, dtype=np.int64), dist.shape[1])
+    out = np.zeros((len(ks), 2))
+    use = ks > 5
+    if (~use).any():
+        out[~use] = np.array(_row_logloss(p_1x2, p_over, y_1x2, y_over01))
+    if use.any():
+        kk = ks[use] - 1
+        chunk = max(1, max_cells // dist.shape[1])
+        for start in range(0, len(dist), chunk):
+            sl = slice(start, start + chunk)
+            w = np.exp(-(dist[sl] ** 2) / (2 * (sigma ** 2)))
+            cw = np.cumsum(w, axis=1)[:, kk]                               # (m, K)
+            cr = np.cumsum(w[:, :, None] * resid[nbr[sl]], axis=1)[:, kk]  # (m, K, 4)
+            delta = cr / (cw[:, :, None] + 1e-12)
+            p1 = np.clip(p_1x2[sl, None, :] + delta[:, :, :3], 1e-6, 1.0)
+            p1 = _safe_div(p1, p1.sum(axis=2, keepdims=True))
+            po = np.clip(p_over[sl, None] + delta[:, :, 3], 1e-6, 1 - 1e-6)
+            ll1, llo = _row_logloss(p1, po, y_1x2[sl], y_over01[sl])
+            out[use, 0] += ll1
+            out[use, 1] += llo
+    out[use] /= len(dist)
+    if (~use).any():
+        out[~use] /= len(dist)
+    return out
+
+def tune_fold(fold: int, tr_idx: np.ndarray, data: Dict[str, np.ndarray], params: Dict,
+              grid: pd.DataFrame, eta: int = 3, min_rows: int = 500,
+              timer: StageTimer = _NO_TIMER) -> pd.DataFrame:
+    """
+    Successive halving da grade (knn_k, knn_sigma, C) num fold. Retorna uma
+    linha por (rung, config avaliada): rows, logloss_1x2, logloss_ou, logloss (soma).
+    """
+    X, seg = data["X"], data.get("segment")
+    tr2_idx, val_idx = temporal_split(tr_idx)
+    y1, yo = data["y_1x2"][val_idx], data["y_over01"][val_idx]
+    with timer.stage("tune_knn_query"):
+        neighbors = knn_query(X[tr2_idx], X[val_idx], k=int(grid["knn_k"].max()))
+    if neighbors is None:  # treino pequeno demais: só o calibrador
+        neighbors = (np.zeros((len(val_idx), 1)), np.zeros((len(val_idx), 1), dtype=np.int64))
+    dist, nbr = neighbors
+
+    base = {}
+    for C in grid["C"].unique():
+        with timer.stage("tune_fit"):
+            model = fit_calibrators(tr2_idx, data, {**params, "logit_C": float(C)})
+            p_1x2, p_over = predict_mix(model, X[val_idx], data["p1x2_mkt"][val_idx], data["pover_mkt"][val_idx],
+                                        seg[val_idx] if seg is not None else None)
+            base[C] = (p_1x2, p_over, knn_residuals(model, tr2_idx, data))
+
+    n_val = len(val_idx)
+    n_rungs = max(0, int(math.ceil(math.log(len(grid)) / math.log(eta) - 1e-9)))
+    alive = grid.reset_index(drop=True)
+    rungs = []
+    for rung in range(n_rungs + 1):
+        n_rows = int(min(n_val, max(min_rows, math.ceil(n_val * eta ** (rung - n_rungs)))))
+        pos = np.unique(np.linspace(0, n_val - 1, n_rows).round().astype(np.int64))
+        ll = np.zeros((len(alive), 2))
+        with timer.stage("tune_eval"):
+            for (C, sigma), g in alive.groupby(["C", "knn_sigma"], sort=False):
+                p_1x2, p_over, resid = base[C]
+                ll[g.index] = knn_grid_logloss(dist[pos], nbr[pos], resid, p_1x2[pos], p_over[pos],
+                                               y1[pos], yo[pos], g["knn_k"].values, sigma)
+        res = alive.assign(fold=fold, rung=rung, rows=len(pos), logloss_1x2=ll[:, 0], logloss_ou=ll[:, 1],
+                           logloss=ll.sum(axis=1))
+        rungs.append(res)
+        if rung < n_rungs:
+            keep = max(1, int(math.ceil(len(alive) / eta)))
+            alive = alive.loc[res.sort_values("logloss", kind="stable").index[:keep]].reset_index(drop=True)
+    return pd.concat(rungs, ignore_index=True)
+
+def run_tuning(splits: List[Tuple[np.ndarray, np.ndarray]], data: Dict[str, np.ndarray],
+               params: Dict, args, timer: StageTimer = _NO_TIMER) -> pd.DataFrame:
+    """
+    Tuning em todos os folds (só o treino de cada fold; o bloco de teste não é
+    usado). Grava tune_results.csv (todas as avaliações) e tune_best.csv (melhor
+    config por fold na validação inteira) e devolve o melhor por fold.
+    """
+    defaults = {"knn_k": params["knn_k"], "knn_sigma": params["knn_sigma"], "C": params.get("logit_C", 1.0)}
+    grid = pd.DataFrame(parse_sweep(args.tune, defaults, types=TUNE_PARAMS)).drop_duplicates(ignore_index=True)
+    print(f"Tuning: {len(grid)} configs (knn_k x knn_sigma x C) x {len(splits)} folds, eta={args.tune_eta}")
+    results = []
+    for fold, (tr_idx, _) in enumerate(splits, start=1):
+        fold_timer = StageTimer(timer.enabled, fold=fold)
+        with fold_timer.stage("fold"):
+            results.append(tune_fold(fold, tr_idx, data, params, grid, eta=args.tune_eta,
+                                     min_rows=args.tune_min_rows, timer=fold_timer))
+        timer.rows.extend(fold_timer.rows)
+    res = pd.concat(results, ignore_index=True)
+    last = res[res["rung"] == res.groupby("fold")["rung"].transform("max")]
+    best = last.loc[last.groupby("fold")["logloss"].idxmin()].reset_index(drop=True)
+    res.to_csv(os.path.join(args.outdir, "tune_results.csv"), index=False)
+    best.to_csv(os.path.join(args.outdir, "tune_best.csv"), index=False)
+
+    cols = ["knn_k", "knn_sigma", "C"]
+    for r in best.itertuples():
+        print(f"fold {r.fold}: knn_k={r.knn_k} knn_sigma={r.knn_sigma:g} C={r.C:g} "
+              f"-> LogLoss val 1x2={r.logloss_1x2:.6f} O/U={r.logloss_ou:.6f} ({r.rows} linhas)")
+    # recomendação: config que vence mais folds (empate -> menor LogLoss média)
+    votes = best.groupby(cols).agg(wins=("fold", "size"), logloss=("logloss", "mean"))
+    top = votes.sort_values(["wins", "logloss"], ascending=[False, True]).index[0]
+    print(f"OK. Sugestão: --use-knn --knn-k {top[0]} --knn-sigma {top[1]:g} --logit-C {top[2]:g} "
+          f"(melhor em {votes.loc[top, 'wins']}/{len(best)} folds). Detalhes em: {args.outdir}")
+    return best
+
 # ----------------------------
 # Plot helpers
 # ----------------------------
@@ -425,226 +1806,798 @@ def save_bankroll_plot(bankroll_df: pd.DataFrame, title: str, outpath: str):
     plt.savefig(outpath, dpi=160, bbox_inches="tight")
     plt.close()
 
+# ----------------------------
+# Resumo / relatório
+# ----------------------------
+def fold_summary(metrics_df: pd.DataFrame, args) -> Dict:
+    def agg_metrics(prefix):
+        return {
+            f"{prefix}_mean": float(metrics_df[prefix].mean()),
+            f"{prefix}_std": float(metrics_df[prefix].std(ddof=1)) if len(metrics_df)>1 else 0.0
+        }
+
+    return {
+        "folds": int(len(metrics_df)),
+        **agg_metrics("logloss_mkt_1x2"),
+        **agg_metrics("logloss_mod_1x2"),
+        **agg_metrics("brier_mkt_1x2"),
+        **agg_metrics("brier_mod_1x2"),
+        **agg_metrics("logloss_mkt_ou"),
+        **agg_metrics("logloss_mod_ou"),
+        **agg_metrics("brier_mkt_ou"),
+        **agg_metrics("brier_mod_ou"),
+        "alpha_1x2_mean": float(metrics_df["alpha_1x2"].mean()),
+        "alpha_ou_mean": float(metrics_df["alpha_ou"].mean()),
+        **({"n_iter_1x2_total": int(metrics_df["n_iter_1x2"].sum()),
+            "n_iter_ou_total": int(metrics_df["n_iter_ou"].sum())}
+           if "n_iter_1x2" in metrics_df else {}),
+    }
+
+CALIB_TARGETS = ["H", "D", "A", "Over"]
+
+def calibration_accumulator(args) -> CalibrationAccumulator:
+    bands = [float(x) for x in (args.calib_odds_bands or "").split(",") if x.strip()]
+    return CalibrationAccumulator(CALIB_TARGETS, n_bins=10, odds_bands=bands or None)
+
+def calib_by_columns(args) -> List[str]:
+    """Colunas de --calib-by ("League, Season" -> ["League", "Season"])."""
+    return [c.strip() for c in (args.calib_by or "").split(",") if c.strip()]
+
+def calibration_groups(df_rows: pd.DataFrame, folds: np.ndarray, args) -> Dict[str, np.ndarray]:
+    """Recortes da calibração: fold + colunas de --calib-by presentes (ex: League)."""
+    return {"fold": np.asarray(folds), **{c: df_rows[c].values for c in calib_by_columns(args) if c in df_rows.columns}}
+
+def add_calibration(acc: CalibrationAccumulator, y_1x2, y_over01, p_mkt_1x2, p_mod_1x2,
+                    p_mkt_over, p_mod_over, odds_1x2, odds_over, groups: Dict[str, np.ndarray]):
+    """Junta 1x2 e O/U em (n, 4) = H, D, A, Over e acumula mercado e modelo."""
+    y = np.column_stack([np.eye(3)[np.asarray(y_1x2, dtype=int)], y_over01])
+    acc.add(y, {"market": np.column_stack([p_mkt_1x2, p_mkt_over]),
+                "model": np.column_stack([p_mod_1x2, p_mod_over])},
+            odds=np.column_stack([odds_1x2, odds_over]), groups=groups)
+
+def write_calibration(acc: CalibrationAccumulator, outdir: str) -> Dict:
+    """calibration_reliability.csv + calibration_summary.csv; devolve ECE/MCE/sharpness gerais."""
+    rel, summ = acc.tables()
+    rel.to_csv(os.path.join(outdir, "calibration_reliability.csv"), index=False)
+    summ.to_csv(os.path.join(outdir, "calibration_summary.csv"), index=False)
+    pooled = summ[summ["breakdown"] == "all"]
+    return {src: {r.target: {"ece": float(r.ece), "mce": float(r.mce), "sharpness": float(r.sharpness)}
+                  for r in g.itertuples()}
+            for src, g in pooled.groupby("source", sort=False)}
+
+# (chave, rótulo, escala, formato) das linhas da tabela de ICs no REPORT.md
+BOOTSTRAP_REPORT_ROWS = [
+    ("yield", "Yield (pnl/stake, %)", 100.0, ".2f"),
+    ("roi", "ROI do bankroll (%)", 100.0, ".2f"),
+    ("max_drawdown", "Max drawdown (%)", 100.0, ".1f"),
+    ("logloss_1x2_improvement", "Melhora LogLoss 1x2 (mercado - modelo)", 1.0, ".6f"),
+    ("brier_1x2_improvement", "Melhora Brier 1x2 (mercado - modelo)", 1.0, ".6f"),
+    ("logloss_ou_improvement", "Melhora LogLoss O/U (mercado - modelo)", 1.0, ".6f"),
+    ("brier_ou_improvement", "Melhora Brier O/U (mercado - modelo)", 1.0, ".6f"),
+]
+
+def bootstrap_summary(pred_df: pd.DataFrame, bets_df: pd.DataFrame, df: pd.DataFrame,
+                      date_col: str, args) -> Dict:
+    """
+    ICs por block bootstrap (blocos de --bootstrap-block-days dias) para yield,
+    ROI, max drawdown e melhora de LogLoss/Brier do modelo sobre o mercado.
+    """
+    dates = df[date_col].values if date_col and date_col in df.columns else None
+    blocks = date_blocks(dates, n=len(df), days=args.bootstrap_block_days)
+    row_metrics = row_score_diffs(
+        pred_df["y1x2"].values, pred_df[["pH_mkt", "pD_mkt", "pA_mkt"]].values, pred_df[["pH_mod", "pD_mod", "pA_mod"]].values,
+        pred_df["yOver"].values, pred_df["pOver_mkt"].values, pred_df["pOver_mod"].values)
+    bet_rows = bets_df["idx"].values.astype(int) if len(bets_df) else np.zeros(0, dtype=int)
+    # blocos só do período de teste, renumerados 0..B-1
+    used, codes = np.unique(np.concatenate([blocks[pred_df["row"].values.astype(int)], blocks[bet_rows]]),
+                            return_inverse=True)
+    ci = block_bootstrap(codes[:len(pred_df)], row_metrics, codes[len(pred_df):],
+                         bets_df["stake"].values if len(bets_df) else np.zeros(0),
+                         bets_df["pnl"].values if len(bets_df) else np.zeros(0),
+                         bankroll0=args.bankroll0, n_resamples=args.bootstrap,
+                         ci=args.bootstrap_ci, seed=args.bootstrap_seed)
+    return {"resamples": int(args.bootstrap), "ci": float(args.bootstrap_ci),
+            "block_days": int(args.bootstrap_block_days) if dates is not None else None,
+            "blocks": int(len(used)), **ci}
+
+def write_summary_report(summary: Dict, args, date_col: str, sweep_df: Optional[pd.DataFrame] = None):
+    """Grava summary.json e REPORT.md em args.outdir."""
+    if sweep_df is not None:
+        best = sweep_df.sort_values("roi", ascending=False).iloc[0]
+        summary["sweep_configs"] = int(len(sweep_df))
+        summary["sweep_best_roi"] = {k: (v.item() if hasattr(v, "item") else v) for k, v in best.items()}
+    with open(os.path.join(args.outdir, "summary.json"), "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+
+    # markdown report
+    md = []
+    md.append("# Relatório — Hybrid Closing Line (1x2 + O/U)\n")
+    if date_col:
+        md.append(f"- Ordenação temporal: `{date_col}`\n")
+    else:
+        md.append("- Ordenação temporal: **(não informada)** — recomendado incluir coluna de data.\n")
+    md.append(f"- Folds: {summary['folds']}\n")
+    if summary.get("train_window"):
+        tw = summary["train_window"]
+        parts = ([f"últimas {tw['rows']} linhas"] if tw["rows"] else []) + ([f"últimos {tw['days']:g} dias"] if tw["days"] else [])
+        decay = f", meia-vida {tw['decay_half_life']:g}" if tw["decay_half_life"] else ""
+        md.append(f"- Janela de treino: {' e '.join(parts) or 'expanding'}{decay} "
+                  f"({tw['train_rows_min']}–{tw['train_rows_max']} linhas por fold)\n")
+    md.append(f"- Teste agregado: {summary['rows_test_agg']} linhas\n")
+    md.append("\n## Métricas (média ± desvio)\n")
+    md.append(f"- LogLoss 1x2 — Mercado: {summary['logloss_mkt_1x2_mean']:.6f} ± {summary['logloss_mkt_1x2_std']:.6f}\n")
+    md.append(f"- LogLoss 1x2 — Modelo : {summary['logloss_mod_1x2_mean']:.6f} ± {summary['logloss_mod_1x2_std']:.6f}\n")
+    md.append(f"- Brier 1x2   — Mercado: {summary['brier_mkt_1x2_mean']:.6f} ± {summary['brier_mkt_1x2_std']:.6f}\n")
+    md.append(f"- Brier 1x2   — Modelo : {summary['brier_mod_1x2_mean']:.6f} ± {summary['brier_mod_1x2_std']:.6f}\n")
+    md.append(f"- LogLoss O/U — Mercado: {summary['logloss_mkt_ou_mean']:.6f} ± {summary['logloss_mkt_ou_std']:.6f}\n")
+    md.append(f"- LogLoss O/U — Modelo : {summary['logloss_mod_ou_mean']:.6f} ± {summary['logloss_mod_ou_std']:.6f}\n")
+    md.append(f"- Brier O/U   — Mercado: {summary['brier_mkt_ou_mean']:.6f} ± {summary['brier_mkt_ou_std']:.6f}\n")
+    md.append(f"- Brier O/U   — Modelo : {summary['brier_mod_ou_mean']:.6f} ± {summary['brier_mod_ou_std']:.6f}\n")
+    if "partition_by" in summary:
+        md.append(f"- Calibradores por partição: `{summary['partition_by']}` "
+                  f"({summary['partitions_fitted_mean']:.1f} partições com modelo próprio por fold — partition_metrics.csv)\n")
+    md.append("\n## Shrinkage\n")
+    md.append(f"- alpha_1x2 (média): {summary['alpha_1x2_mean']:.3f}\n")
+    md.append(f"- alpha_ou  (média): {summary['alpha_ou_mean']:.3f}\n")
+    md.append("\n## Simulação de apostas (teórico no closing)\n")
+    md.append(f"- min_edge: {args.min_edge}\n")
+    md.append(f"- stake_mode: {args.stake_mode}\n")
+    md.append(f"- bets: {summary['bets_count']}\n")
+    md.append(f"- ROI: {summary['bets_roi']*100:.2f}%\n")
+    md.append(f"- Bankroll final: {summary['final_bankroll']:.2f}\n")
+    if summary.get("calibration"):
+        cal = summary["calibration"]
+        md.append("\n## Calibração (geral — por fold/liga/faixa de odd em calibration_summary.csv)\n")
+        table = ["| alvo | ECE mercado | ECE modelo | MCE mercado | MCE modelo | sharpness mercado | sharpness modelo |",
+                 "|---|---|---|---|---|---|---|"]
+        for t in CALIB_TARGETS:
+            mk_, md_ = cal["market"][t], cal["model"][t]
+            table.append(f"| {t} | {mk_['ece']:.4f} | {md_['ece']:.4f} | {mk_['mce']:.4f} | {md_['mce']:.4f} | "
+                         f"{mk_['sharpness']:.5f} | {md_['sharpness']:.5f} |")
+        md.append("\n".join(table) + "\n")
+    if summary.get("bootstrap"):
+        bs = summary["bootstrap"]
+        unit = f"blocos de {bs['block_days']} dias" if bs["block_days"] else "blocos de linhas consecutivas"
+        md.append(f"\n## Intervalos de confiança ({bs['ci']*100:g}%, block bootstrap — {bs['resamples']} réplicas, "
+                  f"{bs['blocks']} {unit})\n")
+        table = ["| métrica | estimativa | IC inferior | IC superior |", "|---|---|---|---|"]
+        for key, label, scale, fmt in BOOTSTRAP_REPORT_ROWS:
+            r = bs[key]
+            cells = [("—" if r[c] is None else f"{r[c]*scale:{fmt}}") for c in ("point", "lo", "hi")]
+            table.append(f"| {label} | " + " | ".join(cells) + " |")
+        md.append("\n".join(table) + "\n")
+    if summary.get("ou_lines"):
+        md.append("\n## O/U por linha (só O/U — ou_lines_summary.csv)\n")
+        table = ["| linha | alpha | LogLoss mercado | LogLoss modelo | bets | ROI | bankroll final |",
+                 "|---|---|---|---|---|---|---|"]
+        for r in summary["ou_lines"]:
+            table.append(f"| {r['line']} | {r['alpha_ou']:.3f} | {r['logloss_mkt_ou']:.6f} | {r['logloss_mod_ou']:.6f} | "
+                         f"{r['bets_count']} | {r['bets_roi']*100:.2f}% | {r['final_bankroll']:.2f} |")
+        md.append("\n".join(table) + "\n")
+    if sweep_df is not None:
+        b = summary["sweep_best_roi"]
+        md.append(f"\n## Sweep ({summary['sweep_configs']} configs — sweep_results.csv)\n")
+        md.append(f"- Melhor ROI: {b['roi']*100:.2f}% (min_edge={b['min_edge']}, stake_mode={b['stake_mode']}, "
+                  f"fkelly={b['fkelly']}, max_kelly={b['max_kelly']}, max_bets_per_game={b['max_bets_per_game']}, "
+                  f"bets={b['bets_count']}, max DD={b['max_drawdown']*100:.1f}%)\n")
+    md.append("\n## Arquivos gerados\n")
+    md.append("".join(f"- {f}\n" for f in summary.get("predictions_files", ["predictions_walkforward.csv"])))
+    md.append("- fold_metrics.csv\n- calibration_bins_ou_market.csv\n- calibration_bins_ou_model.csv\n- calibration_ou_market.png\n- calibration_ou_model.png\n- calibration_reliability.csv\n- calibration_summary.csv\n- bets_simulated.csv\n- bankroll_path.csv\n- bankroll.png\n- summary.json\n")
+    with open(os.path.join(args.outdir, "REPORT.md"), "w", encoding="utf-8") as f:
+        f.write("\n".join(md))
+
+    print("OK. Saída em:", args.outdir)
+    print("Resumo:", json.dumps(summary, ensure_ascii=False, indent=2))
+
+
+# ----------------------------
+# Streaming (out-of-core)
+# ----------------------------
+def iter_dataset_chunks(args, chunk_rows: int):
+    """
+    (mapping, iterador de chunks) com só as colunas usadas e nomes normalizados.
+    CSV (local/URL) é lido com chunksize; com --data-cache, lotes do parquet.
+    """
+    if args.data_cache:
+        import pyarrow.parquet as pq
+        pq_path = cached_dataset(args.data_url, args.sheet, args.data_cache)
+        names = parquet_columns(pq_path)
+        mapping = detect_columns(pd.DataFrame(columns=names))
+        wanted = set(c for c in list(mapping.values()) + [args.date_col, args.ou_line_col] + calib_by_columns(args) if c)
+        cols = [c for c in names if c in wanted]
+        batches = pq.ParquetFile(pq_path).iter_batches(batch_size=chunk_rows, columns=cols)
+        return mapping, (b.to_pandas() for b in batches)
+    if args.data_url.lower().endswith((".xlsx", ".xls")):
+        raise ValueError("--stream requer CSV (ou --data-cache); xlsx não é lido em partes.")
+    raw = list(pd.read_csv(args.data_url, nrows=0).columns)
+    norm = list(normalize_columns(pd.DataFrame(columns=raw)).columns)
+    mapping = detect_columns(pd.DataFrame(columns=norm))
+    wanted = set(c for c in list(mapping.values()) + [args.date_col, args.ou_line_col] + calib_by_columns(args) if c)
+    usecols = [r for r, n_ in zip(raw, norm) if n_ in wanted]
+    rename = {r: n_ for r, n_ in zip(raw, norm)}
+    reader = pd.read_csv(args.data_url, chunksize=chunk_rows, usecols=usecols)
+    return mapping, (c.rename(columns=rename) for c in reader)
+
+def _append_csv(df: pd.DataFrame, path: str, written: set):
+    df.to_csv(path, mode="a" if path in written else "w", header=path not in written, index=False)
+    written.add(path)
+
+# opções sem efeito em --stream: (atributo, flag, motivo) — main recusa com ap.error
+STREAM_UNSUPPORTED = [
+    ("use_knn", "--use-knn", "precisa do treino inteiro em memória"),
+    ("sweep", "--sweep", "sem previsões em memória para re-simular"),
+    ("ou_lines", "--ou-lines", "use --ou-line-col para linha por jogo"),
+    ("profile", "--profile", "sem folds para medir"),
+    ("window", "--window", "o treino é incremental (partial_fit)"),
+    ("window_days", "--window-days", "o treino é incremental (partial_fit)"),
+    ("decay_half_life", "--decay-half-life", "o treino é incremental (partial_fit)"),
+    ("alpha_segment", "--alpha-segment", "alpha único por chunk"),
+    ("partition_by", "--partition-by", "sem folds por partição"),
+    ("warm_start", "--warm-start", "já implícito (partial_fit)"),
+    ("cache_dir", "--cache-dir", "não há folds para guardar"),
+]
+
+def stream_conflicts(args) -> List[str]:
+    """Opções pedidas que --stream não suporta, com o motivo."""
+    bad = [f"{flag} ({why})" for attr, flag, why in STREAM_UNSUPPORTED if getattr(args, attr)]
+    if args.jobs > 1:
+        bad.append("--jobs (chunks em sequência)")
+    return bad
+
+def run_streaming(args):
+    """
+    Backtest prequencial em chunks ordenados por data: cada chunk é previsto com
+    os calibradores atuais e só depois entra no treino (partial_fit). O alpha
+    usado num chunk foi otimizado no chunk anterior (fora da amostra).
+    Previsões, apostas e bankroll vão direto para disco; a memória de pico
+    depende de --chunk-rows, não do tamanho do dataset.
+    """
+    from sklearn.linear_model import SGDClassifier
+
+    mapping, chunks = iter_dataset_chunks(args, args.chunk_rows)
+    date_col = args.date_col or mapping.get("date") or ""
+    m1 = SGDClassifier(loss="log_loss", alpha=1e-4, random_state=0)
+    m2 = SGDClassifier(loss="log_loss", alpha=1e-4, random_state=0)
+    fitted = False
+    a1 = a2 = 1.0
+    n_bins = 10
+    calib = {k: np.zeros((3, n_bins)) for k in ("mkt", "mod")}  # count, p_sum, y_sum
+    calib_acc = calibration_accumulator(args)
+    fold_metrics = []
+    written: set = set()
+    paths = {k: os.path.join(args.outdir, f) for k, f in [
+        ("pred", "predictions_walkforward.csv"), ("bets", "bets_simulated.csv"), ("bank", "bankroll_path.csv")]}
+    bankroll, stake_sum, pnl_sum, bets_count = float(args.bankroll0), 0.0, 0.0, 0
+    bank_plot: List[float] = []
+    seen, rows_test, last_date = 0, 0, None
+
+    for chunk_no, chunk in enumerate(chunks, start=1):
+        if date_col and date_col in chunk.columns:
+            dates = pd.to_datetime(chunk[date_col], errors="coerce")
+            if not dates.is_monotonic_increasing or (last_date is not None and dates.iloc[0] < last_date):
+                raise ValueError("--stream requer o dataset já ordenado por data.")
+            last_date = dates.iloc[-1]
+        chunk.index = np.arange(seen, seen + len(chunk))
+        ou_line = chunk[args.ou_line_col].astype(float).values if args.ou_line_col else args.ou_line
+        mk = prepare_market_arrays(chunk, mapping, ou_line, devig=args.devig)
+        X = market_features(mk["p1x2_mkt"], mk["pover_mkt"]).values.astype(float)
+        y1, yo = mk["y_1x2"], mk["y_over01"]
+
+        if fitted:
+            p_cal_1x2 = m1.predict_proba(X)
+            p_cal_over = m2.predict_proba(X)[:, 1]
+            if seen >= args.min_train:
+                p_mix_1x2 = shrink_mix(mk["p1x2_mkt"], p_cal_1x2, a1)
+                p_mix_over = shrink_mix(mk["pover_mkt"], p_cal_over, a2)
+                po_mkt = mk["pover_mkt"]
+                fold_metrics.append({
+                    "fold": chunk_no,
+                    "train_end_row": seen - 1,
+                    "test_start_row": seen,
+                    "test_end_row": seen + len(chunk) - 1,
+                    "alpha_1x2": a1,
+                    "alpha_ou": a2,
+                    **metrics_1x2(y1, mk["p1x2_mkt"], p_mix_1x2),
+                    **metrics_ou(yo, po_mkt, p_mix_over),
+                })
+                _append_csv(pd.DataFrame({
+                    "row": chunk.index, "fold": chunk_no,
+                    "pH_mkt": mk["p1x2_mkt"][:, 0], "pD_mkt": mk["p1x2_mkt"][:, 1], "pA_mkt": mk["p1x2_mkt"][:, 2],
+                    "pH_mod": p_mix_1x2[:, 0], "pD_mod": p_mix_1x2[:, 1], "pA_mod": p_mix_1x2[:, 2],
+                    "pOver_mkt": po_mkt, "pOver_mod": p_mix_over, "y1x2": y1, "yOver": yo,
+                }), paths["pred"], written)
+                calib["mkt"] += calibration_sums(yo, po_mkt, n_bins)
+                calib["mod"] += calibration_sums(yo, p_mix_over, n_bins)
+                add_calibration(calib_acc, y1, yo, mk["p1x2_mkt"], p_mix_1x2, po_mkt, p_mix_over,
+                                mk["odds_1x2"], mk["odds_over"],
+                                calibration_groups(chunk, np.full(len(chunk), chunk_no), args))
+
+                bets_df, bankroll_df = simulate_bets(
+                    chunk, mk["p1x2_mkt"], p_mix_1x2, mk["odds_1x2"], y1,
+                    po_mkt, p_mix_over, mk["odds_over"], mk["odds_under"], yo,
+                    min_edge=args.min_edge, stake_mode=args.stake_mode, flat_stake=args.flat_stake,
+                    fkelly=args.fkelly, max_kelly=args.max_kelly,
+                    max_bets_per_game=args.max_bets_per_game, bankroll0=bankroll, ou_returns=mk["ou_returns"])
+                _append_csv(bets_df, paths["bets"], written)
+                _append_csv(bankroll_df, paths["bank"], written)
+                if len(bets_df):
+                    stake_sum += float(bets_df["stake"].sum())
+                    pnl_sum += float(bets_df["pnl"].sum())
+                    bets_count += len(bets_df)
+                bankroll = float(bankroll_df["bankroll"].iloc[-1])
+                bank_plot.extend(bankroll_df["bankroll"].values[::max(1, len(bankroll_df) // 100)].tolist())
+                rows_test += len(chunk)
+            # alpha do próximo chunk: otimizado neste (previsto antes do partial_fit)
+            a1 = optimize_alpha_multiclass(mk["p1x2_mkt"], p_cal_1x2, y1, method=args.alpha_method)
+            a2 = optimize_alpha_binary(mk["pover_mkt"], p_cal_over, yo, method=args.alpha_method)
+
+        m1.partial_fit(X, y1, classes=[0, 1, 2])
+        m2.partial_fit(X, yo, classes=[0, 1])
+        fitted = True
+        seen += len(chunk)
+        print(f"chunk {chunk_no}: {seen} linhas processadas")
+
+    if not fold_metrics:
+        raise ValueError("Dataset pequeno demais para min_train/chunk-rows. Ajuste parâmetros.")
+    metrics_df = pd.DataFrame(fold_metrics)
+    metrics_df.to_csv(os.path.join(args.outdir, "fold_metrics.csv"), index=False)
+    if paths["bets"] not in written or bets_count == 0:
+        pd.DataFrame(columns=[f.name for f in Bet.__dataclass_fields__.values()]).to_csv(paths["bets"], index=False)
+
+    for key, fname, title in (("mkt", "market", "Calibração O/U (Mercado - Closing Fair)"),
+                              ("mod", "model", "Calibração O/U (Modelo Híbrido)")):
+        cdf = calibration_table(calib[key])
+        cdf.to_csv(os.path.join(args.outdir, f"calibration_bins_ou_{fname}.csv"), index=False)
+        save_calibration_plot(cdf, title, os.path.join(args.outdir, f"calibration_ou_{fname}.png"))
+    save_bankroll_plot(pd.DataFrame({"bankroll": bank_plot}),
+                       f"Bankroll (min_edge={args.min_edge}, stake={args.stake_mode})",
+                       os.path.join(args.outdir, "bankroll.png"))
+
+    summary = {
+        "rows_total": int(seen),
+        "rows_test_agg": int(rows_test),
+        **fold_summary(metrics_df, args),
+        "bets_count": int(bets_count),
+        "bets_roi": float(pnl_sum / (stake_sum + 1e-12)) if bets_count else 0.0,
+        "final_bankroll": float(bankroll),
+        "calibration": write_calibration(calib_acc, args.outdir),
+    }
+    write_summary_report(summary, args, date_col)
+
+# ----------------------------
+# Modelo final e scoring (--mode fit | predict | serve)
+# ----------------------------
+MODEL_VERSION = 1
+BET_PARAMS = ("min_edge", "stake_mode", "flat_stake", "fkelly", "max_kelly", "max_bets_per_game")
+
+def fit_final_model(df: pd.DataFrame, data: Dict[str, np.ndarray], params: Dict, args,
+                    days: Optional[np.ndarray] = None) -> Dict:
+    """
+    Calibradores e alphas treinados em todo o histórico — ou na última janela de
+    --window/--window-days — (mesma divisão 80/20 de um fold) + conjunto de
+    referência do KNN (índice já construído e resíduos).
+    """
+    n = len(data["X"])
+    all_idx = np.arange(window_start(n, args.window, args.window_days, days), n)
+    model = fit_calibrators(all_idx, data, params)
+    bundle = {
+        "version": MODEL_VERSION,
+        "model": model,
+        "features": params["features"],
+        "devig": args.devig,
+        "ou_line": args.ou_line,
+        "alpha_segment": args.alpha_segment,
+        "segment_names": None,
+        "bet": {k: getattr(args, k) for k in BET_PARAMS},
+        "bankroll0": args.bankroll0,
+        "rows_trained": int(len(all_idx)),
+        "knn": None,
+    }
+    if args.alpha_segment and args.alpha_segment != "odds_band":
+        bundle["segment_names"] = list(pd.factorize(df[args.alpha_segment].astype(str), sort=True)[1])
+    k = min(params["knn_k"], len(all_idx))
+    if params["use_knn"] and k > 5:
+        # mesmo índice/consulta de knn_query, construído uma vez
+        nn = NearestNeighbors(n_neighbors=k, metric="euclidean").fit(data["X"][all_idx])
+        bundle["knn"] = {"index": nn, "resid": knn_residuals(model, all_idx, data), "sigma": params["knn_sigma"]}
+    return bundle
+
+class HybridScorer:
+    """
+    Pontua jogos novos com o modelo de --mode fit. Carrega uma vez e pontua
+    lotes de odds em memória (sem re-treinar nem refazer o walk-forward):
+
+        scorer = HybridScorer.load("out/model.joblib")
+        preds, bets = scorer.score(df_jogos, bankroll=250.0)
+
+    preds: probabilidades fair do mercado e do modelo por jogo.
+    bets: apostas sugeridas com a mesma seleção/stake de simulate_bets
+    (todas as apostas do lote partem do mesmo bankroll, pois ainda não liquidaram).
+    """
+    def __init__(self, bundle: Dict):
+        if bundle.get("version") != MODEL_VERSION:
+            raise ValueError(f"Modelo de versão {bundle.get('version')} (esperado {MODEL_VERSION}); rode --mode fit de novo.")
+        self.bundle = bundle
+        self.model = dict(bundle["model"])
+        names = bundle["segment_names"]
+        self.segment_codes = {name: i for i, name in enumerate(names)} if names else None
+        self.knn_index = None
+        if bundle["knn"] is not None:
+            # consulta KNN é o custo dominante do lote: paraleliza por linhas (mesmo resultado);
+            # cópia rasa (mesma árvore já construída) para não alterar o bundle carregado
+            self.knn_index = copy.copy(bundle["knn"]["index"]).set_params(n_jobs=-1)
+        if self.segment_codes is not None:
+            # segmento desconhecido (ex: liga nova) -> alpha 1 = mercado puro
+            self.model["a1"] = np.append(self.model["a1"], 1.0)
+            self.model["a2"] = np.append(self.model["a2"], 1.0)
+
+    @classmethod
+    def load(cls, path: str) -> "HybridScorer":
+        import joblib
+        return cls(joblib.load(path))
+
+    def _segments(self, df: pd.DataFrame, X_df: pd.DataFrame) -> Optional[np.ndarray]:
+        spec = self.bundle["alpha_segment"]
+        if not spec:
+            return None
+        if spec == "odds_band":
+            return alpha_segments(df, X_df, spec)[0]
+        if spec not in df.columns:
+            raise ValueError(f"Coluna de segmento '{spec}' ausente nos jogos.")
+        unknown = len(self.segment_codes)
+        return np.array([self.segment_codes.get(v, unknown) for v in df[spec].astype(str)], dtype=np.int64)
+
+    def score(self, fixtures, bankroll: Optional[float] = None, **bet_params) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """fixtures: DataFrame ou lista de dicts com odds 1x2/O/U (mesmas colunas do dataset)."""
+        df = normalize_columns(fixtures if isinstance(fixtures, pd.DataFrame) else pd.DataFrame(list(fixtures)))
+        bet = {**self.bundle["bet"], **{k: v for k, v in bet_params.items() if v is not None}}
+        bankroll = float(self.bundle["bankroll0"] if bankroll is None else bankroll)
+        mapping = detect_columns(df)
+        p1x2_mkt, pover_mkt = market_probs(df, mapping, devig=self.bundle["devig"])
+        X_df = market_features(p1x2_mkt, pover_mkt)
+        X = np.ascontiguousarray(X_df.values, dtype=float)   # mesmo layout das linhas do backtest
+        p_1x2, p_over = predict_mix(self.model, X, p1x2_mkt, pover_mkt, self._segments(df, X_df))
+        knn = self.bundle["knn"]
+        if knn is not None:
+            neighbors = self.knn_index.kneighbors(X, return_distance=True)
+            delta = knn_kernel_average(neighbors, knn["resid"], len(X), sigma=knn["sigma"])
+            p_1x2, p_over = apply_knn_delta(p_1x2, p_over, delta)
+
+        n = len(df)
+        preds = pd.DataFrame({
+            "idx": np.asarray(df.index),
+            "pH_mkt": p1x2_mkt[:, 0], "pD_mkt": p1x2_mkt[:, 1], "pA_mkt": p1x2_mkt[:, 2],
+            "pH_mod": p_1x2[:, 0], "pD_mod": p_1x2[:, 1], "pA_mod": p_1x2[:, 2],
+            "pOver_mkt": pover_mkt, "pOver_mod": p_over,
+        })
+
+        odds = market_odds(df, mapping)
+        no_result = np.zeros(n, dtype=int)
+        pmod, pmkt, o, edge, _, _ = bet_candidates(
+            p1x2_mkt, p_1x2, odds["odds_1x2"], no_result,
+            pover_mkt, p_over, odds["odds_over"], odds["odds_under"], no_result)
+        rows, cols = select_bets(edge, bet["min_edge"], int(bet["max_bets_per_game"]))
+        b_pmod, b_odds = pmod[rows, cols], o[rows, cols]
+        if bet["stake_mode"] == "flat":
+            stake = np.full(len(rows), float(bet["flat_stake"]))
+        else:
+            stake = bankroll * kelly_stake_fraction(b_pmod, b_odds, bet["fkelly"], bet["max_kelly"])
+        bets = pd.DataFrame({
+            "idx": np.asarray(df.index)[rows],
+            "market": MARKETS[cols],
+            "selection": SELECTIONS[cols],
+            "prob_model": b_pmod,
+            "prob_market": pmkt[rows, cols],
+            "odds": b_odds,
+            "edge": edge[rows, cols],
+            "stake": stake,
+        })
+        return preds, bets
+
+def _records(df: pd.DataFrame) -> List[Dict]:
+    """DataFrame -> lista de dicts JSON-safe (NaN -> null)."""
+    return df.astype(object).where(df.notna(), None).to_dict(orient="records")
+
+def make_server(scorer: HybridScorer, host: str = "127.0.0.1", port: int = 8765):
+    """
+    Endpoint HTTP local (stdlib, sem dependências):
+      POST /score  {"rows": [{...odds...}, ...], "bankroll": 250, "min_edge": 0.03, ...}
+                   -> {"predictions": [...], "bets": [...]}
+      GET  /health -> {"status": "ok", ...}
+    Corpo inválido -> 400; falha inesperada ao pontuar -> 500 (sempre JSON {"error": ...}).
+    port=0 escolhe uma porta livre (httpd.server_address).
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, code: int, payload: Dict):
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path != "/health":
+                return self._send(404, {"error": "use POST /score ou GET /health"})
+            self._send(200, {"status": "ok", "rows_trained": scorer.bundle["rows_trained"],
+                             "knn": scorer.bundle["knn"] is not None, "bet": scorer.bundle["bet"]})
+
+        def do_POST(self):
+            if self.path != "/score":
+                return self._send(404, {"error": "use POST /score ou GET /health"})
+            try:
+                req = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            except ValueError as e:
+                return self._send(400, {"error": f"JSON inválido: {e}"})
+            if not isinstance(req, (list, dict)):
+                return self._send(400, {"error": "corpo deve ser um objeto {\"rows\": [...]} ou uma lista de jogos"})
+            rows = req if isinstance(req, list) else req.get("rows", [])
+            opts = req if isinstance(req, dict) else {}
+            if not isinstance(rows, list) or not all(isinstance(r, dict) for r in rows):
+                return self._send(400, {"error": "\"rows\" deve ser uma lista de objetos (um por jogo)"})
+            try:
+                preds, bets = scorer.score(rows, bankroll=opts.get("bankroll"),
+                                           **{k: opts[k] for k in BET_PARAMS if k in opts})
+            except (ValueError, KeyError, TypeError, IndexError) as e:
+                return self._send(400, {"error": str(e)})
+            except Exception as e:
+                return self._send(500, {"error": f"{type(e).__name__}: {e}"})
+            self._send(200, {"predictions": _records(preds), "bets": _records(bets)})
+
+        def log_message(self, *a):
+            pass
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+def serve(scorer: HybridScorer, host: str = "127.0.0.1", port: int = 8765):
+    """Serve make_server até Ctrl+C."""
+    httpd = make_server(scorer, host, port)
+    print(f"Servindo em http://{host}:{port}/score (Ctrl+C para sair)")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+
 # ----------------------------
 # Main
 # ----------------------------
 def main():
     ap = argparse.ArgumentParser()
-    ap.add_argument("--data-url", required=True, help="URL RAW do GitHub (csv/xlsx) ou caminho local.")
+    ap.add_argument("--mode", choices=["backtest","fit","predict","serve","tune"], default="backtest",
+                    help="backtest (walk-forward) | fit (treina no histórico e grava --model) | predict (pontua --data-url) | serve (HTTP local) | tune (grade knn_k/knn_sigma/C).")
+    ap.add_argument("--model", default=None, help="Arquivo do modelo de --mode fit/predict/serve (padrão: <outdir>/model.joblib).")
+    ap.add_argument("--host", default="127.0.0.1", help="Host do --mode serve.")
+    ap.add_argument("--port", type=int, default=8765, help="Porta do --mode serve.")
+    ap.add_argument("--data-url", default=None, help="URL RAW do GitHub (csv/xlsx) ou caminho local.")
     ap.add_argument("--sheet", default=None, help="Se xlsx, nome da aba (opcional).")
+    ap.add_argument("--data-cache", default=None, help="Pasta de cache colunar (parquet) do dataset; lê só as colunas usadas.")
     ap.add_argument("--date-col", default=None, help="Coluna de data (recomendado).")
+    ap.add_argument("--devig", choices=list(DEVIG_METHODS), default="proportional", help="Remoção de margem das odds: proportional | power | odds_ratio | shin.")
     ap.add_argument("--ou-line", type=float, default=2.5, help="Linha do O/U (ex: 2.5).")
+    ap.add_argument("--ou-line-col", default=None, help="Coluna com a linha O/U de cada jogo (ex: linhas asiáticas 2.25, 2.75); substitui --ou-line.")
+    ap.add_argument("--ou-lines", default=None, help="Linhas O/U extras na mesma passada, ex: '1.5,3.5,2.25' (odds em colunas como Odd_O_3.5/Odd_U_3.5).")
     ap.add_argument("--min-train", type=int, default=12000, help="Tamanho mínimo de treino para o 1º fold.")
     ap.add_argument("--step", type=int, default=2500, help="Tamanho do bloco de teste por fold.")
+    ap.add_argument("--window", type=int, default=0, help="Janela deslizante: treino só nas últimas N linhas antes do fold (0 = expanding).")
+    ap.add_argument("--window-days", type=float, default=0.0, help="Janela deslizante em dias antes do 1º jogo do fold (requer data; 0 = expanding).")
+    ap.add_argument("--decay-half-life", type=float, default=0.0,
+                    help="Peso exponencial no treino dos calibradores: meia-vida em dias (em linhas sem coluna de data); 0 = sem peso.")
     ap.add_argument("--use-knn", action="store_true", help="Ativa ajuste residual KNN.")
     ap.add_argument("--knn-k", type=int, default=200)
     ap.add_argument("--knn-sigma", type=float, default=0.08)
+    ap.add_argument("--knn-incremental", action="store_true", help="Índice KNN cresce com a janela (sem rebuild completo por fold).")
+    ap.add_argument("--logit-C", type=float, default=1.0, help="Inverso da regularização L2 dos calibradores logit.")
+    ap.add_argument("--tune", default="knn_k=50:400:50,knn_sigma=0.02,0.04,0.08,0.16,C=0.3,1,3",
+                    help="Grade do --mode tune (produto cartesiano, sintaxe do --sweep): knn_k, knn_sigma, C.")
+    ap.add_argument("--tune-eta", type=int, default=3, help="Successive halving do --mode tune: mantém 1/eta das configs por rodada.")
+    ap.add_argument("--tune-min-rows", type=int, default=500, help="Mín. de linhas de validação na 1ª rodada do --mode tune.")
     ap.add_argument("--min-edge", type=float, default=0.02, help="Edge mínimo vs mercado para apostar.")
-    ap.add_argument("--stake-mode", choices=["flat","fkelly"], default="fkelly")
+    ap.add_argument("--stake-mode", choices=STAKE_MODES, default="fkelly")
     ap.add_argument("--flat-stake", type=float, default=1.0)
     ap.add_argument("--fkelly", type=float, default=0.25, help="Multiplicador do Kelly (ex: 0.25 = 1/4 Kelly).")
     ap.add_argument("--max-kelly", type=float, default=0.03, help="Cap da fração Kelly por aposta.")
     ap.add_argument("--bankroll0", type=float, default=100.0)
     ap.add_argument("--max-bets-per-game", type=int, default=1)
+    ap.add_argument("--sweep", default=None, help="Grade de apostas sem re-treinar, ex: 'min_edge=0.01:0.06:0.005,fkelly=0.1,0.25,0.5,stake_mode=flat,fkelly'.")
+    ap.add_argument("--stream", action="store_true", help="Backtest out-of-core: lê em chunks (ordenados por data) e treina com partial_fit.")
+    ap.add_argument("--chunk-rows", type=int, default=100_000, help="Linhas por chunk no modo --stream.")
     ap.add_argument("--outdir", default="out", help="Pasta de saída.")
+    ap.add_argument("--alpha-method", choices=["grid","newton"], default="grid", help="Busca do alpha: grade de 51 pontos ou Newton contínuo em [0,1].")
+    ap.add_argument("--alpha-segment", default=None, help="Alpha por segmento: 'odds_band' ou nome de coluna (ex: League).")
+    ap.add_argument("--alpha-min-seg", type=int, default=200, help="Mín. de linhas de validação por segmento (senão usa alpha global).")
+    ap.add_argument("--partition-by", default=None, help="Um stack calibrador/alpha/KNN por partição (ex: League), treinados em paralelo (--jobs).")
+    ap.add_argument("--partition-min-rows", type=int, default=2000, help="Mín. de linhas de treino da partição no fold (senão usa o modelo global).")
+    ap.add_argument("--warm-start", action="store_true", help="Cada fold parte dos coeficientes do fold anterior (menos iterações do lbfgs; o refit ainda usa a janela de treino inteira).")
+    ap.add_argument("--cache-dir", default=None, help="Cache por fold (coeficientes, alphas, previsões); re-execuções/retomadas reaproveitam folds prontos.")
+    ap.add_argument("--jobs", type=int, default=1, help="Nº de processos para rodar os folds em paralelo (1 = serial; não combina com --warm-start/--knn-incremental).")
+    ap.add_argument("--pred-format", choices=["parquet", "npz"], default="parquet",
+                    help="Artefato comprimido das previsões walk-forward (predictions_walkforward.parquet|.npz).")
+    ap.add_argument("--pred-csv", action="store_true",
+                    help="Também grava predictions_walkforward.csv (sempre CSV em --stream).")
+    ap.add_argument("--calib-by", default="League",
+                    help="Colunas (vírgula) para recortar a calibração além de fold e faixa de odd; ausentes são ignoradas.")
+    ap.add_argument("--calib-odds-bands", default="1.5,2,3,5",
+                    help="Cortes das faixas de odd na calibração (vazio desliga o recorte).")
+    ap.add_argument("--bootstrap", type=int, default=10000,
+                    help="Réplicas do block bootstrap para os ICs de yield/ROI/drawdown/LogLoss/Brier (0 = desliga; não usado em --stream).")
+    ap.add_argument("--bootstrap-block-days", type=int, default=7,
+                    help="Tamanho (dias) dos blocos de datas reamostrados; sem coluna de data, blocos de 200 linhas.")
+    ap.add_argument("--bootstrap-ci", type=float, default=0.95, help="Nível dos intervalos do bootstrap.")
+    ap.add_argument("--bootstrap-seed", type=int, default=0, help="Seed do bootstrap (ICs reprodutíveis).")
+    ap.add_argument("--profile", action="store_true",
+                    help="Mede wall/CPU/RSS por etapa e por fold: timings.csv + summary.json['timings'].")
+    ap.add_argument("--profile-dump", action="store_true",
+                    help="Com --profile: re-executa o fold mais lento sob cProfile e grava profile_fold<k>.prof.")
     args = ap.parse_args()
 
     os.makedirs(args.outdir, exist_ok=True)
+    model_path = args.model or os.path.join(args.outdir, "model.joblib")
+    if args.mode == "serve":
+        return serve(HybridScorer.load(model_path), host=args.host, port=args.port)
+    if not args.data_url:
+        ap.error("--data-url é obrigatório (exceto em --mode serve).")
+    if args.mode == "predict":
+        scorer = HybridScorer.load(model_path)
+        preds, bets = scorer.score(read_dataset(args.data_url, sheet=args.sheet), bankroll=args.bankroll0,
+                                   **{k: getattr(args, k) for k in BET_PARAMS})
+        preds.to_csv(os.path.join(args.outdir, "predictions_live.csv"), index=False)
+        bets.to_csv(os.path.join(args.outdir, "bets_live.csv"), index=False)
+        print(f"OK. {len(preds)} jogos pontuados, {len(bets)} apostas sugeridas em: {args.outdir}")
+        return
+    if args.jobs > 1 and (args.warm_start or args.knn_incremental):
+        ap.error("--warm-start/--knn-incremental encadeiam os folds (execução serial); não combinam com --jobs > 1.")
+    if args.stream:
+        if args.mode != "backtest":
+            ap.error("--stream só vale em --mode backtest.")
+        bad = stream_conflicts(args)
+        if bad:
+            ap.error("--stream não suporta: " + "; ".join(bad) + ".")
+        return run_streaming(args)
+
+    # linhas O/U extras (a principal já é modelada; com --ou-line-col nenhuma é repetida)
+    extra_lines: List[float] = []
+    for tok in (args.ou_lines or "").split(","):
+        if tok.strip() and float(tok) not in extra_lines and (args.ou_line_col or float(tok) != args.ou_line):
+            extra_lines.append(float(tok))
+
+    timer = StageTimer(args.profile)
 
     # carregar
-    df = read_dataset(args.data_url)
-    if args.sheet and args.data_url.lower().endswith((".xlsx",".xls")):
-        df = pd.read_excel(args.data_url, sheet_name=args.sheet)
-    df = normalize_columns(df)
-
-    mapping = detect_columns(df)
-
-    # data
-    date_col = args.date_col or mapping.get("date") or ""
-    if date_col and date_col in df.columns:
-        df[date_col] = pd.to_datetime(df[date_col], errors="coerce")
-        df = df.sort_values(date_col).reset_index(drop=True)
-
-    # colunas essenciais
-    fthg = mapping.get("fthg")
-    ftag = mapping.get("ftag")
-    if not fthg or not ftag or fthg not in df.columns or ftag not in df.columns:
-        raise ValueError("Não encontrei colunas de gols (FTHG/FTAG). Ajuste o dataset para conter gols finais.")
-
-    # odds / probs
-    # 1x2
-    has_probs_1x2 = all([mapping.get("pH") in df.columns if mapping.get("pH") else False,
-                         mapping.get("pD") in df.columns if mapping.get("pD") else False,
-                         mapping.get("pA") in df.columns if mapping.get("pA") else False])
-    if has_probs_1x2:
-        p1x2_mkt = df[[mapping["pH"], mapping["pD"], mapping["pA"]]].astype(float).values
-        # garantir normalização
-        p1x2_mkt = remove_margin_proportional(p1x2_mkt)
-        odds_h = odds_d = odds_a = None
-        odds_1x2 = None
-    else:
-        odds_h, odds_d, odds_a = mapping.get("odds_h"), mapping.get("odds_d"), mapping.get("odds_a")
-        if not odds_h or not odds_d or not odds_a:
-            raise ValueError("Não encontrei odds 1x2 (H/D/A) nem probabilidades pHome/pDraw/pAway.")
-        odds_1x2 = df[[odds_h, odds_d, odds_a]].astype(float).values
-        p1x2_mkt = odds_to_fair_probs_1x2(odds_1x2[:,0], odds_1x2[:,1], odds_1x2[:,2])
-
-    # OU
-    has_prob_over = mapping.get("pOver") and mapping["pOver"] in df.columns
-    if has_prob_over:
-        pover_mkt = df[mapping["pOver"]].astype(float).values
-        pover_mkt = np.clip(pover_mkt, 1e-6, 1-1e-6)
-        odds_over = odds_under = None
-    else:
-        odds_over_col, odds_under_col = mapping.get("odds_over"), mapping.get("odds_under")
-        if not odds_over_col or not odds_under_col:
-            raise ValueError("Não encontrei odds O/U (Over/Under) nem prob pOver.")
-        odds_over = df[odds_over_col].astype(float).values
-        odds_under = df[odds_under_col].astype(float).values
-        pover_mkt = odds_to_fair_prob_over(odds_over, odds_under)
-
-    # outcomes
-    goals_home = df[fthg].astype(float).values
-    goals_away = df[ftag].astype(float).values
-    y_1x2 = np.where(goals_home > goals_away, 0, np.where(goals_home == goals_away, 1, 2)).astype(int)
-    y_over01 = ((goals_home + goals_away) > args.ou_line).astype(int)
+    with timer.stage("load"):
+        if args.data_cache:
+            pq_path = cached_dataset(args.data_url, args.sheet, args.data_cache)
+            mapping = detect_columns(pd.DataFrame(columns=parquet_columns(pq_path)))
+            wanted = list(mapping.values()) + [args.date_col, args.alpha_segment, args.ou_line_col, args.partition_by] + calib_by_columns(args)
+            for line in extra_lines:
+                wanted += list(detect_ou_line_columns(parquet_columns(pq_path), line).values())
+            df = read_cached_columns(pq_path, [c for c in wanted if c])
+        else:
+            df = normalize_columns(read_dataset(args.data_url, sheet=args.sheet))
+            mapping = detect_columns(df)
+
+        # data
+        date_col = args.date_col or mapping.get("date") or ""
+        if date_col and date_col in df.columns:
+            df[date_col] = pd.to_datetime(df[date_col], errors="coerce")
+            df = df.sort_values(date_col).reset_index(drop=True)
+
+    if args.ou_line_col and args.ou_line_col not in df.columns:
+        raise ValueError(f"Coluna de linha O/U '{args.ou_line_col}' não encontrada.")
+    ou_line = df[args.ou_line_col].astype(float).values if args.ou_line_col else args.ou_line
+    with timer.stage("prepare_market"):
+        mk = prepare_market_arrays(df, mapping, ou_line, devig=args.devig)
+        line_mk = {ou_line_tag(line): prepare_ou_line_arrays(df, mapping, line, devig=args.devig, plain=line == args.ou_line)
+                   for line in extra_lines}
+        p1x2_mkt, pover_mkt = mk["p1x2_mkt"], mk["pover_mkt"]
+        y_1x2, y_over01 = mk["y_1x2"], mk["y_over01"]
 
     # features
-    X_df = market_features(p1x2_mkt, pover_mkt)
-    X = X_df.values.astype(float)
-
-    # odds arrays for simulation
-    if odds_1x2 is None:
-        # se não temos odds, não dá pra simular payoff — aborta simulação de 1x2
-        odds_1x2 = np.full((len(df),3), np.nan)
-    if odds_over is None or odds_under is None:
-        odds_over = np.full(len(df), np.nan)
-        odds_under = np.full(len(df), np.nan)
+    with timer.stage("features"):
+        X_df = market_features(p1x2_mkt, pover_mkt)
+        X = X_df.values.astype(float)
+
+    data = {"X": X, "y_1x2": y_1x2, "y_over01": y_over01, "p1x2_mkt": p1x2_mkt, "pover_mkt": pover_mkt}
+    days = date_days(df, date_col)
+    params = {"use_knn": args.use_knn, "knn_k": args.knn_k, "knn_sigma": args.knn_sigma,
+              "warm_start": args.warm_start, "knn_incremental": args.knn_incremental,
+              "alpha_method": args.alpha_method,
+              "alpha_min_seg": args.alpha_min_seg,
+              # só entram na chave do cache
+              "ou_line": args.ou_line, "features": list(X_df.columns), "alpha_segment": args.alpha_segment,
+              "cache_dir": args.cache_dir, "profile": args.profile}
+    if args.ou_line_col:
+        params["ou_line_col"] = args.ou_line_col
+    if args.logit_C != 1.0:
+        params["logit_C"] = args.logit_C
+    if args.decay_half_life > 0:
+        # idade em dias (ou linhas, sem data); só entra em data/params se ativo -> chave do cache inalterada sem decaimento
+        data["time"] = days if days is not None else np.arange(len(df), dtype=float)
+        params["decay_half_life"] = args.decay_half_life
+    if line_mk:
+        # todas as linhas extras num só array (n, L): uma cópia compartilhada por todos os folds/workers
+        data["pover_lines"] = np.column_stack([m["pover_mkt"] for m in line_mk.values()])
+        data["y_over_lines"] = np.column_stack([m["y_over01"] for m in line_mk.values()])
+        params["ou_lines"] = list(line_mk)
+    if args.cache_dir:
+        os.makedirs(args.cache_dir, exist_ok=True)
+    if args.alpha_segment:
+        data["segment"], params["n_segments"] = alpha_segments(df, X_df, args.alpha_segment)
+
+    if args.mode == "fit":
+        import joblib
+        if args.ou_line_col:
+            raise ValueError("--mode fit usa uma linha O/U fixa (--ou-line); --ou-line-col não é suportado.")
+        if args.ou_lines or args.partition_by:
+            print("Aviso: --ou-lines/--partition-by não entram no modelo de --mode fit; ignorados.")
+        bundle = fit_final_model(df, data, params, args, days=days)
+        joblib.dump(bundle, model_path)
+        print(f"OK. Modelo treinado em {bundle['rows_trained']} linhas "
+              f"(alpha_1x2={np.mean(bundle['model']['a1']):.3f}, alpha_ou={np.mean(bundle['model']['a2']):.3f}, "
+              f"KNN={'sim' if bundle['knn'] else 'não'}): {model_path}")
+        return
 
     # splits
-    splits = walk_forward_splits(df, min_train=args.min_train, step=args.step)
+    splits = walk_forward_splits(df, min_train=args.min_train, step=args.step,
+                                 window=args.window, window_days=args.window_days, days=days)
     if len(splits) == 0:
         raise ValueError("Dataset pequeno demais para min_train/step. Ajuste parâmetros.")
+    if (args.window or args.window_days) and args.knn_incremental:
+        print("Aviso: com janela deslizante o índice KNN é reconstruído por fold; --knn-incremental não se aplica.")
+
+    if args.mode == "tune":
+        if args.ou_lines or args.partition_by:
+            print("Aviso: --ou-lines/--partition-by não entram no --mode tune; ignorados.")
+        with timer.stage("tune"):
+            run_tuning(splits, data, params, args, timer=timer)
+        if args.profile:
+            pd.DataFrame(timer.rows).astype({"fold": "Int64"}).to_csv(os.path.join(args.outdir, "timings.csv"), index=False)
+        return
 
-    all_rows = []
-    fold_metrics = []
-
-    for fold, (tr_idx, te_idx) in enumerate(splits, start=1):
-        # dentro do treino, separar validação temporal (últimos 20%)
-        ntr = len(tr_idx)
-        val_cut = int(ntr * 0.8)
-        tr2_idx = tr_idx[:val_cut]
-        val_idx = tr_idx[val_cut:]
-
-        X_tr, X_val, X_te = X[tr2_idx], X[val_idx], X[te_idx]
-        y_tr_1x2, y_val_1x2, y_te_1x2 = y_1x2[tr2_idx], y_1x2[val_idx], y_1x2[te_idx]
-        y_tr_over, y_val_over, y_te_over = y_over01[tr2_idx], y_over01[val_idx], y_over01[te_idx]
-
-        p_mkt_tr, p_mkt_val, p_mkt_te = p1x2_mkt[tr2_idx], p1x2_mkt[val_idx], p1x2_mkt[te_idx]
-        po_mkt_tr, po_mkt_val, po_mkt_te = pover_mkt[tr2_idx], pover_mkt[val_idx], pover_mkt[te_idx]
-
-        # calibradores
-        m1 = fit_multinomial_logit(X_tr, y_tr_1x2)
-        p_cal_val_1x2 = m1.predict_proba(X_val)
-        a1 = optimize_alpha_multiclass(p_mkt_val, p_cal_val_1x2, y_val_1x2)
-
-        p_cal_te_1x2 = m1.predict_proba(X_te)
-        p_mix_te_1x2 = a1*p_mkt_te + (1-a1)*p_cal_te_1x2
-
-        # OU
-        m2 = fit_bin_logit(X_tr, y_tr_over)
-        p_cal_val_over = m2.predict_proba(X_val)[:,1]
-        a2 = optimize_alpha_binary(po_mkt_val, p_cal_val_over, y_val_over)
-
-        p_cal_te_over = m2.predict_proba(X_te)[:,1]
-        p_mix_te_over = a2*po_mkt_te + (1-a2)*p_cal_te_over
-
-        # KNN residual adjustment (opcional)
-        if args.use_knn:
-            # usar X_tr2 completo (train+val?) para residual: melhor usar tr_idx inteiro para estabilidade
-            X_knn = X[tr_idx]
-            # resid para Over
-            # base = mix (com alpha) no treino inteiro
-            p_cal_knn_1x2 = m1.predict_proba(X_knn)
-            p_mix_knn_1x2 = a1*p1x2_mkt[tr_idx] + (1-a1)*p_cal_knn_1x2
-            # ajustar cada classe separadamente via resid
-            adj_te = np.zeros_like(p_mix_te_1x2)
-            for c in range(3):
-                resid = ((y_1x2[tr_idx] == c).astype(float) - p_mix_knn_1x2[:,c])
-                delta = knn_residual_adjustment(X_knn, resid, X_te, k=args.knn_k, sigma=args.knn_sigma)
-                adj_te[:,c] = delta
-            p_mix_te_1x2 = np.clip(p_mix_te_1x2 + adj_te, 1e-6, 1.0)
-            p_mix_te_1x2 = _safe_div(p_mix_te_1x2, p_mix_te_1x2.sum(axis=1, keepdims=True))
-
-            # Over
-            p_cal_knn_over = m2.predict_proba(X_knn)[:,1]
-            p_mix_knn_over = a2*pover_mkt[tr_idx] + (1-a2)*p_cal_knn_over
-            resid_over = y_over01[tr_idx].astype(float) - p_mix_knn_over
-            delta_over = knn_residual_adjustment(X_knn, resid_over, X_te, k=args.knn_k, sigma=args.knn_sigma)
-            p_mix_te_over = np.clip(p_mix_te_over + delta_over, 1e-6, 1-1e-6)
-
-        # métricas (teste)
-        ll_mkt_1x2 = log_loss(y_te_1x2, p_mkt_te, labels=[0,1,2])
-        ll_mod_1x2 = log_loss(y_te_1x2, p_mix_te_1x2, labels=[0,1,2])
-        br_mkt_1x2 = brier_multiclass(y_te_1x2, p_mkt_te)
-        br_mod_1x2 = brier_multiclass(y_te_1x2, p_mix_te_1x2)
-
-        ll_mkt_ou = log_loss(y_te_over, np.vstack([1-po_mkt_te, po_mkt_te]).T, labels=[0,1])
-        ll_mod_ou = log_loss(y_te_over, np.vstack([1-p_mix_te_over, p_mix_te_over]).T, labels=[0,1])
-        br_mkt_ou = brier_binary(y_te_over, po_mkt_te)
-        br_mod_ou = brier_binary(y_te_over, p_mix_te_over)
-
-        fold_metrics.append({
-            "fold": fold,
-            "train_end_row": int(tr_idx[-1]),
-            "test_start_row": int(te_idx[0]),
-            "test_end_row": int(te_idx[-1]),
-            "alpha_1x2": a1,
-            "alpha_ou": a2,
-            "logloss_mkt_1x2": ll_mkt_1x2,
-            "logloss_mod_1x2": ll_mod_1x2,
-            "brier_mkt_1x2": br_mkt_1x2,
-            "brier_mod_1x2": br_mod_1x2,
-            "logloss_mkt_ou": ll_mkt_ou,
-            "logloss_mod_ou": ll_mod_ou,
-            "brier_mkt_ou": br_mkt_ou,
-            "brier_mod_ou": br_mod_ou,
-        })
+    with timer.stage("walk_forward"):
+        part_metrics = None
+        if args.partition_by:
+            if args.partition_by not in df.columns:
+                raise ValueError(f"Coluna de partição '{args.partition_by}' não encontrada.")
+            part, names = pd.factorize(df[args.partition_by].astype(str), sort=True)
+            fold_metrics, store, part_metrics = run_walk_forward_partitioned(
+                splits, data, params, part.astype(np.int64), list(names), args.partition_min_rows,
+                jobs=args.jobs, timer=timer)
+        else:
+            fold_metrics, store = run_walk_forward(splits, data, params, jobs=args.jobs, timer=timer)
 
-        # armazenar linhas
-        for j, row_i in enumerate(te_idx):
-            all_rows.append({
-                "row": int(row_i),
-                "fold": fold,
-                "pH_mkt": float(p1x2_mkt[row_i,0]),
-                "pD_mkt": float(p1x2_mkt[row_i,1]),
-                "pA_mkt": float(p1x2_mkt[row_i,2]),
-                "pH_mod": float(p_mix_te_1x2[j,0]),
-                "pD_mod": float(p_mix_te_1x2[j,1]),
-                "pA_mod": float(p_mix_te_1x2[j,2]),
-                "pOver_mkt": float(pover_mkt[row_i]),
-                "pOver_mod": float(p_mix_te_over[j]),
-                "y1x2": int(y_1x2[row_i]),
-                "yOver": int(y_over01[row_i]),
-            })
-
-    pred_df = pd.DataFrame(all_rows).sort_values("row").reset_index(drop=True)
-    metrics_df = pd.DataFrame(fold_metrics)
+    with timer.stage("write_predictions"):
+        pred_df = store.to_frame()
+        metrics_df = pd.DataFrame(fold_metrics)
 
-    # salvar previsões e métricas
-    pred_path = os.path.join(args.outdir, "predictions_walkforward.csv")
-    met_path = os.path.join(args.outdir, "fold_metrics.csv")
-    pred_df.to_csv(pred_path, index=False)
-    metrics_df.to_csv(met_path, index=False)
+        # salvar previsões e métricas
+        pred_files = write_predictions(pred_df, args.outdir, fmt=args.pred_format, csv=args.pred_csv)
+        metrics_df.to_csv(os.path.join(args.outdir, "fold_metrics.csv"), index=False)
+        if part_metrics is not None:
+            pd.DataFrame(part_metrics).to_csv(os.path.join(args.outdir, "partition_metrics.csv"), index=False)
 
     # calibração global (O/U) no conjunto test agregado
-    calib_mkt = calibration_bins(pred_df["yOver"].values, pred_df["pOver_mkt"].values, n_bins=10)
-    calib_mod = calibration_bins(pred_df["yOver"].values, pred_df["pOver_mod"].values, n_bins=10)
-    calib_mkt.to_csv(os.path.join(args.outdir, "calibration_bins_ou_market.csv"), index=False)
-    calib_mod.to_csv(os.path.join(args.outdir, "calibration_bins_ou_model.csv"), index=False)
-
-    save_calibration_plot(calib_mkt, "Calibração O/U (Mercado - Closing Fair)", os.path.join(args.outdir, "calibration_ou_market.png"))
-    save_calibration_plot(calib_mod, "Calibração O/U (Modelo Híbrido)", os.path.join(args.outdir, "calibration_ou_model.png"))
+    with timer.stage("calibration"):
+        calib_mkt = calibration_bins(pred_df["yOver"].values, pred_df["pOver_mkt"].values, n_bins=10)
+        calib_mod = calibration_bins(pred_df["yOver"].values, pred_df["pOver_mod"].values, n_bins=10)
+        calib_mkt.to_csv(os.path.join(args.outdir, "calibration_bins_ou_market.csv"), index=False)
+        calib_mod.to_csv(os.path.join(args.outdir, "calibration_bins_ou_model.csv"), index=False)
+
+        save_calibration_plot(calib_mkt, "Calibração O/U (Mercado - Closing Fair)", os.path.join(args.outdir, "calibration_ou_market.png"))
+        save_calibration_plot(calib_mod, "Calibração O/U (Modelo Híbrido)", os.path.join(args.outdir, "calibration_ou_model.png"))
+
+        # 1x2 + O/U por fold / liga / faixa de odd
+        calib_rows = pred_df["row"].values.astype(int)
+        calib_acc = calibration_accumulator(args)
+        add_calibration(calib_acc, pred_df["y1x2"].values, pred_df["yOver"].values,
+                        pred_df[["pH_mkt", "pD_mkt", "pA_mkt"]].values, pred_df[["pH_mod", "pD_mod", "pA_mod"]].values,
+                        pred_df["pOver_mkt"].values, pred_df["pOver_mod"].values,
+                        mk["odds_1x2"][calib_rows], mk["odds_over"][calib_rows],
+                        calibration_groups(df.iloc[calib_rows], pred_df["fold"].values, args))
+        calib_summary = write_calibration(calib_acc, args.outdir)
 
     # simulação de apostas usando as linhas de teste (precisa odds disponíveis)
     # Reconstituir arrays no mesmo "row" do pred_df
@@ -658,104 +2611,89 @@ def main():
     y1x2 = pred_df["y1x2"].values.astype(int)
     yover = pred_df["yOver"].values.astype(int)
 
-    # odds
-    # tentar extrair novamente das colunas detectadas
-    odds_1x2_test = np.full((len(df_test),3), np.nan)
-    if mapping.get("odds_h") in df.columns and mapping.get("odds_d") in df.columns and mapping.get("odds_a") in df.columns:
-        odds_1x2_test = df_test[[mapping["odds_h"], mapping["odds_d"], mapping["odds_a"]]].astype(float).values
-
-    odds_over_test = np.full(len(df_test), np.nan)
-    odds_under_test = np.full(len(df_test), np.nan)
-    if mapping.get("odds_over") in df.columns and mapping.get("odds_under") in df.columns:
-        odds_over_test = df_test[mapping["odds_over"]].astype(float).values
-        odds_under_test = df_test[mapping["odds_under"]].astype(float).values
-
-    bets_df, bankroll_df = simulate_bets(
-        df_test=df_test,
-        p_market_1x2=p_mkt_1x2,
-        p_model_1x2=p_mod_1x2,
-        odds_1x2=odds_1x2_test,
-        y_1x2=y1x2,
-        p_market_over=p_mkt_over,
-        p_model_over=p_mod_over,
-        odds_over=odds_over_test,
-        odds_under=odds_under_test,
-        y_over01=yover,
-        min_edge=args.min_edge,
-        stake_mode=args.stake_mode,
-        flat_stake=args.flat_stake,
-        fkelly=args.fkelly,
-        max_kelly=args.max_kelly,
-        max_bets_per_game=args.max_bets_per_game,
-        bankroll0=args.bankroll0
-    )
-    bets_df.to_csv(os.path.join(args.outdir, "bets_simulated.csv"), index=False)
-    bankroll_df.to_csv(os.path.join(args.outdir, "bankroll_path.csv"), index=False)
-    save_bankroll_plot(bankroll_df, f"Bankroll (min_edge={args.min_edge}, stake={args.stake_mode})", os.path.join(args.outdir, "bankroll.png"))
+    # odds (das colunas detectadas)
+    odds_1x2_test = mk["odds_1x2"][test_rows]
+    odds_over_test = mk["odds_over"][test_rows]
+    odds_under_test = mk["odds_under"][test_rows]
+
+    with timer.stage("simulate_bets"):
+        bets_df, bankroll_df = simulate_bets(
+            df_test=df_test,
+            p_market_1x2=p_mkt_1x2,
+            p_model_1x2=p_mod_1x2,
+            odds_1x2=odds_1x2_test,
+            y_1x2=y1x2,
+            p_market_over=p_mkt_over,
+            p_model_over=p_mod_over,
+            odds_over=odds_over_test,
+            odds_under=odds_under_test,
+            y_over01=yover,
+            min_edge=args.min_edge,
+            stake_mode=args.stake_mode,
+            flat_stake=args.flat_stake,
+            fkelly=args.fkelly,
+            max_kelly=args.max_kelly,
+            max_bets_per_game=args.max_bets_per_game,
+            bankroll0=args.bankroll0,
+            ou_returns=mk["ou_returns"][test_rows],
+        )
+        bets_df.to_csv(os.path.join(args.outdir, "bets_simulated.csv"), index=False)
+        bankroll_df.to_csv(os.path.join(args.outdir, "bankroll_path.csv"), index=False)
+        save_bankroll_plot(bankroll_df, f"Bankroll (min_edge={args.min_edge}, stake={args.stake_mode})", os.path.join(args.outdir, "bankroll.png"))
+
+    # sweep de parâmetros de aposta (reaproveita as mesmas previsões)
+    sweep_df = None
+    if args.sweep:
+        with timer.stage("sweep"):
+            defaults = {k: getattr(args, k) for k in SWEEP_PARAMS}
+            configs = parse_sweep(args.sweep, defaults)
+            sweep_df = sweep_bets(p_mkt_1x2, p_mod_1x2, odds_1x2_test, y1x2,
+                                  p_mkt_over, p_mod_over, odds_over_test, odds_under_test, yover,
+                                  configs, bankroll0=args.bankroll0, ou_returns=mk["ou_returns"][test_rows])
+            sweep_df.to_csv(os.path.join(args.outdir, "sweep_results.csv"), index=False)
 
     # resumo final
-    def agg_metrics(prefix):
-        return {
-            f"{prefix}_mean": float(metrics_df[prefix].mean()),
-            f"{prefix}_std": float(metrics_df[prefix].std(ddof=1)) if len(metrics_df)>1 else 0.0
-        }
-
     summary = {
         "rows_total": int(len(df)),
         "rows_test_agg": int(len(pred_df)),
-        "folds": int(len(metrics_df)),
-        **agg_metrics("logloss_mkt_1x2"),
-        **agg_metrics("logloss_mod_1x2"),
-        **agg_metrics("brier_mkt_1x2"),
-        **agg_metrics("brier_mod_1x2"),
-        **agg_metrics("logloss_mkt_ou"),
-        **agg_metrics("logloss_mod_ou"),
-        **agg_metrics("brier_mkt_ou"),
-        **agg_metrics("brier_mod_ou"),
-        "alpha_1x2_mean": float(metrics_df["alpha_1x2"].mean()),
-        "alpha_ou_mean": float(metrics_df["alpha_ou"].mean()),
+        **fold_summary(metrics_df, args),
         "bets_count": int(len(bets_df)),
         "bets_roi": float(bets_df["pnl"].sum() / (bets_df["stake"].sum() + 1e-12)) if len(bets_df) else 0.0,
         "final_bankroll": float(bankroll_df["bankroll"].iloc[-1]) if len(bankroll_df) else float(args.bankroll0),
+        "calibration": calib_summary,
+        "predictions_files": pred_files,
     }
-    with open(os.path.join(args.outdir, "summary.json"), "w", encoding="utf-8") as f:
-        json.dump(summary, f, ensure_ascii=False, indent=2)
-
-    # markdown report
-    md = []
-    md.append("# Relatório — Hybrid Closing Line (1x2 + O/U)\n")
-    if date_col:
-        md.append(f"- Ordenação temporal: `{date_col}`\n")
-    else:
-        md.append("- Ordenação temporal: **(não informada)** — recomendado incluir coluna de data.\n")
-    md.append(f"- Folds: {summary['folds']}\n")
-    md.append(f"- Teste agregado: {summary['rows_test_agg']} linhas\n")
-    md.append("\n## Métricas (média ± desvio)\n")
-    md.append(f"- LogLoss 1x2 — Mercado: {summary['logloss_mkt_1x2_mean']:.6f} ± {summary['logloss_mkt_1x2_std']:.6f}\n")
-    md.append(f"- LogLoss 1x2 — Modelo : {summary['logloss_mod_1x2_mean']:.6f} ± {summary['logloss_mod_1x2_std']:.6f}\n")
-    md.append(f"- Brier 1x2   — Mercado: {summary['brier_mkt_1x2_mean']:.6f} ± {summary['brier_mkt_1x2_std']:.6f}\n")
-    md.append(f"- Brier 1x2   — Modelo : {summary['brier_mod_1x2_mean']:.6f} ± {summary['brier_mod_1x2_std']:.6f}\n")
-    md.append(f"- LogLoss O/U — Mercado: {summary['logloss_mkt_ou_mean']:.6f} ± {summary['logloss_mkt_ou_std']:.6f}\n")
-    md.append(f"- LogLoss O/U — Modelo : {summary['logloss_mod_ou_mean']:.6f} ± {summary['logloss_mod_ou_std']:.6f}\n")
-    md.append(f"- Brier O/U   — Mercado: {summary['brier_mkt_ou_mean']:.6f} ± {summary['brier_mkt_ou_std']:.6f}\n")
-    md.append(f"- Brier O/U   — Modelo : {summary['brier_mod_ou_mean']:.6f} ± {summary['brier_mod_ou_std']:.6f}\n")
-    md.append("\n## Shrinkage\n")
-    md.append(f"- alpha_1x2 (média): {summary['alpha_1x2_mean']:.3f}\n")
-    md.append(f"- alpha_ou  (média): {summary['alpha_ou_mean']:.3f}\n")
-    md.append("\n## Simulação de apostas (teórico no closing)\n")
-    md.append(f"- min_edge: {args.min_edge}\n")
-    md.append(f"- stake_mode: {args.stake_mode}\n")
-    md.append(f"- bets: {summary['bets_count']}\n")
-    md.append(f"- ROI: {summary['bets_roi']*100:.2f}%\n")
-    md.append(f"- Bankroll final: {summary['final_bankroll']:.2f}\n")
-    md.append("\n## Arquivos gerados\n")
-    md.append("- predictions_walkforward.csv\n- fold_metrics.csv\n- calibration_bins_ou_market.csv\n- calibration_bins_ou_model.csv\n- calibration_ou_market.png\n- calibration_ou_model.png\n- bets_simulated.csv\n- bankroll_path.csv\n- bankroll.png\n- summary.json\n")
-    with open(os.path.join(args.outdir, "REPORT.md"), "w", encoding="utf-8") as f:
-        f.write("\n".join(md))
-
-    print("OK. Saída em:", args.outdir)
-    print("Resumo:", json.dumps(summary, ensure_ascii=False, indent=2))
-
+    if args.window or args.window_days or args.decay_half_life:
+        train_rows = [len(tr_idx) for tr_idx, _ in splits]
+        summary["train_window"] = {"rows": args.window or None, "days": args.window_days or None,
+                                   "decay_half_life": args.decay_half_life or None,
+                                   "train_rows_min": int(min(train_rows)), "train_rows_max": int(max(train_rows))}
+    if args.bootstrap > 0:
+        with timer.stage("bootstrap"):
+            summary["bootstrap"] = bootstrap_summary(pred_df, bets_df, df, date_col, args)
+    if part_metrics is not None:
+        summary["partition_by"] = args.partition_by
+        summary["partitions_fitted_mean"] = float(metrics_df["partitions_fitted"].mean())
+    if line_mk:
+        with timer.stage("ou_lines"):
+            main_label = args.ou_line_col or ou_line_tag(args.ou_line)
+            lines = {main_label: ("", mk), **{tag: (f"_{tag}", m) for tag, m in line_mk.items()}}
+            lines_df = simulate_ou_lines(pred_df, df_test, metrics_df, lines, test_rows, args)
+            lines_df.to_csv(os.path.join(args.outdir, "ou_lines_summary.csv"), index=False)
+            summary["ou_lines"] = lines_df.to_dict(orient="records")
+    if args.profile:
+        pd.DataFrame(timer.rows).astype({"fold": "Int64"}).to_csv(os.path.join(args.outdir, "timings.csv"), index=False)
+        summary["timings"] = timings_summary(timer.rows)
+        if args.profile_dump:
+            slowest = summary["timings"]["slowest_fold"]
+            if args.partition_by:
+                tasks = partition_tasks(splits, part.astype(np.int64), list(names), args.partition_min_rows)
+            else:
+                tasks = [(fold, tr_idx, te_idx, None) for fold, (tr_idx, te_idx) in enumerate(splits, start=1)]
+            prof_path = os.path.join(args.outdir, f"profile_fold{slowest}.prof")
+            profile_fold_dump([t for t in tasks if t[0] == slowest], data, params, prof_path)
+            summary["timings"]["profile_dump"] = os.path.basename(prof_path)
+    write_summary_report(summary, args, date_col, sweep_df=sweep_df)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Gerador sintético de closing lines com probabilidades verdadeiras conhecidas.
+
+Cada jogo tem taxas de gols (Poisson independentes) lam_h, lam_a; daí saem as
+probabilidades verdadeiras 1x2 e Over 2.5 (True_H, True_D, True_A, True_Over)
+e o placar (FTHG, FTAG) é sorteado dessas mesmas taxas. O book vê as taxas com
+ruído (log-normal, --noise), aplica viés favorito/zebra (--flb) e margem
+(--margin) — então o mercado é bom mas não perfeito, como um closing real.
+
+Colunas no formato esperado por hybrid_closing_sindicato.py (Date, League,
+Odd_H/D/A, Odd_O/U, FTHG, FTAG). Tudo vetorizado (O(n * gols)), 1M linhas em
+poucos segundos.
+
+Uso:
+    python synthetic_closing.py --rows 100000 --out synth_100k.csv
+    from synthetic_closing import generate_closing
+    df = generate_closing(100_000, seed=0)
+"""
+
+import argparse
+import os
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+LEAGUES = ["ENG", "ESP", "ITA", "GER", "FRA", "POR", "NED", "BRA"]
+LEAGUE_WEIGHTS = [0.2, 0.18, 0.16, 0.14, 0.12, 0.08, 0.07, 0.05]
+MAX_GOALS = 15  # truncamento da Poisson (massa perdida < 1e-9 para as taxas usadas)
+
+
+def poisson_pmf(lam: np.ndarray, max_goals: int = MAX_GOALS) -> np.ndarray:
+    """(n,) taxas -> (n, max_goals+1) pmf, pela recorrência p_k = p_{k-1} * lam / k."""
+    k = np.arange(1, max_goals + 1)
+    ratios = lam[:, None] / k[None, :]
+    return np.exp(-lam)[:, None] * np.hstack([np.ones((len(lam), 1)), np.cumprod(ratios, axis=1)])
+
+
+def true_probs(lam_h: np.ndarray, lam_a: np.ndarray, line: float = 2.5) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Probabilidades exatas (até MAX_GOALS) de H/D/A (n,3) e Over `line` (n,)
+    para gols Poisson independentes.
+    """
+    ph, pa = poisson_pmf(lam_h), poisson_pmf(lam_a)
+    cdf_a = np.cumsum(pa, axis=1)
+    p_home = (ph[:, 1:] * cdf_a[:, :-1]).sum(axis=1)       # P(h = i) * P(a <= i-1)
+    p_draw = (ph * pa).sum(axis=1)
+    p_away = np.clip(1.0 - p_home - p_draw, 0.0, 1.0)
+    # total de gols ~ Poisson(lam_h + lam_a)
+    p_under = poisson_pmf(lam_h + lam_a, int(np.floor(line)))[:, :int(np.floor(line)) + 1].sum(axis=1)
+    return np.column_stack([p_home, p_draw, p_away]), 1.0 - p_under
+
+
+def book_odds(p: np.ndarray, margin: float, flb: float) -> np.ndarray:
+    """
+    Odds com margem a partir de probabilidades (n,k) do book: viés favorito/zebra
+    via p^(1-flb) renormalizado (zebras ficam mais caras) e margem proporcional.
+    """
+    q = p ** (1.0 - flb)
+    q = q / q.sum(axis=1, keepdims=True)
+    return 1.0 / (q * margin)
+
+
+def generate_closing(n: int, seed: int = 0, margin: float = 1.05, noise: float = 0.12,
+                     flb: float = 0.05, games_per_day: int = 40,
+                     start: str = "2005-01-01") -> pd.DataFrame:
+    """n jogos sintéticos em ordem de data (ver docstring do módulo)."""
+    rng = np.random.default_rng(seed)
+    lam_h = rng.gamma(6.0, 0.25, n)
+    lam_a = rng.gamma(5.0, 0.25, n)
+    p1x2, pover = true_probs(lam_h, lam_a)
+
+    # o book vê as taxas com ruído multiplicativo
+    bh = lam_h * np.exp(rng.normal(0.0, noise, n))
+    ba = lam_a * np.exp(rng.normal(0.0, noise, n))
+    b1x2, bover = true_probs(bh, ba)
+    odds_1x2 = book_odds(b1x2, margin, flb)
+    odds_ou = book_odds(np.column_stack([bover, 1.0 - bover]), margin, flb)
+
+    return pd.DataFrame({
+        "Date": pd.Timestamp(start) + pd.to_timedelta(np.arange(n) // games_per_day, unit="D"),
+        "League": rng.choice(LEAGUES, n, p=LEAGUE_WEIGHTS),
+        "Odd_H": odds_1x2[:, 0], "Odd_D": odds_1x2[:, 1], "Odd_A": odds_1x2[:, 2],
+        "Odd_O": odds_ou[:, 0], "Odd_U": odds_ou[:, 1],
+        "FTHG": rng.poisson(lam_h), "FTAG": rng.poisson(lam_a),
+        "True_H": p1x2[:, 0], "True_D": p1x2[:, 1], "True_A": p1x2[:, 2], "True_Over": pover,
+    })
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Closing lines sintéticas com probabilidades verdadeiras conhecidas.")
+    ap.add_argument("--rows", type=int, required=True)
+    ap.add_argument("--out", required=True, help="Arquivo de saída (.csv ou .parquet).")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--margin", type=float, default=1.05, help="Overround do book (1.05 = 5%%).")
+    ap.add_argument("--noise", type=float, default=0.12, help="Desvio do ruído log-normal nas taxas vistas pelo book.")
+    ap.add_argument("--flb", type=float, default=0.05, help="Viés favorito/zebra do book (0 = nenhum).")
+    ap.add_argument("--games-per-day", type=int, default=40)
+    args = ap.parse_args()
+
+    df = generate_closing(args.rows, seed=args.seed, margin=args.margin, noise=args.noise,
+                          flb=args.flb, games_per_day=args.games_per_day)
+    if os.path.splitext(args.out)[1].lower() == ".parquet":
+        df.to_parquet(args.out, index=False)
+    else:
+        df.to_csv(args.out, index=False)
+
+    # referência: LogLoss 1x2 das probabilidades verdadeiras vs. do mercado (de-vig proporcional)
+    y = np.select([df["FTHG"] > df["FTAG"], df["FTHG"] == df["FTAG"]], [0, 1], 2)
+    inv = 1.0 / df[["Odd_H", "Odd_D", "Odd_A"]].values
+    p_mkt = inv / inv.sum(axis=1, keepdims=True)
+    p_true = df[["True_H", "True_D", "True_A"]].values
+    ll = lambda p: float(-np.log(p[np.arange(len(y)), y]).mean())
+    print(f"OK. {len(df)} jogos em {args.out} — LogLoss 1x2 verdadeira={ll(p_true):.5f}, mercado={ll(p_mkt):.5f}")
+
+
+if __name__ == "__main__":
+    main()
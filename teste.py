@@ -5,12 +5,35 @@ import seaborn as sns
 import plotly.graph_objects as go
 import pandas as pd
 import math
+import os
 from scipy.stats import binom, norm # Importar para distribuição binomial e normal
+from bankroll_montecarlo import odds_table, simulate_bankrolls # Núcleo do Monte Carlo em blocos (memória limitada)
+from bankroll_exact import LEVELS_PCT, exact_fixed_odds, growth_quantiles # Odd fixa: distribuições exatas (binomial + DP), sem simulação
 
 # --- Funções Auxiliares ---
 def arange_inclusivo(inicio, fim, passo):
     return np.arange(inicio, fim + passo, passo)
 
+# Estatísticas que valem para as amostras do Monte Carlo (pesos=None) e para a
+# distribuição exata da odd fixa (valores crescentes + probabilidade de cada um)
+def percentil(valores, q, pesos=None):
+    if pesos is None:
+        return np.percentile(valores, q)
+    idx = np.searchsorted(np.cumsum(pesos), q / 100 * np.sum(pesos))
+    return valores[min(idx, len(valores) - 1)]
+
+def fracao(mascara, pesos=None):
+    # % das simulações (ou da probabilidade) em que a máscara vale
+    if pesos is None:
+        return np.mean(mascara) * 100
+    return np.sum(pesos[mascara]) / np.sum(pesos) * 100
+
+def cdf_empirica(valores, pesos=None):
+    ordem = np.argsort(valores)
+    if pesos is None:
+        return valores[ordem], np.arange(1, len(valores) + 1) / len(valores)
+    return valores[ordem], np.cumsum(pesos[ordem]) / np.sum(pesos)
+
 def criterio_kelly(p, b):
     q = 1 - p
     return (b * p - q) / (b + 1e-9) # Adicionado 1e-9 para evitar divisão por zero
@@ -86,91 +109,81 @@ def calcular_esperanca_perder_k_consecutivas(n, k_input, p_acerto):
     except Exception:
         return None
 
-def calculate_max_drawdowns(bankrolls_history):
-    """
-    Calcula o máximo drawdown para cada simulação.
-    bankrolls_history: array numpy (num_simulacoes, num_apostas)
-    Retorna: array numpy com os máximos drawdowns em porcentagem (0 a 100).
-    """
-    max_drawdowns = []
-    for simulation_path in bankrolls_history:
-        peak = simulation_path[0]
-        max_dd_current_sim = 0.0
-        for value in simulation_path:
-            if value > peak:
-                peak = value
-            drawdown = (peak - value) / peak
-            if drawdown > max_dd_current_sim:
-                max_dd_current_sim = drawdown
-        max_drawdowns.append(max_dd_current_sim * 100) # Convert to percentage
-    return np.array(max_drawdowns)
-
-# --- Nova Função para Mini Simulação Condicional ---
-def mini_simulacao_condicional(
-    bankroll_inicial,
-    quantia_x,
-    aposta_y,
+# --- Projeção Futura Condicional ---
+# O processo é multiplicativo: partindo de X na aposta Y, o bankroll final é X vezes o
+# fator de crescimento das N - Y apostas restantes. A tabela desses fatores (quantis
+# equiprováveis para cada nº de apostas restantes) sai de uma única simulação de N apostas
+# — ou exata, com odd fixa — e qualquer (Y, X) vira só uma consulta reescalada.
+PONTOS_PROJECAO = 1001
+
+@st.cache_data(max_entries=8, show_spinner="Simulando a projeção futura...")
+def superficie_projecao(
     num_apostas_total,
     taxa_vitoria,
     odd_fixa,
     distribuicoes_odds,
     kelly_fracao,
-    num_simulacoes_mini
+    num_simulacoes_mini,
+    semente=None,
+    _processos=1  # "_": fora da chave do cache (não muda o resultado)
 ):
-    num_apostas_restantes = num_apostas_total - aposta_y
+    niveis = (np.arange(PONTOS_PROJECAO) + 0.5) / PONTOS_PROJECAO
+    if odd_fixa is not None and odd_fixa > 1:
+        return growth_quantiles(taxa_vitoria, odd_fixa, kelly_fracao, num_apostas_total, niveis)
+
+    # --- Tabela de odds (valores únicos + probabilidade) ---
+    pesos_totais = sum(d[0] for d in distribuicoes_odds if len(d) == 4)
+    if pesos_totais == 0:
+        return None
+
+    odds_lista = []
+    for peso, inicio, fim, passo in distribuicoes_odds:
+        if passo <= 0: passo = 0.01
+        odds_segmento = arange_inclusivo(inicio, fim, passo)
+        rep = int((peso / pesos_totais) * 100)
+        odds_lista.extend(np.repeat(odds_segmento, rep))
+
+    if len(odds_lista) == 0:
+        return None
+
+    # --- Uma simulação de N apostas com bankroll 1: o quantil na aposta r é o do fator de r apostas ---
+    odds_valores, odds_probs = odds_table(np.array(odds_lista))
+    return simulate_bankrolls(
+        taxa_vitoria, odds_valores, odds_probs, kelly_fracao,
+        1.0, num_simulacoes_mini, num_apostas_total, seed=semente, quantile_grid=niveis * 100,
+        workers=_processos
+    )["quantiles"]
+
+def mini_simulacao_condicional(superficie, bankroll_inicial, quantia_x, aposta_y):
+    if superficie is None:
+        return None, None, None
+    num_apostas_restantes = len(superficie) - 1 - aposta_y
 
     if num_apostas_restantes <= 0:
         return None, None, None
 
-    # --- Gerar todas as odds antecipadamente ---
-    if odd_fixa is not None and odd_fixa > 1:
-        odds = np.full((num_simulacoes_mini, num_apostas_restantes), odd_fixa)
-    else:
-        pesos_totais = sum(d[0] for d in distribuicoes_odds if len(d) == 4)
-        if pesos_totais == 0:
-            return None, None, None
-
-        odds_lista = []
-        for peso, inicio, fim, passo in distribuicoes_odds:
-            if passo <= 0: passo = 0.01
-            odds_segmento = arange_inclusivo(inicio, fim, passo)
-            rep = int((peso / pesos_totais) * 100)
-            odds_lista.extend(np.repeat(odds_segmento, rep))
-
-        if len(odds_lista) == 0:
-            return None, None, None
-
-        odds_array = np.array(odds_lista)
-        odds = np.random.choice(odds_array, size=(num_simulacoes_mini, num_apostas_restantes))
-
-    # --- Gerar resultados (vitórias ou derrotas) ---
-    resultados = np.random.rand(num_simulacoes_mini, num_apostas_restantes) < taxa_vitoria
-
-    # --- Calcular Kelly e aposta em % ---
-    b = odds - 1
-    f_kelly = criterio_kelly(taxa_vitoria, b)
-    f_aplicada = np.clip(f_kelly * kelly_fracao, 0, 0.999)
-
-    # --- Inicializar bankrolls ---
-    bankrolls = np.full(num_simulacoes_mini, quantia_x)
-
-    # --- Simular apostas vetorizadas ---
-    for i in range(num_apostas_restantes):
-        aposta = bankrolls * f_aplicada[:, i]
-        ganho = aposta * b[:, i]
-        lucro = np.where(resultados[:, i], ganho, -aposta)
-        bankrolls += lucro
-        bankrolls = np.maximum(bankrolls, 0)
+    # --- Bankrolls finais: X vezes os fatores de crescimento (pontos equiprováveis) ---
+    bankrolls = quantia_x * superficie[num_apostas_restantes]
 
     # --- Resultados finais ---
-    terminou_maior_igual_x = np.sum(bankrolls > quantia_x)
-    chance_final_maior_igual_x = (terminou_maior_igual_x / num_simulacoes_mini) * 100
-
-    terminou_maior_inicial = np.sum(bankrolls > bankroll_inicial)
-    chance_final_maior_inicial = (terminou_maior_inicial / num_simulacoes_mini) * 100
+    chance_final_maior_igual_x = np.mean(bankrolls > quantia_x) * 100
+    chance_final_maior_inicial = np.mean(bankrolls > bankroll_inicial) * 100
 
     return chance_final_maior_igual_x, chance_final_maior_inicial, bankrolls
 
+# --- Cache das Simulações ---
+# A chave é só o que muda a simulação; limite de drawdown, alvo de crescimento e k de
+# derrotas são de exibição e recalculam apenas as métricas derivadas dos arrays em cache.
+@st.cache_data(max_entries=8, show_spinner="Simulando...")
+def monte_carlo_em_cache(p, odds_valores, odds_probs, fracao_kelly, bankroll_inicial, num_simulacoes, num_apostas, semente,
+                         _processos=1):
+    return simulate_bankrolls(p, odds_valores, odds_probs, fracao_kelly, bankroll_inicial, num_simulacoes, num_apostas,
+                              seed=semente, workers=_processos)
+
+@st.cache_data(max_entries=8, show_spinner="Calculando distribuições exatas...")
+def exato_em_cache(p, odd_fixa, fracao_kelly, bankroll_inicial, num_apostas):
+    return exact_fixed_odds(p, odd_fixa, fracao_kelly, bankroll_inicial, num_apostas)
+
 def plot_histograma_tricolor_mini_sim(bankrolls_finais_mini, quantia_x_mini_sim, bankroll_inicial_total):
     import plotly.graph_objects as go
     import numpy as np
@@ -178,12 +191,13 @@ def plot_histograma_tricolor_mini_sim(bankrolls_finais_mini, quantia_x_mini_sim,
 
     # --- Calcular os dados do histograma manualmente ---
     hist, bin_edges = np.histogram(bankrolls_finais_mini, bins='auto')
+    hist = hist / len(bankrolls_finais_mini) * 100  # probabilidade (%) de cada bin
     bin_centers = 0.5 * (bin_edges[:-1] + bin_edges[1:])
 
     # --- Calcular percentuais para cada categoria ---
     total_simulacoes = len(bankrolls_finais_mini)
     
-    # Contar simulações em cada categoria
+    # Contar pontos (equiprováveis) em cada categoria
     abaixo_partida = np.sum(bankrolls_finais_mini < quantia_x_mini_sim)
     entre_partida_inicial = np.sum((bankrolls_finais_mini >= quantia_x_mini_sim) & 
                                   (bankrolls_finais_mini < bankroll_inicial_total))
@@ -246,7 +260,7 @@ def plot_histograma_tricolor_mini_sim(bankrolls_finais_mini, quantia_x_mini_sim,
     fig.update_layout(
         title='Histograma Condicional dos Bankrolls Finais (Projeção Futura)',
         xaxis_title='Bankroll Final',
-        yaxis_title='Contagem de Simulações',
+        yaxis_title='Probabilidade (%)',
         template='plotly_white',
         plot_bgcolor='white',
         paper_bgcolor='white',
@@ -373,6 +387,14 @@ bankroll_inicial_val = st.sidebar.number_input("Bankroll Inicial", 10.0, 100000.
 num_simulacoes_val = st.sidebar.number_input("Número de Simulações", 100, 100000, 10000, 100)
 num_apostas_val = st.sidebar.number_input("Número de Apostas", 1, 1000, 30, 1)
 fracao_kelly_val = st.sidebar.slider("Fração de Kelly", 0.01, 1.0, 0.33, 0.01)
+semente_val = st.sidebar.number_input(
+    "Semente Aleatória", 0, 2**31 - 1, 42, 1,
+    help="Mesma semente e parâmetros = mesmos resultados, com qualquer número de processos."
+)
+processos_val = st.sidebar.number_input(
+    "Processos da Simulação", 1, os.cpu_count() or 1, os.cpu_count() or 1, 1,
+    help="Núcleos usados pelo Monte Carlo (o pool fica aberto entre execuções). Não muda os resultados."
+)
 
 st.sidebar.markdown("---")
 st.sidebar.subheader("🔴 Parâmetros de Sequência de Derrotas")
@@ -404,7 +426,8 @@ target_growth_percentage = st.sidebar.slider(
 
 st.sidebar.markdown("---")
 st.sidebar.subheader("🔮 Projeção Futura Condicional")
-aposta_y_mini_sim = st.sidebar.number_input(
+# Y e X só consultam a tabela de fatores de crescimento (não simulam de novo)
+aposta_y_mini_sim = st.sidebar.slider(
     "Aposta de Início da Projeção Futura (Y)",
     min_value=0,
     max_value=num_apostas_val,
@@ -412,7 +435,7 @@ aposta_y_mini_sim = st.sidebar.number_input(
     step=1,
     help="Em qual número de aposta a projeção futura deve começar?"
 )
-quantia_x_mini_sim = st.sidebar.number_input(
+quantia_x_mini_sim = st.sidebar.slider(
     "Bankroll de Início da Projeção Futura (X)",
     min_value=0.0,
     max_value=bankroll_inicial_val * 10, # Limite superior ajustado para ser mais flexível
@@ -427,7 +450,7 @@ num_simulacoes_mini = st.sidebar.number_input(
     max_value=100000,
     value=10000,
     step=1000,
-    help="Quantas simulações devem ser executadas a partir do ponto (X, Y)?"
+    help="Quantos caminhos simular para a tabela de fatores de crescimento (com odd fixa ela é exata)."
 )
 
 st.sidebar.markdown("---")
@@ -475,7 +498,20 @@ else:
 st.sidebar.markdown("---")
 
 # --- Botão de Execução (REMOVIDA A LINHA E ADICIONADO O ÍCONE) ---
+# O Streamlit roda a página de novo a cada widget e o botão só vale True no clique: os
+# parâmetros da simulação ficam na sessão, para que mexer só nas entradas de exibição
+# não apague os resultados (e os arrays vêm do cache, sem simular de novo).
+parametros_simulacao = (p_val, bankroll_inicial_val, num_simulacoes_val, num_apostas_val,
+                        fracao_kelly_val, semente_val, odd_choice, odd_fixa_val, distribuicoes_val)
 if st.button("🎲 Executar Simulação"):
+    st.session_state["parametros_simulacao"] = parametros_simulacao
+
+if "parametros_simulacao" in st.session_state:
+    if st.session_state["parametros_simulacao"] != parametros_simulacao:
+        st.info("ℹ️ Os parâmetros da simulação mudaram. Clique em 'Executar Simulação' para atualizar — os resultados abaixo são da última execução.")
+    (p_val, bankroll_inicial_val, num_simulacoes_val, num_apostas_val,
+     fracao_kelly_val, semente_val, odd_choice, odd_fixa_val, distribuicoes_val) = st.session_state["parametros_simulacao"]
+
     st.markdown("---")
     st.header("📝 Sumário dos Resultados Financeiros")
 
@@ -521,34 +557,29 @@ if st.button("🎲 Executar Simulação"):
         st.error("🚫 Nenhuma odd válida foi gerada. Por favor, verifique os parâmetros das distribuições ou a odd fixa.")
         st.stop()
 
-    odds_simuladas = np.random.choice(odds_possiveis, size=(num_simulacoes_val, num_apostas_val))
-
-    b_values = odds_simuladas - 1
-    
-    fatores_kelly = criterio_kelly(p_val, b_values) * fracao_kelly_val
-    # Clipe os fatores_kelly para garantir que 1 - f não seja zero ou negativo
-    fatores_kelly = np.where(fatores_kelly > 0, fatores_kelly, 0)
-    # Limita f para que 1-f > 0, ex: 0.9999 em vez de 1
-    fatores_kelly = np.clip(fatores_kelly, 0, 0.99999) 
-
-    resultados_apostas = np.random.rand(num_simulacoes_val, num_apostas_val) < p_val
-
-    retornos = np.where(
-        resultados_apostas,
-        fatores_kelly * b_values,
-        -fatores_kelly
-    )
-
-    bankrolls = bankroll_inicial_val * np.cumprod(1 + retornos, axis=1)
-    # Adicionar o bankroll inicial na primeira coluna para o histórico completo
-    bankrolls_history_with_initial = np.concatenate((np.full((num_simulacoes_val, 1), bankroll_inicial_val), bankrolls), axis=1)
-    
-    resultados = bankrolls[:, -1]
-
-    # --- Cálculo do Máximo Drawdown para cada simulação ---
-    max_drawdowns = calculate_max_drawdowns(bankrolls_history_with_initial)
-
-    bankrolls_maior_inicial = np.sum(resultados > bankroll_inicial_val)
+    if odd_fixa_val is not None:
+        # Odd fixa: o bankroll final só depende do número de vitórias (binomial) e o
+        # drawdown/ruína saem de uma DP exata — sem simulação e sem ruído. Os "resultados"
+        # viram os bankrolls possíveis com pesos = probabilidade de cada um (cenários com
+        # probabilidade < 1e-9 ficam de fora para não esticar eixos e extremos).
+        simulacao = exato_em_cache(p_val, odd_fixa_val, fracao_kelly_val, bankroll_inicial_val, num_apostas_val)
+        relevantes = simulacao["pmf"] >= 1e-9
+        resultados, pesos = simulacao["final"][relevantes], simulacao["pmf"][relevantes]
+        # Drawdown máximo: probabilidade de cada faixa [k%, k+1%), no centro da faixa
+        max_drawdowns = LEVELS_PCT[:-1] + 0.5
+        pesos_dd = simulacao["dd_sf"][:-1] - simulacao["dd_sf"][1:]
+    else:
+        # Simulação em blocos: só ficam os bankrolls finais, o drawdown máximo de cada
+        # simulação e as faixas (mediana/IQR) por aposta — a matriz simulações x apostas
+        # nunca é montada inteira, então a memória não cresce com o número de simulações.
+        odds_valores, odds_probs = odds_table(odds_possiveis)
+        simulacao = monte_carlo_em_cache(
+            p_val, odds_valores, odds_probs, fracao_kelly_val,
+            bankroll_inicial_val, num_simulacoes_val, num_apostas_val, semente_val, processos_val
+        )
+        resultados, pesos = simulacao["final"], None
+        # --- Máximo Drawdown de cada simulação (calculado bloco a bloco) ---
+        max_drawdowns, pesos_dd = simulacao["max_drawdown"], None
 
     # --- CÁLCULO DA LINHA DE PROJEÇÃO BASEADA NO CRESCIMENTO LOGARÍTMICO DE KELLY (G) ---
     # Calcular a odd média ponderada (se houver distribuição) ou usar a odd fixa
@@ -591,30 +622,31 @@ if st.button("🎲 Executar Simulação"):
     # --- Estatísticas ---
     taxas_crescimento = np.array(resultados) / bankroll_inicial_val
 
-    ic_inferior_95 = np.percentile(resultados, 2.5)
-    ic_superior_95 = np.percentile(resultados, 97.5)
-    ic_inferior_68 = np.percentile(resultados, 16)
-    ic_superior_68 = np.percentile(resultados, 84)
-    mediana = np.median(resultados)
+    ic_inferior_95 = percentil(resultados, 2.5, pesos)
+    ic_superior_95 = percentil(resultados, 97.5, pesos)
+    ic_inferior_68 = percentil(resultados, 16, pesos)
+    ic_superior_68 = percentil(resultados, 84, pesos)
+    mediana = percentil(resultados, 50, pesos)
 
-    percentil_5 = np.percentile(resultados, 5)
-    percentil_25 = np.percentile(resultados, 25)
-    percentil_75 = np.percentile(resultados, 75)
-    percentil_95 = np.percentile(resultados, 95)
+    percentil_5 = percentil(resultados, 5, pesos)
+    percentil_25 = percentil(resultados, 25, pesos)
+    percentil_75 = percentil(resultados, 75, pesos)
+    percentil_95 = percentil(resultados, 95, pesos)
 
     valor_minimo = np.min(resultados)
     valor_maximo = np.max(resultados)
 
-    bankrolls_maior_inicial = np.sum(resultados > bankroll_inicial_val)
-
-    chance_bankroll_maior = (bankrolls_maior_inicial / num_simulacoes_val) * 100
+    chance_bankroll_maior = fracao(resultados > bankroll_inicial_val, pesos)
 
-    percent_abaixo_inicial = (np.sum(resultados < bankroll_inicial_val) / num_simulacoes_val) * 100
-    percent_acima_inicial = (np.sum(resultados >= bankroll_inicial_val) / num_simulacoes_val) * 100
+    percent_abaixo_inicial = fracao(resultados < bankroll_inicial_val, pesos)
+    percent_acima_inicial = fracao(resultados >= bankroll_inicial_val, pesos)
 
     # Drawdown Metrics
-    median_drawdown = np.median(max_drawdowns)
-    chance_exceed_drawdown_limit = (np.sum(max_drawdowns >= drawdown_limite_val) / num_simulacoes_val) * 100
+    if pesos_dd is None:
+        median_drawdown = np.median(max_drawdowns)
+    else:  # mediana exata interpolada na CDF de 1 em 1%
+        median_drawdown = float(np.interp(0.5, 1 - simulacao["dd_sf"], LEVELS_PCT))
+    chance_exceed_drawdown_limit = fracao(max_drawdowns >= drawdown_limite_val, pesos_dd)
 
     # --- CÁLCULO DA PROJEÇÃO DE APOSTAS PARA AUMENTO DE SALDO X% ---
     num_apostas_para_alvo = "N/A"
@@ -755,6 +787,14 @@ if st.button("🎲 Executar Simulação"):
             </div>
             """)
     
+    if pesos is not None:
+        nivel_ruina = int(drawdown_limite_val)
+        st.caption(
+            f"🧮 Odd fixa: resultados exatos (binomial + programação dinâmica), sem ruído de simulação. "
+            f"Chance de o bankroll tocar {100 - nivel_ruina}% do inicial em algum momento: "
+            f"{simulacao['ruin_sf'][nivel_ruina] * 100:.2f}%."
+        )
+
     # Nova exibição discreta para a projeção de apostas para o alvo
     st.markdown(
         f"<div class='growth-projection-box'>"
@@ -772,8 +812,8 @@ if st.button("🎲 Executar Simulação"):
 
         fig_path = go.Figure()
 
-        lower_bound_iqr = np.percentile(bankrolls_history_with_initial, 25, axis=0)
-        upper_bound_iqr = np.percentile(bankrolls_history_with_initial, 75, axis=0)
+        lower_bound_iqr = simulacao["p25"]
+        upper_bound_iqr = simulacao["p75"]
 
         fig_path.add_trace(go.Scatter(
             x=np.arange(0, num_apostas_val + 1),
@@ -796,7 +836,7 @@ if st.button("🎲 Executar Simulação"):
             hoverinfo='none'
         ))
 
-        median_path = np.median(bankrolls_history_with_initial, axis=0)
+        median_path = simulacao["median"]
         fig_path.add_trace(go.Scatter(
             x=np.arange(0, num_apostas_val + 1),
             y=median_path,
@@ -954,7 +994,8 @@ if st.button("🎲 Executar Simulação"):
 
     # Primeiro, plote o KDE para obter os dados
         sns.kdeplot(
-            taxas_crescimento,
+            x=taxas_crescimento,
+            weights=pesos,
             fill=False,
             color='skyblue',
             ax=ax_taxa,
@@ -1002,8 +1043,8 @@ if st.button("🎲 Executar Simulação"):
         
 
     # Percentuais de perda e lucro
-        percent_perda = (np.sum(taxas_crescimento < 1.0) / len(taxas_crescimento)) * 100
-        percent_lucro = (np.sum(taxas_crescimento >= 1.0) / len(taxas_crescimento)) * 100
+        percent_perda = fracao(taxas_crescimento < 1.0, pesos)
+        percent_lucro = fracao(taxas_crescimento >= 1.0, pesos)
 
     
     # Preencher área vermelha (< 1.0)
@@ -1024,11 +1065,11 @@ if st.button("🎲 Executar Simulação"):
         ax_taxa.set_xlim(1.0 - max_diff * 1.1, 1.0 + max_diff * 1.1)
 
     # Adicionar linhas de referência
-        mediana_taxa = np.median(taxas_crescimento)
-        ic_inferior_95_taxa = np.percentile(taxas_crescimento, 2.5)
-        ic_superior_95_taxa = np.percentile(taxas_crescimento, 97.5)
-        ic_inferior_68_taxa = np.percentile(taxas_crescimento, 16)
-        ic_superior_68_taxa = np.percentile(taxas_crescimento, 84)
+        mediana_taxa = percentil(taxas_crescimento, 50, pesos)
+        ic_inferior_95_taxa = percentil(taxas_crescimento, 2.5, pesos)
+        ic_superior_95_taxa = percentil(taxas_crescimento, 97.5, pesos)
+        ic_inferior_68_taxa = percentil(taxas_crescimento, 16, pesos)
+        ic_superior_68_taxa = percentil(taxas_crescimento, 84, pesos)
 
         ax_taxa.axvline(mediana_taxa, color='dodgerblue', linestyle='-', linewidth=2, label=f'Mediana ({mediana_taxa:.2f})')
         ax_taxa.axvline(ic_inferior_68_taxa, color='darkorange', linestyle='dotted', linewidth=2)
@@ -1056,7 +1097,8 @@ if st.button("🎲 Executar Simulação"):
         fig_kde, ax_kde = plt.subplots(figsize=(12, 7), facecolor='white')  
 
         sns.histplot(
-            resultados,
+            x=resultados,
+            weights=pesos,
             bins=100,
             kde=True,
             color='skyblue',
@@ -1126,13 +1168,23 @@ if st.button("🎲 Executar Simulação"):
         max_dd_for_bins = max(100, max_drawdowns.max() + 5)
         bin_size = max_dd_for_bins / num_bins
 
-        drawdowns_green = max_drawdowns[max_drawdowns < drawdown_limite_val]
-        drawdowns_orange = max_drawdowns[(max_drawdowns >= drawdown_limite_val) & (max_drawdowns < 50)]
-        drawdowns_red = max_drawdowns[max_drawdowns >= 50]
+        mascara_green = max_drawdowns < drawdown_limite_val
+        mascara_orange = (max_drawdowns >= drawdown_limite_val) & (max_drawdowns < 50)
+        mascara_red = max_drawdowns >= 50
+        drawdowns_green = max_drawdowns[mascara_green]
+        drawdowns_orange = max_drawdowns[mascara_orange]
+        drawdowns_red = max_drawdowns[mascara_red]
+
+        # Odd fixa: barras somam a probabilidade exata (%) de cada faixa em vez de contar simulações
+        def barras_dd(mascara):
+            if pesos_dd is None:
+                return dict(histfunc='count')
+            return dict(y=pesos_dd[mascara] * 100, histfunc='sum')
 
         if len(drawdowns_green) > 0:
             fig_dd_hist_colored.add_trace(go.Histogram(
                 x=drawdowns_green,
+                **barras_dd(mascara_green),
                 xbins=dict(start=0, end=max_dd_for_bins, size=bin_size),
                 marker_color='#90EE90',
                 opacity=0.7,
@@ -1143,6 +1195,7 @@ if st.button("🎲 Executar Simulação"):
         if len(drawdowns_orange) > 0:
             fig_dd_hist_colored.add_trace(go.Histogram(
                 x=drawdowns_orange,
+                **barras_dd(mascara_orange),
                 xbins=dict(start=0, end=max_dd_for_bins, size=bin_size),
                 marker_color='#FF8C00',
                 opacity=0.7,
@@ -1153,6 +1206,7 @@ if st.button("🎲 Executar Simulação"):
         if len(drawdowns_red) > 0:
             fig_dd_hist_colored.add_trace(go.Histogram(
                 x=drawdowns_red,
+                **barras_dd(mascara_red),
                 xbins=dict(start=0, end=max_dd_for_bins, size=bin_size),
                 marker_color='red',
                 opacity=0.7,
@@ -1164,7 +1218,7 @@ if st.button("🎲 Executar Simulação"):
         fig_dd_hist_colored.update_layout(
             title=dict(text='Distribuição dos Máximos Drawdowns', font=dict(size=20, color='black', weight='normal')),
             xaxis_title=dict(text='Máximo Drawdown (%)', font=dict(size=16, color='black', weight='normal')),
-            yaxis_title=dict(text='Frequência', font=dict(size=16, color='black', weight='normal')),
+            yaxis_title=dict(text='Frequência' if pesos_dd is None else 'Probabilidade (%)', font=dict(size=16, color='black', weight='normal')),
             xaxis=dict(showgrid=True, zeroline=False, tickfont=dict(color='black', size=12, weight='normal')),
             yaxis=dict(showgrid=True, zeroline=False, tickfont=dict(color='black', size=12, weight='normal')),
             template='plotly_white',
@@ -1193,8 +1247,12 @@ if st.button("🎲 Executar Simulação"):
     with st.expander("〽 CDF do Máximo Drawdown"):
         st.write("A CDF (Função de Distribuição Cumulativa) mostra a probabilidade de o drawdown máximo ser menor ou igual a um determinado valor. Isso ajuda a entender o risco de drawdown. Use o slider para explorar diferentes valores de drawdown.")
 
-        drawdowns_ordenados = np.sort(max_drawdowns)
-        cdf_dd = np.arange(1, len(drawdowns_ordenados) + 1) / len(drawdowns_ordenados)
+        if pesos_dd is None:
+            drawdowns_ordenados, cdf_dd = cdf_empirica(max_drawdowns)
+        else:  # CDF exata P(drawdown < x%) até onde ainda há probabilidade
+            cdf_exata = 1 - simulacao["dd_sf"]
+            ate = min(int(np.searchsorted(cdf_exata, 1 - 1e-9)) + 1, len(LEVELS_PCT))
+            drawdowns_ordenados, cdf_dd = LEVELS_PCT[:ate].astype(float), cdf_exata[:ate]
 
         fig_cdf_dd = go.Figure()
 
@@ -1321,8 +1379,7 @@ if st.button("🎲 Executar Simulação"):
     with st.expander("↗️ CDF da Taxa de Crescimento do Bankroll"):
         st.write("A CDF (Função de Distribuição Cumulativa) mostra a probabilidade de a taxa de crescimento ser menor ou igual a um determinado valor. Isso ajuda a entender a probabilidade de atingir ou exceder um certo retorno. Use o slider para explorar diferentes valores de taxa de crescimento.")
 
-        taxas_ordenadas = np.sort(taxas_crescimento)
-        cdf_taxa = np.arange(1, len(taxas_ordenadas) + 1) / len(taxas_ordenadas)
+        taxas_ordenadas, cdf_taxa = cdf_empirica(taxas_crescimento, pesos)
 
         fig_cdf_taxa = go.Figure()
 
@@ -1568,18 +1625,23 @@ if st.button("🎲 Executar Simulação"):
 
 # --- Executar e Mostrar Resultados da Mini Simulação Condicional ---
     with st.expander("🔮 Resultados da Projeção Futura Condicional"):
-        st.write(f"Simulando {num_simulacoes_mini} novos caminhos a partir da **Aposta {aposta_y_mini_sim}** com **R$ {quantia_x_mini_sim:,.2f}** de bankroll:")
+        st.write(f"Projeção a partir da **Aposta {aposta_y_mini_sim}** com **R$ {quantia_x_mini_sim:,.2f}** de bankroll — X vezes o fator de crescimento das apostas restantes, tirado da tabela calculada uma vez (mudar X ou Y não simula de novo):")
 
-        chance_maior_igual_x_mini, chance_maior_inicial_mini, bankrolls_finais_mini = mini_simulacao_condicional(
-            bankroll_inicial_val, # Importante passar o bankroll_inicial_val original
-            quantia_x_mini_sim,
-            aposta_y_mini_sim,
+        superficie = superficie_projecao(
             num_apostas_val,
             p_val,
             odd_fixa_val,
             distribuicoes_val,
             fracao_kelly_val,
-            num_simulacoes_mini
+            num_simulacoes_mini,
+            semente_val,
+            processos_val
+        )
+        chance_maior_igual_x_mini, chance_maior_inicial_mini, bankrolls_finais_mini = mini_simulacao_condicional(
+            superficie,
+            bankroll_inicial_val, # Importante passar o bankroll_inicial_val original
+            quantia_x_mini_sim,
+            aposta_y_mini_sim
         )
 
         if chance_maior_igual_x_mini is not None:
@@ -1602,7 +1664,32 @@ if st.button("🎲 Executar Simulação"):
                         <div class="metric-delta {delta_class}"></div>
                     </div>
                     """)
-            # Opcional: Visualização da distribuição dos bankrolls finais da mini-simulação
+            # Superfície (Y, X) -> chance de terminar acima do bankroll inicial, direto da tabela:
+            # P(X * G_r > inicial) = fração dos fatores de r = N - Y apostas acima de inicial / X
+            apostas_y = np.arange(num_apostas_val)
+            quantias_x = np.linspace(bankroll_inicial_val * 0.1, bankroll_inicial_val * 3, 120)
+            chance_superficie = np.array([
+                100 - np.searchsorted(superficie[num_apostas_val - y], bankroll_inicial_val / quantias_x, side='right') / PONTOS_PROJECAO * 100
+                for y in apostas_y
+            ]).T
+            fig_superficie = go.Figure(go.Heatmap(
+                x=apostas_y, y=quantias_x, z=chance_superficie,
+                colorscale='RdYlGn', zmin=0, zmax=100, colorbar=dict(title='%'),
+                hovertemplate='Aposta Y: %{x}<br>Bankroll X: R$ %{y:,.2f}<br>Chance > inicial: %{z:.1f}%<extra></extra>'
+            ))
+            fig_superficie.add_trace(go.Scatter(
+                x=[aposta_y_mini_sim], y=[quantia_x_mini_sim], mode='markers',
+                marker=dict(color='black', size=12, symbol='x'), name='(Y, X) escolhido'
+            ))
+            fig_superficie.update_layout(
+                title='Chance de Terminar Acima do Bankroll Inicial por (Aposta Y, Bankroll X)',
+                xaxis_title='Aposta de Início (Y)',
+                yaxis_title='Bankroll de Início (X)',
+                template='plotly_white',
+                height=500
+            )
+            st.plotly_chart(fig_superficie, use_container_width=True)
+
             # Opcional: Visualização da distribuição dos bankrolls finais da mini-simulação
             # 📊 Curva Interativa da Taxa de Crescimento (Plotly)
             st.subheader("Distribuições da Projeção Futura Condicional:")
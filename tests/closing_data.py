@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+"""data/params de run_fold a partir de closings sintéticos (mesmo preparo do main, sem CLI)."""
+
+import hybrid_closing_sindicato as hc
+from synthetic_closing import generate_closing
+
+
+def closing_data(n=2400, seed=0, **params):
+    """(df, data, params) como o main monta para o walk-forward; params extras sobrescrevem os padrões."""
+    df = generate_closing(n, seed=seed, games_per_day=10)
+    mk = hc.prepare_market_arrays(df, hc.detect_columns(df), 2.5)
+    X_df = hc.market_features(mk["p1x2_mkt"], mk["pover_mkt"])
+    data = {"X": X_df.values.astype(float), "y_1x2": mk["y_1x2"], "y_over01": mk["y_over01"],
+            "p1x2_mkt": mk["p1x2_mkt"], "pover_mkt": mk["pover_mkt"]}
+    base = {"use_knn": False, "knn_k": 100, "knn_sigma": 0.08, "warm_start": False, "knn_incremental": False,
+            "alpha_method": "grid", "alpha_min_seg": 200, "ou_line": 2.5, "features": list(X_df.columns),
+            "alpha_segment": None, "cache_dir": None, "profile": False}
+    return df, data, {**base, **params}
+
@@ -0,0 +1,12 @@
+# -*- coding: utf-8 -*-
+"""
+Testes de equivalência: cada versão vetorizada contra a implementação antiga
+(laço / escalar / groupby / Monte Carlo), em dados sintéticos com semente fixa.
+
+Rodar da raiz do repositório:  python -m pytest -q tests
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+"""Partes do teste.py (página Streamlit) sem rodar a página: lidas do código-fonte com ast."""
+
+import ast
+import os
+
+import numpy as np
+
+TESTE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "teste.py")
+
+
+def page_tree() -> ast.Module:
+    with open(TESTE, encoding="utf-8") as f:
+        return ast.parse(f.read(), TESTE)
+
+
+def page_functions(*names, **namespace) -> dict:
+    """Executa só as defs pedidas (sem decoradores do Streamlit) num namespace com np + extras."""
+    defs = [n for n in page_tree().body if isinstance(n, ast.FunctionDef) and n.name in names]
+    assert {d.name for d in defs} == set(names), "função não encontrada no teste.py"
+    for d in defs:
+        d.decorator_list = []
+    ns = {"np": np, **namespace}
+    exec(compile(ast.Module(body=defs, type_ignores=[]), TESTE, "exec"), ns)
+    return ns
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""optimize_alpha_*: grade vetorizada e Newton contra o laço original de 51 log_loss."""
+
+import numpy as np
+import pytest
+from sklearn.metrics import log_loss
+
+import hybrid_closing_sindicato as hc
+
+
+def loop_alpha_multiclass(p_mkt, p_cal, y):
+    """Versão anterior ao user-003: um log_loss do sklearn por ponto da grade."""
+    best_a, best = 1.0, 1e18
+    for a in np.linspace(0.0, 1.0, 51):
+        ll = log_loss(y, a * p_mkt + (1 - a) * p_cal, labels=[0, 1, 2])
+        if ll < best:
+            best, best_a = ll, float(a)
+    return best_a
+
+
+def loop_alpha_binary(p_mkt, p_cal, y01):
+    best_a, best = 1.0, 1e18
+    for a in np.linspace(0.0, 1.0, 51):
+        p = a * p_mkt + (1 - a) * p_cal
+        ll = log_loss(y01, np.vstack([1 - p, p]).T, labels=[0, 1])
+        if ll < best:
+            best, best_a = ll, float(a)
+    return best_a
+
+
+def synthetic(seed, n=2000, noise=0.5):
+    rng = np.random.default_rng(seed)
+    p_true = rng.dirichlet([4, 2.5, 3], size=n)
+    y = (rng.random(n)[:, None] > np.cumsum(p_true, axis=1)).sum(axis=1)
+    p_mkt = 0.7 * p_true + 0.3 * rng.dirichlet([4, 2.5, 3], size=n)
+    p_cal = (1 - noise) * p_true + noise * rng.dirichlet([1, 1, 1], size=n)
+    return p_mkt, p_cal, y
+
+
+def mix_logloss(p_mkt, p_cal, y, a):
+    return log_loss(y, a * p_mkt + (1 - a) * p_cal, labels=[0, 1, 2])
+
+
+@pytest.mark.parametrize("seed,noise", [(0, 0.2), (1, 0.5), (2, 0.9)])
+def test_grid_matches_loop(seed, noise):
+    p_mkt, p_cal, y = synthetic(seed, noise=noise)
+    assert hc.optimize_alpha_multiclass(p_mkt, p_cal, y) == loop_alpha_multiclass(p_mkt, p_cal, y)
+    y01 = (y == 0).astype(int)
+    assert hc.optimize_alpha_binary(p_mkt[:, 0], p_cal[:, 0], y01) == loop_alpha_binary(p_mkt[:, 0], p_cal[:, 0], y01)
+
+
+@pytest.mark.parametrize("seed,noise", [(0, 0.2), (1, 0.5), (2, 0.9)])
+def test_newton_at_least_as_good_as_grid(seed, noise):
+    """Perda convexa em alpha: o ótimo contínuo fica a no máximo um passo (0.02) do melhor ponto da grade."""
+    p_mkt, p_cal, y = synthetic(seed, noise=noise)
+    a_grid = loop_alpha_multiclass(p_mkt, p_cal, y)
+    a_newton = hc.optimize_alpha_multiclass(p_mkt, p_cal, y, method="newton")
+    assert 0.0 <= a_newton <= 1.0
+    assert abs(a_newton - a_grid) <= 0.02 + 1e-12
+    assert mix_logloss(p_mkt, p_cal, y, a_newton) <= mix_logloss(p_mkt, p_cal, y, a_grid) + 1e-12
+
+
+def test_segments_match_per_segment_loop():
+    p_mkt, p_cal, y = synthetic(3, n=3000)
+    seg = np.random.default_rng(3).integers(0, 3, len(y))
+    got = hc.optimize_alpha_multiclass(p_mkt, p_cal, y, segments=seg, n_segments=3, min_seg=1)
+    want = [loop_alpha_multiclass(p_mkt[seg == s], p_cal[seg == s], y[seg == s]) for s in range(3)]
+    np.testing.assert_array_equal(got, want)
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""DP exata de drawdown/ruína (odd fixa) contra enumeração de todos os caminhos e contra Monte Carlo."""
+
+import numpy as np
+import pytest
+
+from bankroll_exact import LEVELS_PCT, exact_fixed_odds
+from bankroll_montecarlo import kelly_log_returns, max_drawdown_pct, simulate_bankrolls
+
+
+def log_steps(p, odd, kelly_fraction):
+    log_win, log_loss = kelly_log_returns(p, np.array([odd]), kelly_fraction)
+    return float(log_win[0]), -float(log_loss[0])
+
+
+def enumerate_paths(p, a, c, n):
+    """Todos os 2^n caminhos em log-bankroll (com o inicial) e a probabilidade de cada um."""
+    won = (np.arange(2 ** n)[:, None] >> np.arange(n)[None, :]) & 1
+    paths = np.zeros((2 ** n, n + 1))
+    np.cumsum(np.where(won == 1, a, -c), axis=1, out=paths[:, 1:])
+    w = won.sum(axis=1)
+    return paths, p ** w * (1 - p) ** (n - w)
+
+
+@pytest.mark.parametrize("p,odd,kelly,n", [(0.81, 1.30, 0.33, 14), (0.55, 2.10, 1.0, 13), (0.40, 3.20, 0.5, 12)])
+def test_matches_path_enumeration(p, odd, kelly, n):
+    ex = exact_fixed_odds(p, odd, kelly, 100.0, n)
+    a, c = log_steps(p, odd, kelly)
+    paths, prob = enumerate_paths(p, a, c, n)
+    inner = LEVELS_PCT[1:-1]
+
+    dd = max_drawdown_pct(paths)
+    want_dd = ((dd[None, :] >= inner[:, None]) * prob).sum(axis=1)
+    np.testing.assert_allclose(ex["dd_sf"][1:-1], want_dd, atol=1e-12)
+
+    low = paths.min(axis=1)
+    want_ruin = ((low[None, :] <= np.log1p(-inner / 100.0)[:, None]) * prob).sum(axis=1)
+    np.testing.assert_allclose(ex["ruin_sf"][1:-1], want_ruin, atol=1e-12)
+
+    # bankroll final por nº de vitórias (ex["final"][w], ex["pmf"][w])
+    wins = np.round((paths[:, -1] + n * c) / (a + c)).astype(int)
+    np.testing.assert_allclose(ex["pmf"], np.bincount(wins, weights=prob, minlength=n + 1), atol=1e-14)
+    np.testing.assert_allclose(ex["final"][wins], 100.0 * np.exp(paths[:, -1]), rtol=1e-12)
+
+
+def monte_carlo_dd_sf(p, odd, kelly, n, sims, seed=0):
+    sim = simulate_bankrolls(p, np.array([odd]), np.array([1.0]), kelly, 1.0, sims, n, seed=seed)
+    return (sim["max_drawdown"][None, :] >= LEVELS_PCT[1:-1, None]).mean(axis=1)
+
+
+# n = 1000 é o máximo de "Número de Apostas" no teste.py; (0.34, 3, 0.1) e Kelly 0.01 são
+# os cantos (edge ~0 / c pequeno) em que a DP antiga por aposta passava de dezenas de milhões de células
+@pytest.mark.parametrize("p,odd,kelly,n", [(0.81, 1.30, 0.33, 300), (0.81, 1.30, 0.33, 1000),
+                                           (0.34, 3.0, 0.1, 1000), (0.81, 1.30, 0.01, 1000)])
+def test_matches_monte_carlo_long_horizon(p, odd, kelly, n):
+    """DP contra 20k caminhos com semente fixa (tolerância ~ 5 erros-padrão)."""
+    sims = 20_000
+    ex = exact_fixed_odds(p, odd, kelly, 100.0, n)
+    sf = ex["dd_sf"][1:-1]
+    assert np.all(np.diff(ex["dd_sf"]) <= 1e-12)
+    tol = 5 * np.sqrt(sf * (1 - sf) / sims) + 1e-3
+    assert (np.abs(sf - monte_carlo_dd_sf(p, odd, kelly, n, sims)) <= tol).all()
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""Monte Carlo em blocos: reprodutibilidade entre nº de processos e faixas do histograma."""
+
+import numpy as np
+import pytest
+
+import bankroll_montecarlo as bm
+
+ODDS = np.array([1.25, 1.40, 1.70])
+PROBS = np.array([0.5, 0.3, 0.2])
+
+
+@pytest.mark.parametrize("paths", [True, False])
+def test_same_seed_same_result_for_any_worker_count(paths):
+    # max_cells pequeno: 40 blocos de 50 simulações -> pool com fatias de vários blocos
+    kw = dict(seed=123, max_cells=50 * 120, paths=paths, quantile_grid=np.array([1.0, 50.0, 99.0]) if paths else None)
+    seq = bm.simulate_bankrolls(0.7, ODDS, PROBS, 0.33, 100.0, 2000, 120, workers=1, **kw)
+    par = bm.simulate_bankrolls(0.7, ODDS, PROBS, 0.33, 100.0, 2000, 120, workers=2, **kw)
+    assert seq.keys() == par.keys()
+    for k in seq:
+        np.testing.assert_array_equal(seq[k], par[k])
+
+
+def test_pool_is_reused_between_calls():
+    kw = dict(seed=1, max_cells=50 * 60, paths=False, workers=2)
+    bm.simulate_bankrolls(0.7, ODDS, PROBS, 0.33, 100.0, 500, 60, **kw)
+    pool = bm._POOL
+    bm.simulate_bankrolls(0.7, ODDS, PROBS, 0.33, 100.0, 500, 60, **kw)
+    assert pool is not None and bm._POOL is pool
+
+
+def block_paths(seed, n_sims, n_bets, max_cells, kelly=0.33):
+    """Os mesmos caminhos (em log, bankroll 1) que simulate_bankrolls gera bloco a bloco."""
+    log_win, log_loss = bm.kelly_log_returns(0.7, ODDS, kelly)
+    rows = max(1, max_cells // n_bets)
+    n_blocks = -(-n_sims // rows)
+    task = {"p": 0.7, "log_win": log_win, "log_loss": log_loss, "odds_probs": PROBS,
+            "log_b0": 0.0, "n_bets": n_bets, "paths": True}
+    return [bm._simulate_block(np.random.default_rng(ss), task, min(rows, n_sims - b * rows))[1]
+            for b, ss in enumerate(np.random.SeedSequence(seed).spawn(n_blocks))]
+
+
+@pytest.mark.parametrize("seed", [5, 6])
+def test_multi_block_quantiles_within_a_bin(seed):
+    """Grade da projeção (caudas incluídas): histograma de vários blocos vs np.percentile de todos os caminhos."""
+    n_sims, n_bets, max_cells, n_bins = 2000, 120, 50 * 120, 256
+    qs = np.array([0.0, 0.05, 1.0, 25.0, 50.0, 75.0, 99.0, 99.95, 100.0])
+    sim = bm.simulate_bankrolls(0.7, ODDS, PROBS, 0.33, 1.0, n_sims, n_bets, seed=seed,
+                                max_cells=max_cells, n_bins=n_bins, quantile_grid=qs)
+    blocks = block_paths(seed, n_sims, n_bets, max_cells)
+    paths = np.vstack(blocks)
+    got = np.log(sim["quantiles"])
+    # "inverted_cdf": a amostra em que a CDF empírica atinge q — a que o histograma localiza
+    ref = np.percentile(paths, qs, axis=0, method="inverted_cdf").T
+
+    # extremos exatos (antes presos na borda da faixa do 1º bloco)
+    np.testing.assert_allclose(got[:, 0], paths.min(axis=0), rtol=0, atol=1e-12)
+    np.testing.assert_allclose(got[:, -1], paths.max(axis=0), rtol=0, atol=1e-12)
+    # dentro da faixa do histograma: no máximo um bin de distância
+    hist = bm._StepHistogram.from_block(blocks[0], n_bins)
+    lo, hi, bw = hist.lo[:, None], (hist.lo + hist.width)[:, None], (hist.width / n_bins)[:, None]
+    inside = (ref >= lo) & (ref <= hi)
+    assert inside[:, 2:-2].all()
+    assert (np.abs(got - ref)[inside] <= (bw * (1 + 1e-9) + np.zeros_like(got))[inside]).all()
+    # fora dela: entre a borda e o extremo exato, sem cruzar quantis
+    assert (got >= paths.min(axis=0)[:, None] - 1e-12).all() and (got <= paths.max(axis=0)[:, None] + 1e-12).all()
+    assert (np.diff(got, axis=1) >= -1e-12).all()
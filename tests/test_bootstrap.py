@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""Drawdown do block bootstrap (resumos por bloco) contra o caminho reamostrado montado aposta a aposta."""
+
+import numpy as np
+import pytest
+
+from bootstrap import _max_drawdown, _path_blocks, block_bootstrap
+
+
+def naive_drawdown(steps, blocks, order):
+    """Concatena os passos dos blocos na ordem sorteada e mede a maior queda desde o pico (início = 0)."""
+    path = np.concatenate([[0.0], np.cumsum(np.concatenate([steps[blocks == b] for b in order]))])
+    return float((np.maximum.accumulate(path) - path).max())
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_block_summaries_match_naive_path(seed):
+    rng = np.random.default_rng(seed)
+    n_blocks = 12
+    blocks = np.sort(rng.choice(n_blocks - 2, size=400))  # os 2 últimos blocos ficam sem apostas
+    steps = rng.normal(0.002, 0.03, size=len(blocks))
+    path = _path_blocks(blocks, steps, n_blocks)
+    idx = rng.integers(0, n_blocks, size=(200, n_blocks))
+    got = _max_drawdown(path, idx)
+    want = [naive_drawdown(steps, blocks, order) for order in idx]
+    np.testing.assert_allclose(got, want, rtol=1e-12, atol=1e-12)
+
+
+def test_point_estimates_match_bankroll_path():
+    rng = np.random.default_rng(5)
+    n_bets, bankroll0 = 500, 100.0
+    stake = rng.uniform(0.5, 3.0, n_bets)
+    pnl = np.where(rng.random(n_bets) < 0.52, stake * 0.95, -stake)
+    bet_blocks = np.sort(rng.integers(0, 20, n_bets))
+    row_blocks = np.arange(20)
+    ci = block_bootstrap(row_blocks, {}, bet_blocks, stake, pnl, bankroll0=bankroll0, n_resamples=200)
+
+    bank = np.concatenate([[bankroll0], bankroll0 + np.cumsum(pnl)])
+    assert ci["max_drawdown"]["point"] == pytest.approx((1 - bank / np.maximum.accumulate(bank)).max(), rel=1e-12)
+    assert ci["roi"]["point"] == pytest.approx(bank[-1] / bankroll0 - 1, rel=1e-12)
+    assert ci["yield"]["point"] == pytest.approx(pnl.sum() / stake.sum(), rel=1e-12)
+    for k in ("max_drawdown", "roi", "yield"):
+        assert ci[k]["lo"] <= ci[k]["hi"]
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""Calibração por bincount (calibration_bins, CalibrationAccumulator) contra o laço/groupby antigos."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import hybrid_closing_sindicato as hc
+from calibration import NO_ODDS, CalibrationAccumulator, bin_index, odds_band_names
+
+
+def loop_calibration_bins(y_true01, p_pred, n_bins=10):
+    """Versão anterior ao user-017: uma máscara por bin."""
+    idx = np.clip(np.digitize(p_pred, np.linspace(0, 1, n_bins + 1)) - 1, 0, n_bins - 1)
+    rows = []
+    for b in range(n_bins):
+        m = idx == b
+        if m.sum() == 0:
+            rows.append({"bin": b, "count": 0, "p_mean": np.nan, "y_rate": np.nan})
+        else:
+            rows.append({"bin": b, "count": int(m.sum()), "p_mean": float(p_pred[m].mean()),
+                         "y_rate": float(y_true01[m].mean())})
+    return pd.DataFrame(rows)
+
+
+def test_calibration_bins_matches_loop():
+    rng = np.random.default_rng(0)
+    p = np.concatenate([rng.beta(2, 3, 5000), [0.0, 1.0]])  # bordas incluídas; bins altos vazios
+    y = (rng.random(len(p)) < p).astype(int)
+    got, want = hc.calibration_bins(y, p), loop_calibration_bins(y, p)
+    np.testing.assert_array_equal(got["count"].to_numpy(), want["count"].to_numpy())
+    np.testing.assert_allclose(got["p_mean"].to_numpy(), want["p_mean"].to_numpy(), rtol=1e-12)
+    np.testing.assert_allclose(got["y_rate"].to_numpy(), want["y_rate"].to_numpy(), rtol=1e-12)
+
+
+def groupby_tables(y, p, groups, targets, n_bins):
+    """Referência: DataFrame longo (linha x alvo) e groupby por (recorte, grupo, alvo, bin)."""
+    n, T = y.shape
+    long = []
+    for name, g in groups.items():
+        g = np.broadcast_to(np.asarray(g, dtype=object).reshape(n, -1), (n, T))
+        long.append(pd.DataFrame({"breakdown": name, "group": g.ravel(), "target": np.tile(targets, n),
+                                  "p": p.ravel(), "y": y.ravel().astype(float)}))
+    long = pd.concat(long, ignore_index=True)
+    long["bin"] = bin_index(long["p"].to_numpy(), n_bins)
+    rel = (long.groupby(["breakdown", "group", "target", "bin"])
+           .agg(count=("p", "size"), p_mean=("p", "mean"), y_rate=("y", "mean")).reset_index())
+    rel["gap"] = rel["count"] * (rel["p_mean"] - rel["y_rate"]).abs()
+    summ = (long.groupby(["breakdown", "group", "target"])
+            .agg(count=("p", "size"), p_mean=("p", "mean"), y_rate=("y", "mean"),
+                 sharpness=("p", lambda v: v.var(ddof=0))).reset_index())
+    ece = rel.groupby(["breakdown", "group", "target"])["gap"].sum().reset_index(name="ece")
+    summ = summ.merge(ece, on=["breakdown", "group", "target"])
+    summ["ece"] /= summ["count"]
+    return rel.drop(columns="gap"), summ
+
+
+@pytest.mark.parametrize("chunk_rows", [97, 250_000])
+def test_accumulator_matches_groupby(chunk_rows):
+    rng = np.random.default_rng(1)
+    n, targets, bands = 3000, ["Over", "Under"], [1.7, 2.1]
+    p_over = rng.uniform(0.2, 0.8, n)
+    p = np.column_stack([p_over, 1 - p_over])
+    y_over = (rng.random(n) < p_over).astype(int)
+    y = np.column_stack([y_over, 1 - y_over])
+    odds = 1.0 / (p * 1.05)
+    odds[rng.random(n) < 0.05, 0] = np.nan  # odd ausente -> grupo "sem odd", não a última faixa
+    fold = np.repeat(np.arange(1, 7), n // 6)  # folds novos aparecem em chunks posteriores
+
+    acc = CalibrationAccumulator(targets, n_bins=10, odds_bands=bands, chunk_rows=chunk_rows)
+    acc.add(y, {"mod": p}, odds=odds, groups={"fold": fold})
+    rel, summ = acc.tables()
+
+    names = np.array(odds_band_names(bands) + [NO_ODDS], dtype=object)
+    band = np.where(np.isfinite(odds), np.digitize(odds, bands), len(bands) + 1)
+    ref_rel, ref_summ = groupby_tables(y, p, {"all": np.full(n, "all"), "odds_band": names[band],
+                                              "fold": fold.astype(str)}, targets, 10)
+    key = ["breakdown", "group", "target", "bin"]
+    got = rel[rel["source"] == "mod"].astype({"group": str}).sort_values(key).reset_index(drop=True)
+    want = ref_rel.astype({"group": str}).sort_values(key).reset_index(drop=True)
+    pd.testing.assert_frame_equal(got[key + ["count", "p_mean", "y_rate"]], want[key + ["count", "p_mean", "y_rate"]],
+                                  check_dtype=False, rtol=1e-10)
+    key = key[:-1]
+    got = summ[summ["source"] == "mod"].astype({"group": str}).sort_values(key).reset_index(drop=True)
+    want = ref_summ.astype({"group": str}).sort_values(key).reset_index(drop=True)
+    cols = key + ["count", "p_mean", "y_rate", "ece", "sharpness"]
+    pd.testing.assert_frame_equal(got[cols], want[cols], check_dtype=False, rtol=1e-9, atol=1e-12)
+    assert NO_ODDS in set(got["group"])
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""--data-cache: chave por ETag (HEAD), download só quando a chave muda, e --calib-by com espaços."""
+
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+import pytest
+
+import hybrid_closing_sindicato as hc
+
+CSV_A = b"Date,League,Odd_H,Odd_D,Odd_A\n2020-01-01,E0,2.1,3.3,3.6\n2020-01-02,D1,1.8,3.6,4.5\n"
+CSV_B = CSV_A + b"2020-01-03,I1,2.5,3.1,2.9\n"
+
+
+@pytest.fixture
+def origin():
+    """Servidor local com ETag/corpo trocáveis; conta os GETs (downloads)."""
+    state = {"etag": '"v1"', "body": CSV_A, "head_ok": True, "gets": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        def _headers(self):
+            self.send_response(200)
+            self.send_header("ETag", state["etag"])
+            self.send_header("Content-Type", "text/csv")
+            self.send_header("Content-Length", str(len(state["body"])))
+            self.end_headers()
+
+        def do_HEAD(self):
+            if not state["head_ok"]:
+                self.send_error(405)
+                return
+            self._headers()
+
+        def do_GET(self):
+            state["gets"] += 1
+            self._headers()
+            self.wfile.write(state["body"])
+
+        def log_message(self, *a):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    state["url"] = "http://127.0.0.1:%d/jogos.csv" % httpd.server_address[1]
+    yield state
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_etag_hit_skips_download(origin, tmp_path):
+    path = hc.cached_dataset(origin["url"], None, str(tmp_path))
+    assert origin["gets"] == 1
+    assert len(pd.read_parquet(path)) == 2
+    assert hc.cached_dataset(origin["url"], None, str(tmp_path)) == path
+    assert origin["gets"] == 1   # só o HEAD
+
+
+def test_changed_etag_refreshes(origin, tmp_path):
+    old = hc.cached_dataset(origin["url"], None, str(tmp_path))
+    origin["etag"], origin["body"] = '"v2"', CSV_B
+    new = hc.cached_dataset(origin["url"], None, str(tmp_path))
+    assert new != old and origin["gets"] == 2
+    assert len(pd.read_parquet(new)) == 3
+    assert len(pd.read_parquet(old)) == 2
+
+
+def test_failed_head_keys_by_content(origin, tmp_path):
+    origin["head_ok"] = False
+    first = hc.cached_dataset(origin["url"], None, str(tmp_path))
+    # sem HEAD é preciso baixar para chavear, mas o mesmo conteúdo cai no mesmo parquet
+    assert hc.cached_dataset(origin["url"], None, str(tmp_path)) == first
+    assert origin["gets"] == 2
+    origin["body"] = CSV_B
+    other = hc.cached_dataset(origin["url"], None, str(tmp_path))
+    assert other != first and len(pd.read_parquet(other)) == 3
+
+
+def test_calib_by_columns_strips():
+    args = argparse.Namespace(calib_by=" League , Season,, ")
+    assert hc.calib_by_columns(args) == ["League", "Season"]
+    assert hc.calib_by_columns(argparse.Namespace(calib_by=None)) == []
+
+
+def test_cached_columns_with_spaced_calib_by(origin, tmp_path):
+    path = hc.cached_dataset(origin["url"], None, str(tmp_path))
+    wanted = ["Odd_H"] + hc.calib_by_columns(argparse.Namespace(calib_by=" League"))
+    assert list(hc.read_cached_columns(path, wanted).columns) == ["League", "Odd_H"]
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""De-vig vetorizado (Newton em arrays) contra a solução escalar linha a linha (brentq)."""
+
+import numpy as np
+import pytest
+from scipy.optimize import brentq
+
+from devig import odds_to_fair_probs
+
+
+def scalar_power(inv):
+    k = brentq(lambda k: (inv ** k).sum() - 1.0, 1e-6, 100.0, xtol=1e-14)
+    return inv ** k
+
+
+def scalar_odds_ratio(inv):
+    p = lambda c: inv / (c + inv * (1.0 - c))
+    c = brentq(lambda c: p(c).sum() - 1.0, 1e-6, 1e6, xtol=1e-14)
+    return p(c)
+
+
+def scalar_shin(inv):
+    q = inv ** 2 / inv.sum()
+    p = lambda z: (np.sqrt(z ** 2 + 4.0 * (1.0 - z) * q) - z) / (2.0 * (1.0 - z))
+    z = brentq(lambda z: p(z).sum() - 1.0, 0.0, 0.99, xtol=1e-14)
+    return p(z)
+
+
+SCALAR = {"power": scalar_power, "odds_ratio": scalar_odds_ratio, "shin": scalar_shin}
+
+
+def synthetic_odds(seed, n, k, margin):
+    rng = np.random.default_rng(seed)
+    p = rng.dirichlet(np.full(k, 2.0), size=n)
+    p = p[(p > 0.02).all(axis=1) & (p < 0.85).all(axis=1)]  # odds > 1 mesmo com a margem
+    return 1.0 / (p * rng.uniform(1.0 + margin / 2, 1.0 + margin, size=(len(p), 1)))
+
+
+@pytest.mark.parametrize("method", sorted(SCALAR))
+@pytest.mark.parametrize("k,margin", [(3, 0.05), (3, 0.15), (2, 0.06)])
+def test_matches_scalar(method, k, margin):
+    odds = synthetic_odds(11, 300, k, margin)
+    got = odds_to_fair_probs(odds, method=method)
+    want = np.array([SCALAR[method](1.0 / (row + 1e-12)) for row in odds])
+    np.testing.assert_allclose(got, want, atol=1e-9)
+    np.testing.assert_allclose(got.sum(axis=1), 1.0, atol=1e-9)
+
+
+@pytest.mark.parametrize("method", sorted(SCALAR))
+def test_nan_rows_stay_nan(method):
+    odds = synthetic_odds(12, 5, 3, 0.05)
+    odds[2, 1] = np.nan
+    got = odds_to_fair_probs(odds, method=method)
+    assert np.isnan(got[2]).all()
+    assert np.isfinite(np.delete(got, 2, axis=0)).all()
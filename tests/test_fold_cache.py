@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""--cache-dir: folds do cache idênticos aos calculados; chave sensível a params/dados; cache corrompido é refeito."""
+
+import os
+
+import numpy as np
+import pytest
+
+import hybrid_closing_sindicato as hc
+from closing_data import closing_data
+
+
+@pytest.fixture
+def fold(tmp_path):
+    df, data, params = closing_data(1600)
+    tr_idx, te_idx = hc.walk_forward_splits(df, min_train=1200, step=400)[0]
+    return tr_idx, te_idx, data, {**params, "cache_dir": str(tmp_path)}
+
+
+def cache_files(params):
+    return sorted(f for f in os.listdir(params["cache_dir"]) if f.endswith(".npz"))
+
+
+def assert_same_fold(a, b):
+    (ma, pa), (mb, pb) = a, b
+    assert {k: v for k, v in ma.items() if k != "_cached"} == {k: v for k, v in mb.items() if k != "_cached"}
+    assert pa.keys() == pb.keys()
+    for k in pa:
+        assert pa[k].dtype == pb[k].dtype, k
+        np.testing.assert_array_equal(pa[k], pb[k], err_msg=k)
+
+
+def test_second_run_is_bit_identical(fold):
+    tr_idx, te_idx, data, params = fold
+    first = hc.run_fold_cached(3, tr_idx, te_idx, data, params)
+    assert "_cached" not in first[0] and len(cache_files(params)) == 1
+    second = hc.run_fold_cached(3, tr_idx, te_idx, data, params)
+    assert second[0]["_cached"]
+    assert_same_fold(first, second)
+    # número do fold vem da chamada, não do arquivo
+    renum = hc.run_fold_cached(7, tr_idx, te_idx, data, params)
+    assert renum[0]["fold"] == 7 and (renum[1]["fold"] == 7).all()
+
+
+def test_key_tracks_params_and_data(fold):
+    tr_idx, te_idx, data, params = fold
+    key = hc.fold_cache_key(tr_idx, te_idx, data, params)
+    assert hc.fold_cache_key(tr_idx, te_idx, data, {**params, "cache_dir": "/outro", "profile": True}) == key
+    for change in ({"knn_sigma": 0.1}, {"alpha_method": "newton"}, {"logit_C": 0.5}, {"use_knn": True}):
+        assert hc.fold_cache_key(tr_idx, te_idx, data, {**params, **change}) != key, change
+    y = data["y_over01"].copy()
+    y[te_idx[-1]] ^= 1
+    assert hc.fold_cache_key(tr_idx, te_idx, {**data, "y_over01": y}, params) != key
+    X = data["X"].copy()
+    X[tr_idx[0], 0] += 1e-12
+    assert hc.fold_cache_key(tr_idx, te_idx, {**data, "X": X}, params) != key
+    assert hc.fold_cache_key(tr_idx[1:], te_idx, data, params) != key
+    # linhas fora do fold não entram na chave
+    X = data["X"].copy()
+    X[te_idx[-1]] = 0.0
+    assert hc.fold_cache_key(tr_idx, te_idx[:-1], {**data, "X": X}, params) == \
+        hc.fold_cache_key(tr_idx, te_idx[:-1], data, params)
+
+
+@pytest.mark.parametrize("damage", ["truncate", "garbage", "empty"])
+def test_corrupt_cache_is_recomputed(fold, damage):
+    tr_idx, te_idx, data, params = fold
+    first = hc.run_fold_cached(0, tr_idx, te_idx, data, params)
+    path = os.path.join(params["cache_dir"], cache_files(params)[0])
+    raw = open(path, "rb").read()
+    with open(path, "wb") as f:
+        f.write({"truncate": raw[:len(raw) // 2], "garbage": b"x" * 1000, "empty": b""}[damage])
+    again = hc.run_fold_cached(0, tr_idx, te_idx, data, params)
+    assert "_cached" not in again[0]
+    assert_same_fold(first, again)
+    # regravado: a próxima execução volta a ler do cache
+    assert hc.run_fold_cached(0, tr_idx, te_idx, data, params)[0]["_cached"]
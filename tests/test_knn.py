@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""KNN residual: uma consulta para todas as saídas e índice incremental contra um NearestNeighbors por fold."""
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.neighbors import NearestNeighbors
+
+import hybrid_closing_sindicato as hc
+from closing_data import closing_data
+
+
+def loop_knn_adjustment(X_train, resid_train, X_test, k=200, sigma=0.08):
+    """Versão anterior ao user-004: índice novo e kneighbors por saída."""
+    k = min(k, len(X_train))
+    if k <= 5:
+        return np.zeros(len(X_test))
+    nn = NearestNeighbors(n_neighbors=k, metric="euclidean")
+    nn.fit(X_train)
+    dist, idx = nn.kneighbors(X_test, return_distance=True)
+    w = np.exp(-(dist**2) / (2*(sigma**2)))
+    w = w / (w.sum(axis=1, keepdims=True) + 1e-12)
+    return (w * resid_train[idx]).sum(axis=1)
+
+
+@pytest.mark.parametrize("k,sigma", [(50, 0.08), (200, 0.03), (4, 0.08)])
+def test_shared_query_matches_per_output(k, sigma):
+    rng = np.random.default_rng(0)
+    X_tr, X_te = rng.random((1500, 5)), rng.random((300, 5))
+    resid = rng.normal(0, 0.3, (1500, 4))   # H, D, A, Over
+    got = hc.knn_residual_adjustment(X_tr, resid, X_te, k=k, sigma=sigma)
+    want = np.column_stack([loop_knn_adjustment(X_tr, resid[:, j], X_te, k, sigma) for j in range(4)])
+    np.testing.assert_array_equal(got, want)
+
+
+def test_growing_index_matches_fresh_index():
+    rng = np.random.default_rng(1)
+    X = rng.random((3000, 5))
+    X_te = rng.random((200, 5))
+    index = hc.GrowingKNNIndex(X)
+    for n in (300, 700, 800, 1900, 2000, 3000):   # fusões de blocos em vários pontos
+        index.extend(n)
+        assert sum(e - s for s, e, _ in index.blocks) == n
+        dist, idx = index.kneighbors(X_te, 100)
+        ref_dist, ref_idx = NearestNeighbors(n_neighbors=100).fit(X[:n]).kneighbors(X_te)
+        np.testing.assert_array_equal(idx, ref_idx)
+        np.testing.assert_allclose(dist, ref_dist, rtol=1e-12)
+    assert len(index.blocks) <= int(np.log2(3000)) + 1
+    assert index.kneighbors(X_te[:3], 5) is None
+
+
+def test_incremental_walk_forward_matches_rebuild():
+    df, data, params = closing_data(2400, seed=2, use_knn=True, knn_k=80)
+    splits = hc.walk_forward_splits(df, min_train=1200, step=400)
+    _, rebuilt = hc.run_walk_forward(splits, data, params)
+    _, grown = hc.run_walk_forward(splits, data, {**params, "knn_incremental": True})
+    a, b = rebuilt.to_frame(), grown.to_frame()
+    pd.testing.assert_frame_equal(a, b, check_exact=False, rtol=1e-12, atol=1e-12)
+    assert not np.allclose(a["pOver_mod"], hc.run_walk_forward(splits, data, {**params, "use_knn": False})[1]
+                           .to_frame()["pOver_mod"])
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""Liquidação O/U asiática (ou_unit_returns): linhas x.0 / x.25 / x.5 / x.75, dos dois lados da linha."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import hybrid_closing_sindicato as hc
+
+ODD_O, ODD_U = 1.90, 2.00   # ganho cheio: Over +0.90, Under +1.00
+
+# (linha, gols, retorno Over, retorno Under) por unidade apostada
+CASES = [
+    # inteira: empate na linha devolve a stake
+    (2.0, 1, -1.0, 1.00),
+    (2.0, 2, 0.0, 0.0),        # push
+    (2.0, 3, 0.90, -1.0),
+    (0.0, 0, 0.0, 0.0),        # push na linha 0
+    (0.0, 1, 0.90, -1.0),
+    # .25 = metade em x.0 + metade em x.5
+    (2.25, 1, -1.0, 1.00),
+    (2.25, 2, -0.5, 0.50),     # Over meia perda / Under meio ganho
+    (2.25, 3, 0.90, -1.0),
+    (0.25, 0, -0.5, 0.50),
+    # .5: sem empate possível
+    (2.5, 2, -1.0, 1.00),
+    (2.5, 3, 0.90, -1.0),
+    # .75 = metade em x.5 + metade em x+1.0
+    (2.75, 2, -1.0, 1.00),
+    (2.75, 3, 0.45, -0.5),     # Over meio ganho / Under meia perda
+    (2.75, 4, 0.90, -1.0),
+    (3.75, 4, 0.45, -0.5),
+]
+
+
+@pytest.mark.parametrize("line,goals,r_over,r_under", CASES)
+def test_scalar_line(line, goals, r_over, r_under):
+    got = hc.ou_unit_returns(np.array([goals], dtype=float), line, np.array([ODD_O]), np.array([ODD_U]))
+    np.testing.assert_allclose(got, [[r_over, r_under]], atol=1e-12)
+
+
+def test_per_game_lines():
+    """Uma linha por jogo (--ou-line-col): mesma tabela num único array."""
+    line, goals, r_over, r_under = map(np.array, zip(*CASES))
+    n = len(CASES)
+    got = hc.ou_unit_returns(goals.astype(float), line, np.full(n, ODD_O), np.full(n, ODD_U))
+    np.testing.assert_allclose(got, np.column_stack([r_over, r_under]), atol=1e-12)
+
+
+def test_flat_pnl_uses_asian_returns():
+    """Em simulate_bets o pnl flat é stake * retorno asiático (push = 0, meio ganho/meia perda)."""
+    line, goals, r_over, r_under = map(np.array, zip(*CASES))
+    n = len(CASES)
+    ret = hc.ou_unit_returns(goals.astype(float), line, np.full(n, ODD_O), np.full(n, ODD_U))
+    p_1x2 = np.full((n, 3), 1 / 3)
+    p_mkt = np.full(n, 0.5)
+    for p_mod, sel, want in ((0.6, "Over", r_over), (0.4, "Under", r_under)):
+        bets, _ = hc.simulate_bets(
+            pd.DataFrame(index=np.arange(n)), p_1x2, p_1x2, np.full((n, 3), np.nan), np.zeros(n, dtype=int),
+            p_mkt, np.full(n, p_mod), np.full(n, ODD_O), np.full(n, ODD_U), (goals > line).astype(int),
+            min_edge=0.05, stake_mode="flat", flat_stake=2.0, ou_returns=ret, markets=("OU",))
+        assert (bets["selection"] == sel).all() and len(bets) == n
+        np.testing.assert_allclose(bets["pnl"].to_numpy(), 2.0 * want, atol=1e-12)
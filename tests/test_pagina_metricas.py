@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""teste.py: métricas de exibição recalculadas dos arrays em cache e chave do cache só com o que muda a simulação."""
+
+import ast
+
+import numpy as np
+import pytest
+
+from pagina import page_functions, page_tree
+
+# entradas só de exibição: não podem entrar na chave das simulações em cache
+DISPLAY_ONLY = {"k_derrotas_input", "drawdown_limite_val", "target_growth_percentage",
+                "aposta_y_mini_sim", "quantia_x_mini_sim", "processos_val"}
+
+fn = page_functions("percentil", "fracao", "cdf_empirica")
+
+
+@pytest.fixture
+def weighted():
+    """Distribuição exata (valores crescentes + pesos) e as amostras equivalentes (cada valor repetido peso vezes)."""
+    rng = np.random.default_rng(0)
+    values = np.cumsum(rng.uniform(0.5, 3.0, 40))
+    counts = rng.integers(1, 30, 40)
+    return values, counts.astype(float), np.repeat(values, counts)
+
+
+@pytest.mark.parametrize("q", [0, 5, 25, 50, 75, 95, 100])
+def test_weighted_percentil_matches_samples(weighted, q):
+    values, w, samples = weighted
+    # amostra em que a CDF atinge q: o mesmo quantil do np.percentile "inverted_cdf"
+    assert fn["percentil"](values, q, w) == np.percentile(samples, q, method="inverted_cdf")
+    assert fn["percentil"](samples, q) == np.percentile(samples, q)
+
+
+@pytest.mark.parametrize("limite", [0.0, 10.0, 30.0, 1e9])
+def test_weighted_fracao_matches_samples(weighted, limite):
+    values, w, samples = weighted
+    assert fn["fracao"](values > limite, w) == pytest.approx(fn["fracao"](samples > limite))
+
+
+def test_weighted_cdf_matches_samples(weighted):
+    values, w, samples = weighted
+    order = np.random.default_rng(1).permutation(len(values))   # entrada fora de ordem
+    x, cdf = fn["cdf_empirica"](values[order], w[order])
+    xs, cdfs = fn["cdf_empirica"](samples)
+    np.testing.assert_array_equal(x, values)
+    # no último ponto de cada valor repetido, a CDF amostral é a ponderada
+    last = np.searchsorted(xs, values, side="right") - 1
+    np.testing.assert_allclose(cdf, cdfs[last], rtol=1e-12)
+
+
+def cached_functions(tree):
+    """Funções com @st.cache_data -> nomes dos parâmetros."""
+    return {n.name: [a.arg for a in n.args.args] for n in tree.body if isinstance(n, ast.FunctionDef)
+            and any("cache_data" in ast.unparse(d) for d in n.decorator_list)}
+
+
+def test_cache_keys_skip_display_inputs():
+    tree = page_tree()
+    cached = cached_functions(tree)
+    assert {"monte_carlo_em_cache", "exato_em_cache", "superficie_projecao"} <= set(cached)
+    for call in ast.walk(tree):
+        if isinstance(call, ast.Call) and isinstance(call.func, ast.Name) and call.func.id in cached:
+            # parâmetro "_x": fora da chave do st.cache_data
+            params = cached[call.func.id]
+            keyed = [a for name, a in zip(params, call.args) if not name.startswith("_")] + \
+                [k.value for k in call.keywords if not (k.arg or "").startswith("_")]
+            names = {n.id for a in keyed for n in ast.walk(a) if isinstance(n, ast.Name)}
+            assert not names & DISPLAY_ONLY, (call.func.id, names & DISPLAY_ONLY)
+    # os parâmetros guardados na sessão (o que exige "Executar Simulação" de novo) também não
+    params = [n for n in ast.walk(tree) if isinstance(n, ast.Assign)
+              and any(getattr(t, "id", None) == "parametros_simulacao" for t in n.targets)]
+    assert len(params) == 1
+    names = {n.id for n in ast.walk(params[0].value) if isinstance(n, ast.Name)}
+    assert "num_simulacoes_val" in names and not names & DISPLAY_ONLY
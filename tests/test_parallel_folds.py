@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""--jobs: folds em process pool dão a mesma saída da execução serial; estado encadeado exige --jobs 1."""
+
+import sys
+
+import pandas as pd
+import pytest
+
+import hybrid_closing_sindicato as hc
+from closing_data import closing_data
+
+
+@pytest.mark.parametrize("use_knn", [False, True])
+def test_jobs_match_serial(use_knn):
+    df, data, params = closing_data(2400, seed=5, use_knn=use_knn)
+    splits = hc.walk_forward_splits(df, min_train=1200, step=400)
+    serial_metrics, serial_store = hc.run_walk_forward(splits, data, params, jobs=1)
+    par_metrics, par_store = hc.run_walk_forward(splits, data, params, jobs=2)
+    pd.testing.assert_frame_equal(pd.DataFrame(par_metrics), pd.DataFrame(serial_metrics), check_exact=True)
+    pd.testing.assert_frame_equal(par_store.to_frame(), serial_store.to_frame(), check_exact=True)
+
+
+def test_chained_state_refuses_jobs():
+    df, data, params = closing_data(1600, warm_start=True)
+    tasks = [(f, tr, te, None) for f, (tr, te) in enumerate(hc.walk_forward_splits(df, 800, 400), start=1)]
+    with pytest.raises(ValueError, match="--jobs 1"):
+        hc.run_fold_tasks(tasks, data, params, jobs=2)
+
+
+@pytest.mark.parametrize("flag", ["--warm-start", "--knn-incremental"])
+def test_main_rejects_chained_state_with_jobs(monkeypatch, tmp_path, capsys, flag):
+    monkeypatch.setattr(sys, "argv", ["hybrid_closing_sindicato.py", "--data-url", str(tmp_path / "nada.csv"),
+                                      "--outdir", str(tmp_path), "--jobs", "2", flag])
+    with pytest.raises(SystemExit) as exc:
+        hc.main()
+    assert exc.value.code == 2
+    assert "--jobs" in capsys.readouterr().err
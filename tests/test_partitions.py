@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""--partition-by: um modelo por partição com treino suficiente, o global para o resto."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import hybrid_closing_sindicato as hc
+from closing_data import closing_data
+
+MIN_ROWS = 150
+
+
+@pytest.fixture(scope="module")
+def league_data():
+    df, data, params = closing_data(2400, seed=4)
+    part, names = pd.factorize(df["League"].astype(str), sort=True)
+    splits = hc.walk_forward_splits(df, min_train=1200, step=600)
+    return df, data, params, part.astype(np.int64), list(names), splits
+
+
+def test_tasks_cover_each_test_row_once(league_data):
+    _, _, _, part, names, splits = league_data
+    tasks = hc.partition_tasks(splits, part, names, MIN_ROWS)
+    for fold, (tr_idx, te_idx) in enumerate(splits, start=1):
+        mine = [t for t in tasks if t[0] == fold]
+        covered = np.concatenate([te for _, _, te, _ in mine])
+        assert np.array_equal(np.sort(covered), te_idx)
+        counts = np.bincount(part[tr_idx], minlength=len(names))
+        groups = {g for *_, g in mine}
+        assert None in groups and 0 < len(groups) - 1 < len(names)   # há partições próprias e fallback
+        for _, tr, te, group in mine:
+            if group is None:
+                assert np.array_equal(tr, tr_idx) and (counts[part[te]] < MIN_ROWS).all()
+            else:
+                p = names.index(group)
+                assert counts[p] >= MIN_ROWS
+                assert (part[tr] == p).all() and len(tr) == counts[p] and (part[te] == p).all()
+
+
+def test_partition_predictions_match_direct_folds(league_data):
+    _, data, params, part, names, splits = league_data
+    _, store, part_metrics = hc.run_walk_forward_partitioned(splits, data, params, part, names, MIN_ROWS)
+    _, global_store = hc.run_walk_forward(splits, data, params)
+    pred, glob = store.to_frame().set_index("row"), global_store.to_frame().set_index("row")
+    cols = ["pH_mod", "pD_mod", "pA_mod", "pOver_mod"]
+    for fold, tr, te, group in hc.partition_tasks(splits, part, names, MIN_ROWS):
+        if group is None:
+            # fallback: mesmo modelo global do fold (o treino não depende das linhas de teste)
+            np.testing.assert_array_equal(pred.loc[te, cols].values, glob.loc[te, cols].values)
+        else:
+            _, direct = hc.run_fold(fold, tr, te, data, params)
+            np.testing.assert_array_equal(pred.loc[te, cols].values,
+                                          np.column_stack([direct[c] for c in cols]))
+    assert {m["partition"] for m in part_metrics} - {"(global)"} <= set(names)
+
+
+def test_large_min_rows_is_the_global_run(league_data):
+    _, data, params, part, names, splits = league_data
+    metrics, store, _ = hc.run_walk_forward_partitioned(splits, data, params, part, names, min_rows=10**9)
+    g_metrics, g_store = hc.run_walk_forward(splits, data, params)
+    pd.testing.assert_frame_equal(store.to_frame(), g_store.to_frame())
+    got = pd.DataFrame(metrics).drop(columns="partitions_fitted")
+    pd.testing.assert_frame_equal(got, pd.DataFrame(g_metrics)[got.columns], check_exact=False, rtol=1e-12)
+
+
+def test_partitions_in_parallel_match_serial(league_data):
+    _, data, params, part, names, splits = league_data
+    serial = hc.run_walk_forward_partitioned(splits, data, params, part, names, MIN_ROWS, jobs=1)
+    par = hc.run_walk_forward_partitioned(splits, data, params, part, names, MIN_ROWS, jobs=2)
+    pd.testing.assert_frame_equal(par[1].to_frame(), serial[1].to_frame(), check_exact=True)
+    pd.testing.assert_frame_equal(pd.DataFrame(par[2]), pd.DataFrame(serial[2]), check_exact=True)
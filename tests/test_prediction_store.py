@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""PredictionStore contra a lista de dicts por linha (antes do user-018) e ida e volta do artefato."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import hybrid_closing_sindicato as hc
+
+LINES = ["1.5", "3.5"]
+
+
+def fake_fold(rng, fold, rows, ou_lines):
+    preds = {"row": rows, "fold": np.full(len(rows), fold, dtype=np.int64)}
+    for k, dt in hc.pred_columns(ou_lines).items():
+        if k in preds:
+            continue
+        preds[k] = rng.integers(0, 3, len(rows)) if dt is np.int64 else rng.random(len(rows))
+    return preds
+
+
+@pytest.fixture
+def folds():
+    rng = np.random.default_rng(0)
+    cuts = [(500, 800), (800, 1100), (1100, 1250)]
+    return [fake_fold(rng, f, np.arange(a, b), LINES) for f, (a, b) in enumerate(cuts, start=1)]
+
+
+def test_matches_row_dicts(folds):
+    store = hc.PredictionStore(1300, LINES)
+    all_rows = []
+    for preds in reversed(folds):   # ordem de chegada qualquer (ex: pool)
+        store.write(preds)
+        all_rows += [{k: v[i] for k, v in preds.items()} for i in range(len(preds["row"]))]
+    want = pd.DataFrame(all_rows).sort_values("row").reset_index(drop=True)
+    want = want[list(hc.pred_columns(LINES))].astype(hc.pred_columns(LINES))
+    got = store.to_frame()
+    pd.testing.assert_frame_equal(got, want)
+    assert list(got.columns) == list(hc.pred_columns(LINES))
+    np.testing.assert_array_equal(store.rows(), np.arange(500, 1250))
+    sub = store.columns_at(np.arange(800, 810))
+    np.testing.assert_array_equal(sub["pOver_mod_3.5"], folds[1]["pOver_mod_3.5"][:10])
+
+
+@pytest.mark.parametrize("fmt", ["parquet", "npz"])
+def test_artefact_round_trip(folds, tmp_path, fmt):
+    store = hc.PredictionStore(1300, LINES)
+    for preds in folds:
+        store.write(preds)
+    pred_df = store.to_frame()
+    files = hc.write_predictions(pred_df, str(tmp_path), fmt=fmt, csv=True)
+    assert files == [f"predictions_walkforward.{fmt}", "predictions_walkforward.csv"]
+    pd.testing.assert_frame_equal(hc.read_predictions(str(tmp_path / files[0])), pred_df)
+    # CSV: o parser rápido do pandas lê ~15 dígitos significativos
+    pd.testing.assert_frame_equal(hc.read_predictions(str(tmp_path / files[1])), pred_df,
+                                  check_exact=False, rtol=1e-12, atol=0)
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""Projeção Futura Condicional: tabela de fatores de crescimento por nº de apostas restantes e consulta (Y, X) reescalada."""
+
+import numpy as np
+import pytest
+from scipy.stats import binom
+
+from bankroll_exact import growth_quantiles
+from bankroll_montecarlo import kelly_log_returns, odds_table, simulate_bankrolls
+from pagina import page_functions
+
+P, ODD, KELLY, N = 0.7, 1.6, 0.5, 60
+
+fn = page_functions("arange_inclusivo", "superficie_projecao", "mini_simulacao_condicional",
+                    growth_quantiles=growth_quantiles, odds_table=odds_table,
+                    simulate_bankrolls=simulate_bankrolls, PONTOS_PROJECAO=1001)
+
+
+def log_steps():
+    log_win, log_loss = kelly_log_returns(P, np.array([ODD]), KELLY)
+    return float(log_win[0]), -float(log_loss[0])
+
+
+@pytest.fixture(scope="module")
+def superficie():
+    return fn["superficie_projecao"](N, P, ODD, [], KELLY, 0)
+
+
+def test_query_is_x_times_the_table(superficie):
+    assert superficie.shape == (N + 1, 1001)
+    np.testing.assert_array_equal(superficie[0], 1.0)   # 0 apostas restantes: fator 1
+    for y, x in [(0, 100.0), (10, 250.0), (45, 37.5)]:
+        _, _, bankrolls = fn["mini_simulacao_condicional"](superficie, 100.0, x, y)
+        np.testing.assert_array_equal(bankrolls, x * superficie[N - y])
+    # mudar X só reescala: as chances relativas a X não mudam
+    a = fn["mini_simulacao_condicional"](superficie, 100.0, 10.0, 20)
+    b = fn["mini_simulacao_condicional"](superficie, 100.0, 1000.0, 20)
+    assert a[0] == b[0]
+    np.testing.assert_allclose(b[2], 100 * a[2], rtol=1e-15)
+
+
+@pytest.mark.parametrize("y", [0, 15, 40, 55])
+def test_chance_matches_binomial(superficie, y):
+    """Odd fixa: terminar acima de X <=> W vitórias em r apostas com W * a > (r - W) * c."""
+    a, c = log_steps()
+    r = N - y
+    want = binom.sf(np.floor(r * c / (a + c)), r, P) * 100
+    chance_x, _, _ = fn["mini_simulacao_condicional"](superficie, 100.0, 100.0, y)
+    assert chance_x == pytest.approx(want, abs=0.2)   # 1001 pontos: resolução de ~0,1%
+
+
+@pytest.mark.parametrize("y", [N, N + 5])
+def test_no_bets_left(superficie, y):
+    assert fn["mini_simulacao_condicional"](superficie, 100.0, 100.0, y) == (None, None, None)
+    assert fn["mini_simulacao_condicional"](None, 100.0, 100.0, 0) == (None, None, None)
+
+
+def test_simulated_table_matches_exact():
+    """Distribuição com uma odd só (ramo simulado) contra a tabela exata, em nº de vitórias equivalentes."""
+    sim = fn["superficie_projecao"](N, P, None, [(100, ODD, ODD, 0.01)], KELLY, 20000, 3)
+    exact = fn["superficie_projecao"](N, P, ODD, [], KELLY, 0)
+    assert sim.shape == exact.shape
+    a, c = log_steps()
+    r = np.arange(N + 1)[:, None]
+    mid = slice(100, 901)                                # níveis 0,1 a 0,9
+    w_sim = (np.log(sim[:, mid]) + r * c) / (a + c)      # vitórias equivalentes
+    w_exact = (np.log(exact[:, mid]) + r * c) / (a + c)
+    err = np.abs(w_sim - w_exact)
+    # histograma interpola entre degraus da rede de vitórias; ruído de 20000 caminhos
+    assert err.max() <= 1.5 and err.mean() <= 0.25
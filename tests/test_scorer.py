@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""--mode fit -> HybridScorer -> score/POST contra o fold do backtest com o mesmo treino."""
+
+import json
+import sys
+import threading
+import urllib.error
+import urllib.request
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import hybrid_closing_sindicato as hc
+from synthetic_closing import generate_closing
+
+N_TRAIN, N_NEW = 1200, 300
+BET_COLS = ["idx", "market", "selection", "odds", "stake"]
+
+
+def run_main(monkeypatch, *argv):
+    monkeypatch.setattr(sys, "argv", ["hybrid_closing_sindicato.py", *map(str, argv)])
+    hc.main()
+
+
+@pytest.fixture(scope="module")
+def fitted(tmp_path_factory):
+    tmp = tmp_path_factory.mktemp("scorer")
+    # uma data por jogo: a ordenação por data do script não reordena as linhas
+    df = generate_closing(N_TRAIN + N_NEW, seed=7, games_per_day=1)
+    df.iloc[:N_TRAIN].to_csv(tmp / "hist.csv", index=False)
+    df.to_csv(tmp / "all.csv", index=False)
+    mp = pytest.MonkeyPatch()
+    try:
+        common = ["--use-knn", "--knn-k", 50, "--min-edge", 0.01, "--max-bets-per-game", 2,
+                  "--stake-mode", "flat"]
+        run_main(mp, "--mode", "fit", "--data-url", tmp / "hist.csv", "--outdir", tmp / "fit",
+                 "--model", tmp / "model.joblib", *common)
+        # um único fold: treino = as mesmas N_TRAIN linhas do fit, teste = os jogos novos
+        run_main(mp, "--data-url", tmp / "all.csv", "--min-train", N_TRAIN, "--step", N_NEW,
+                 "--outdir", tmp / "bt", "--pred-csv", *common)
+    finally:
+        mp.undo()
+    return tmp, df.iloc[N_TRAIN:]
+
+
+def test_score_matches_backtest_fold(fitted):
+    tmp, new = fitted
+    scorer = hc.HybridScorer.load(str(tmp / "model.joblib"))
+    assert scorer.bundle["knn"] is not None
+    preds, bets = scorer.score(new)
+
+    wf = pd.read_csv(tmp / "bt" / "predictions_walkforward.csv")
+    assert (wf["row"].values == new.index.values).all()
+    for col in ("pH_mkt", "pD_mkt", "pA_mkt", "pH_mod", "pD_mod", "pA_mod", "pOver_mkt", "pOver_mod"):
+        np.testing.assert_allclose(preds[col].values, wf[col].values, rtol=0, atol=1e-12, err_msg=col)
+
+    # stake flat: a seleção de simulate_bets não depende da ordem de liquidação
+    sim = pd.read_csv(tmp / "bt" / "bets_simulated.csv")
+    assert len(bets) > 0
+    pd.testing.assert_frame_equal(bets[BET_COLS].reset_index(drop=True), sim[BET_COLS],
+                                  check_dtype=False, rtol=1e-12)
+
+
+def test_scorer_keeps_bundle(fitted):
+    import joblib
+    tmp, _ = fitted
+    bundle = joblib.load(tmp / "model.joblib")
+    n_jobs = bundle["knn"]["index"].n_jobs
+    scorer = hc.HybridScorer(bundle)
+    assert bundle["knn"]["index"].n_jobs == n_jobs
+    assert scorer.knn_index.n_jobs == -1
+
+
+def post(url, body):
+    data = body if isinstance(body, bytes) else json.dumps(body).encode("utf-8")
+    req = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(req, timeout=30) as resp:
+            return resp.status, json.loads(resp.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_http_score(fitted):
+    tmp, new = fitted
+    scorer = hc.HybridScorer.load(str(tmp / "model.joblib"))
+    httpd = hc.make_server(scorer, "127.0.0.1", 0)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    try:
+        url = "http://127.0.0.1:%d/score" % httpd.server_address[1]
+        rows = json.loads(new.head(40).to_json(orient="records", date_format="iso"))
+        code, out = post(url, {"rows": rows, "bankroll": 250})
+        assert code == 200
+        preds, bets = scorer.score(new.head(40).reset_index(drop=True), bankroll=250)
+        np.testing.assert_allclose([r["pOver_mod"] for r in out["predictions"]], preds["pOver_mod"].values)
+        assert [b["selection"] for b in out["bets"]] == list(bets["selection"])
+
+        for body in ("texto", 3, {"rows": "x"}, {"rows": [1, 2]}, b"{nao json"):
+            code, out = post(url, body)
+            assert code == 400 and "error" in out, body
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
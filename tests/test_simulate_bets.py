@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""simulate_bets vetorizado contra o laço jogo a jogo original (antes do user-005)."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import hybrid_closing_sindicato as hc
+
+
+def loop_simulate_bets(df_test, p_market_1x2, p_model_1x2, odds_1x2, y_1x2,
+                       p_market_over, p_model_over, odds_over, odds_under, y_over01,
+                       min_edge=0.02, stake_mode="flat", flat_stake=1.0, fkelly=0.25,
+                       max_kelly=0.03, max_bets_per_game=1, bankroll0=100.0):
+    bankroll = bankroll0
+    bankroll_path, bets = [], []
+    for i in range(len(df_test)):
+        candidates = []
+        for k, sel in enumerate(["H", "D", "A"]):
+            edge = float(p_model_1x2[i, k] - p_market_1x2[i, k])
+            if edge >= min_edge:
+                candidates.append(("1x2", sel, p_model_1x2[i, k], p_market_1x2[i, k], odds_1x2[i, k], edge))
+        edge_over = float(p_model_over[i] - p_market_over[i])
+        if edge_over >= min_edge:
+            candidates.append(("OU", "Over", float(p_model_over[i]), float(p_market_over[i]), float(odds_over[i]), edge_over))
+        edge_under = float((1.0 - p_model_over[i]) - (1.0 - p_market_over[i]))
+        if edge_under >= min_edge:
+            candidates.append(("OU", "Under", float(1.0 - p_model_over[i]), float(1.0 - p_market_over[i]),
+                               float(odds_under[i]), edge_under))
+        candidates.sort(key=lambda x: x[-1], reverse=True)
+        for (market, sel, pmod, pmkt, odds, edge) in candidates[:max_bets_per_game]:
+            if stake_mode == "flat":
+                stake = flat_stake
+            else:
+                stake = bankroll * min(hc.kelly_fraction(pmod, odds), max_kelly) * fkelly
+            if market == "1x2":
+                won = int(y_1x2[i] == {"H": 0, "D": 1, "A": 2}[sel])
+            else:
+                won = int((y_over01[i] == 1 and sel == "Over") or (y_over01[i] == 0 and sel == "Under"))
+            pnl = stake * (odds - 1.0) if won else -stake
+            bankroll += pnl
+            bets.append({"idx": int(df_test.index[i]), "market": market, "selection": sel,
+                         "prob_model": float(pmod), "prob_market": float(pmkt), "odds": float(odds),
+                         "edge": float(edge), "stake": float(stake), "won": won, "pnl": float(pnl)})
+        bankroll_path.append({"row": int(df_test.index[i]), "bankroll": float(bankroll)})
+    return pd.DataFrame(bets), pd.DataFrame(bankroll_path)
+
+
+def synthetic(seed, n=1500):
+    rng = np.random.default_rng(seed)
+    pm = rng.dirichlet([4, 2.5, 3], size=n)
+    pk = np.clip(pm + rng.normal(0, 0.04, pm.shape), 0.01, None)
+    pk /= pk.sum(axis=1, keepdims=True)
+    po_m = rng.uniform(0.3, 0.7, n)
+    po_k = np.clip(po_m + rng.normal(0, 0.04, n), 0.01, 0.99)
+    odds = 1.0 / (pm * 1.05)
+    odds_over, odds_under = 1.0 / (po_m * 1.05), 1.0 / ((1 - po_m) * 1.05)
+    y = (rng.random(n)[:, None] > np.cumsum(pm, axis=1)).sum(axis=1)
+    yo = (rng.random(n) < po_m).astype(int)
+    df = pd.DataFrame(index=np.arange(1000, 1000 + n))
+    return df, pm, pk, odds, y, po_m, po_k, odds_over, odds_under, yo
+
+
+@pytest.mark.parametrize("stake_mode", ["flat", "fkelly"])
+@pytest.mark.parametrize("max_bets", [1, 2, 5])
+@pytest.mark.parametrize("min_edge", [0.0, 0.02])
+def test_matches_loop(stake_mode, max_bets, min_edge):
+    args = synthetic(7)
+    kw = dict(min_edge=min_edge, stake_mode=stake_mode, flat_stake=2.0, fkelly=0.25,
+              max_kelly=0.05, max_bets_per_game=max_bets, bankroll0=100.0)
+    bets, bank = hc.simulate_bets(*args, **kw)
+    bets_ref, bank_ref = loop_simulate_bets(*args, **kw)
+
+    assert len(bets) == len(bets_ref) > 0
+    for col in ("idx", "market", "selection", "won"):
+        np.testing.assert_array_equal(bets[col].to_numpy(), bets_ref[col].to_numpy())
+    for col in ("prob_model", "prob_market", "odds", "edge", "stake", "pnl"):
+        np.testing.assert_allclose(bets[col].to_numpy(dtype=float), bets_ref[col].to_numpy(), rtol=1e-10, atol=1e-12)
+    np.testing.assert_array_equal(bank["row"].to_numpy(), bank_ref["row"].to_numpy())
+    np.testing.assert_allclose(bank["bankroll"].to_numpy(), bank_ref["bankroll"].to_numpy(), rtol=1e-10)
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""--stream: métricas/calibração por chunk batem com as previsões gravadas; opções sem efeito são recusadas."""
+
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import hybrid_closing_sindicato as hc
+from synthetic_closing import generate_closing
+
+
+def run_main(monkeypatch, *argv):
+    monkeypatch.setattr(sys, "argv", ["hybrid_closing_sindicato.py", *map(str, argv)])
+    hc.main()
+
+
+@pytest.fixture(scope="module")
+def streamed(tmp_path_factory):
+    tmp = tmp_path_factory.mktemp("stream")
+    generate_closing(3000, seed=3).to_csv(tmp / "jogos.csv", index=False)
+    mp = pytest.MonkeyPatch()
+    try:
+        run_main(mp, "--data-url", tmp / "jogos.csv", "--stream", "--chunk-rows", 500,
+                 "--min-train", 1000, "--outdir", tmp / "out")
+    finally:
+        mp.undo()
+    return tmp / "out"
+
+
+def test_chunk_metrics_match_predictions(streamed):
+    pred = pd.read_csv(streamed / "predictions_walkforward.csv")
+    folds = pd.read_csv(streamed / "fold_metrics.csv")
+    assert len(folds) == pred["fold"].nunique() == 4
+    for _, f in folds.iterrows():
+        p = pred[pred["fold"] == f["fold"]]
+        want = {**hc.metrics_1x2(p["y1x2"].values, p[["pH_mkt", "pD_mkt", "pA_mkt"]].values,
+                                 p[["pH_mod", "pD_mod", "pA_mod"]].values),
+                **hc.metrics_ou(p["yOver"].values, p["pOver_mkt"].values, p["pOver_mod"].values)}
+        for k, v in want.items():
+            assert f[k] == pytest.approx(v, rel=1e-9), k
+
+
+@pytest.mark.parametrize("which,col", [("market", "pOver_mkt"), ("model", "pOver_mod")])
+def test_chunked_calibration_matches_bins(streamed, which, col):
+    pred = pd.read_csv(streamed / "predictions_walkforward.csv")
+    got = pd.read_csv(streamed / f"calibration_bins_ou_{which}.csv")
+    want = hc.calibration_bins(pred["yOver"].values, pred[col].values)
+    pd.testing.assert_frame_equal(got, want, check_dtype=False, rtol=1e-9)
+
+
+def test_calibration_sums_add_across_chunks():
+    rng = np.random.default_rng(1)
+    p = rng.random(2000)
+    y = (rng.random(2000) < p).astype(int)
+    sums = hc.calibration_sums(y[:700], p[:700]) + hc.calibration_sums(y[700:], p[700:])
+    pd.testing.assert_frame_equal(hc.calibration_table(sums), hc.calibration_bins(y, p))
+
+
+@pytest.mark.parametrize("flags", [["--use-knn"], ["--jobs", 2], ["--sweep", "min_edge=0.02"],
+                                   ["--warm-start"], ["--window", 1000], ["--mode", "tune"]])
+def test_unsupported_flags_rejected(monkeypatch, tmp_path, capsys, flags):
+    with pytest.raises(SystemExit) as exc:
+        run_main(monkeypatch, "--data-url", tmp_path / "nada.csv", "--stream", "--outdir", tmp_path, *flags)
+    assert exc.value.code == 2
+    assert "--stream" in capsys.readouterr().err
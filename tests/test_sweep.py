@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""sweep_bets (todas as configs de uma vez) contra um simulate_bets por config; specs inválidos."""
+
+import numpy as np
+import pytest
+
+import hybrid_closing_sindicato as hc
+from test_simulate_bets import synthetic
+
+DEFAULTS = {"min_edge": 0.02, "fkelly": 0.25, "max_kelly": 0.05, "flat_stake": 2.0,
+            "stake_mode": "fkelly", "max_bets_per_game": 1}
+
+
+def simulate_config(args, cfg, bankroll0):
+    bets, _ = hc.simulate_bets(*args, bankroll0=bankroll0, **cfg)
+    path = bankroll0 + np.concatenate([[0.0], np.cumsum(bets["pnl"].to_numpy())]) if len(bets) else np.array([bankroll0])
+    return {
+        "bets_count": len(bets),
+        "roi": bets["pnl"].sum() / (bets["stake"].sum() + 1e-12) if len(bets) else 0.0,
+        "final_bankroll": path[-1],
+        "max_drawdown": np.max(1.0 - path / np.maximum.accumulate(path)),
+    }
+
+
+@pytest.mark.parametrize("max_cells", [5_000_000, 1_000])   # um bloco só / vários blocos de configs
+def test_sweep_matches_simulate_bets(max_cells):
+    args = synthetic(11, n=800)
+    configs = hc.parse_sweep("min_edge=0:0.04:0.02,max_bets_per_game=1,2,5,stake_mode=flat,fkelly,fkelly=0.1,0.5",
+                             DEFAULTS)
+    assert len(configs) == 3 * 3 * 2 * 2
+    res = hc.sweep_bets(*args[1:], configs=configs, bankroll0=100.0, max_cells=max_cells)
+    assert list(res[list(DEFAULTS)].to_dict("records")) == [{k: c[k] for k in DEFAULTS} for c in configs]
+    for i, cfg in enumerate(configs):
+        want = simulate_config(args, cfg, 100.0)
+        assert res["bets_count"].iloc[i] == want["bets_count"], cfg
+        for col in ("roi", "final_bankroll", "max_drawdown"):
+            assert res[col].iloc[i] == pytest.approx(want[col], rel=1e-9, abs=1e-12), (col, cfg)
+
+
+def test_parse_sweep_ranges_and_defaults():
+    configs = hc.parse_sweep("min_edge=0.01:0.03:0.01, fkelly = 0.5", DEFAULTS)
+    assert [c["min_edge"] for c in configs] == [0.01, 0.02, 0.03]
+    assert all(c["fkelly"] == 0.5 and c["stake_mode"] == "fkelly" for c in configs)
+
+
+@pytest.mark.parametrize("spec", ["stake_mode=kelly", "stake_mode=flat,Flat", "edge=0.02",
+                                  "0.02,0.03", "min_edge=abc", "min_edge=0:0.1"])
+def test_parse_sweep_rejects_malformed(spec):
+    with pytest.raises(ValueError):
+        hc.parse_sweep(spec, DEFAULTS)
+
+
+def test_check_stake_modes():
+    hc.check_stake_modes(["flat", "fkelly"])
+    with pytest.raises(ValueError, match="'half'"):
+        hc.check_stake_modes(["flat", "half"])
+    args = synthetic(1, n=50)
+    with pytest.raises(ValueError):
+        hc.sweep_bets(*args[1:], configs=[{**DEFAULTS, "stake_mode": "kelly"}])
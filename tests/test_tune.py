@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""--mode tune: cumsum sobre k (uma consulta com o maior k) contra um ajuste KNN explícito por config."""
+
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.metrics import log_loss
+
+import hybrid_closing_sindicato as hc
+from closing_data import closing_data
+from synthetic_closing import generate_closing
+
+
+def explicit_logloss(data, params, tr_idx, k, sigma, C):
+    """Uma config do jeito do backtest: calibradores com C, ajuste KNN com (k, sigma), LogLoss na validação."""
+    tr2, val = hc.temporal_split(tr_idx)
+    model = hc.fit_calibrators(tr2, data, {**params, "logit_C": C})
+    p_1x2, p_over = hc.predict_mix(model, data["X"][val], data["p1x2_mkt"][val], data["pover_mkt"][val], None)
+    delta = hc.knn_residual_adjustment(data["X"][tr2], hc.knn_residuals(model, tr2, data), data["X"][val],
+                                       k=k, sigma=sigma)
+    if delta.ndim == 2:
+        p_1x2, p_over = hc.apply_knn_delta(p_1x2, p_over, delta)
+    yo = data["y_over01"][val]
+    return (log_loss(data["y_1x2"][val], p_1x2, labels=[0, 1, 2]),
+            log_loss(yo, np.column_stack([1 - p_over, p_over]), labels=[0, 1]))
+
+
+@pytest.fixture(scope="module")
+def fold_data():
+    df, data, params = closing_data(2000, seed=13)
+    tr_idx, _ = hc.walk_forward_splits(df, min_train=1600, step=400)[0]
+    return data, params, tr_idx
+
+
+@pytest.mark.parametrize("max_cells", [1_000_000, 5_000])   # um bloco / vários blocos de linhas
+def test_cumsum_over_k_matches_per_k(fold_data, max_cells):
+    data, params, tr_idx = fold_data
+    tr2, val = hc.temporal_split(tr_idx)
+    model = hc.fit_calibrators(tr2, data, params)
+    p_1x2, p_over = hc.predict_mix(model, data["X"][val], data["p1x2_mkt"][val], data["pover_mkt"][val], None)
+    dist, nbr = hc.knn_query(data["X"][tr2], data["X"][val], k=300)
+    ks = np.array([3, 6, 50, 120, 300])
+    got = hc.knn_grid_logloss(dist, nbr, hc.knn_residuals(model, tr2, data), p_1x2, p_over,
+                              data["y_1x2"][val], data["y_over01"][val], ks, sigma=0.05, max_cells=max_cells)
+    want = np.array([explicit_logloss(data, params, tr_idx, int(k), 0.05, 1.0) for k in ks])
+    np.testing.assert_allclose(got, want, rtol=1e-10)
+
+
+def test_tune_fold_halving_and_final_scores(fold_data):
+    data, params, tr_idx = fold_data
+    grid = pd.DataFrame(hc.parse_sweep("knn_k=20,80,200,knn_sigma=0.04,0.1,C=0.5,2",
+                                        {"knn_k": 100, "knn_sigma": 0.08, "C": 1.0}, types=hc.TUNE_PARAMS))
+    res = hc.tune_fold(1, tr_idx, data, params, grid, eta=3, min_rows=50)
+    n_val = len(hc.temporal_split(tr_idx)[1])
+    sizes = res.groupby("rung").size()
+    assert sizes.iloc[0] == len(grid) == 12 and list(sizes) == [12, 4, 2, 1]   # ceil(log3(12)) = 3 cortes
+    rows = res.groupby("rung")["rows"].first()
+    assert rows.is_monotonic_increasing and rows.iloc[-1] == n_val
+    # sobreviventes de cada rodada = melhores da anterior
+    for r in range(1, len(sizes)):
+        prev = res[res["rung"] == r - 1].sort_values("logloss", kind="stable").head(sizes.iloc[r])
+        cur = res[res["rung"] == r]
+        assert set(map(tuple, prev[["knn_k", "knn_sigma", "C"]].values)) == \
+            set(map(tuple, cur[["knn_k", "knn_sigma", "C"]].values))
+    for r in res[res["rung"] == res["rung"].max()].itertuples():
+        want = explicit_logloss(data, params, tr_idx, int(r.knn_k), r.knn_sigma, r.C)
+        np.testing.assert_allclose([r.logloss_1x2, r.logloss_ou], want, rtol=1e-10)
+
+
+def test_main_tune_writes_best_per_fold(monkeypatch, tmp_path):
+    generate_closing(2400, seed=1).to_csv(tmp_path / "jogos.csv", index=False)
+    monkeypatch.setattr(sys, "argv", ["hybrid_closing_sindicato.py", "--mode", "tune", "--data-url",
+                                      str(tmp_path / "jogos.csv"), "--min-train", "1600", "--step", "400",
+                                      "--tune", "knn_k=50,150,knn_sigma=0.05,C=1", "--outdir", str(tmp_path)])
+    hc.main()
+    best = pd.read_csv(tmp_path / "tune_best.csv")
+    assert list(best["fold"]) == [1, 2]
+    assert set(best["knn_k"]) <= {50, 150}
+    assert len(pd.read_csv(tmp_path / "tune_results.csv")) >= 2 * 2
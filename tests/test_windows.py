@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""--window / --window-days / --decay-half-life: janelas por aritmética de índices contra um filtro direto."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import hybrid_closing_sindicato as hc
+from closing_data import closing_data
+
+
+def days_of(n, seed=0):
+    """Datas crescentes com vários jogos por dia e dias sem jogos."""
+    rng = np.random.default_rng(seed)
+    return np.cumsum(rng.choice([0, 0, 0, 1, 3], n)).astype(float)
+
+
+@pytest.mark.parametrize("window,window_days", [(0, 0), (500, 0), (0, 30.0), (500, 30.0), (5000, 0)])
+def test_splits_match_filter(window, window_days):
+    n = 2000
+    days = days_of(n)
+    df = pd.DataFrame(index=np.arange(n))
+    expanding = hc.walk_forward_splits(df, min_train=800, step=300)
+    splits = hc.walk_forward_splits(df, min_train=800, step=300, window=window,
+                                    window_days=window_days, days=days)
+    assert len(splits) == len(expanding)
+    for (tr, te), (_, te_exp) in zip(splits, expanding):
+        np.testing.assert_array_equal(te, te_exp)
+        end = te[0]
+        keep = np.arange(end)
+        if window:
+            keep = keep[keep >= end - window]
+        if window_days:
+            keep = keep[days[keep] >= days[end] - window_days]
+        np.testing.assert_array_equal(tr, keep)
+
+
+def test_window_days_at_end_and_without_dates():
+    days = days_of(100)
+    assert hc.window_start(100, window_days=5.0, days=days) == int(np.searchsorted(days, days[-1] - 5.0))
+    with pytest.raises(ValueError, match="--window-days"):
+        hc.window_start(50, window_days=5.0, days=None)
+
+
+def test_decay_weights():
+    idx = np.arange(10, 20)
+    data = {"time": np.arange(30, dtype=float) * 2.0}   # 2 dias por linha
+    assert hc.decay_weights(idx, data, {}) is None
+    w = hc.decay_weights(idx, data, {"decay_half_life": 4.0})
+    assert w.mean() == pytest.approx(1.0)
+    np.testing.assert_allclose(w[:-2] / w[2:], 0.5)        # meia-vida de 4 dias = 2 linhas
+    assert w[-1] == w.max()
+
+
+def test_fold_on_window_matches_sliced_data():
+    """Treinar na janela = treinar num dataset que só tem a janela (nada fora dela é lido)."""
+    df, data, params = closing_data(2000, seed=9)
+    tr, te = hc.walk_forward_splits(df, min_train=1500, step=500, window=600)[0]
+    assert len(tr) == 600
+    _, preds = hc.run_fold(1, tr, te, data, params)
+    lo = tr[0]
+    sliced = {k: v[lo:] for k, v in data.items()}
+    _, ref = hc.run_fold(1, tr - lo, te - lo, sliced, params)
+    for k in ("pH_mod", "pD_mod", "pA_mod", "pOver_mod"):
+        np.testing.assert_array_equal(preds[k], ref[k])
+
+
+def test_long_half_life_is_no_decay():
+    df, data, params = closing_data(1600, seed=9)
+    tr, te = hc.walk_forward_splits(df, min_train=1200, step=400)[0]
+    _, plain = hc.run_fold(1, tr, te, data, params)
+    _, slow = hc.run_fold(1, tr, te, {**data, "time": np.arange(1600, dtype=float)},
+                          {**params, "decay_half_life": 1e9})
+    _, fast = hc.run_fold(1, tr, te, {**data, "time": np.arange(1600, dtype=float)},
+                          {**params, "decay_half_life": 50.0})
+    np.testing.assert_allclose(slow["pOver_mod"], plain["pOver_mod"], rtol=1e-6)
+    assert not np.allclose(fast["pOver_mod"], plain["pOver_mod"], rtol=1e-6)